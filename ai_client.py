@@ -0,0 +1,363 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from database import get_connection_pool
+import ai_executor
+
+GEMINI_MODEL = "gemini-2.5-flash"
+DEFAULT_TEMPERATURE = 0.3
+
+# "gemini" calls the API; "stub" returns canned text without network access
+AI_BACKEND = os.environ.get("TATHYA_AI_BACKEND", "gemini")
+
+# Responses cached on disk, shared by every session and process
+AI_CACHE_PATH = os.path.join("cache", "ai_responses.db")
+AI_CACHE_TTL_SECONDS = 7 * 24 * 3600
+AI_CACHE_MAX_ENTRIES = 5000
+
+# Cache hits update last_used_at in batches rather than one write per read
+AI_CACHE_TOUCH_BATCH = 100
+AI_CACHE_TOUCH_INTERVAL_SECONDS = 60
+
+_client = None
+_client_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0}
+_stream_stats = {"streams": 0, "first_token_seconds": 0.0}
+_prompt_stats = {"requests": 0, "prompt_tokens": 0, "last_prompt_tokens": 0}
+_cache_ready = False
+_touch_lock = threading.Lock()
+_pending_touches = {}
+_last_touch_flush = time.monotonic()
+
+class AIUnavailableError(Exception):
+    """Raised when the configured AI backend cannot be used (e.g. no API key)"""
+
+def _get_gemini_client():
+    """Create the Gemini client once per process"""
+    global _client
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if not api_key:
+        raise AIUnavailableError("GEMINI_API_KEY is not set; AI features are disabled")
+    from google import genai
+    
+    with _client_lock:
+        if _client is None:
+            _client = genai.Client(api_key=api_key)
+        return _client
+
+async def _gemini_generate(model, prompt, max_tokens, temperature):
+    """Generate text with the Gemini API"""
+    client = _get_gemini_client()
+    from google.genai import types
+    
+    response = await client.aio.models.generate_content(
+        model=model,
+        contents=prompt,
+        config=types.GenerateContentConfig(
+            max_output_tokens=max_tokens,
+            temperature=temperature
+        )
+    )
+    return response.text if response else None
+
+class StubServiceError(Exception):
+    """Simulated transient API failure from the stub backend"""
+    
+    def __init__(self, code=503):
+        super().__init__(f"Stub backend unavailable ({code})")
+        self.code = code
+
+async def _stub_generate(model, prompt, max_tokens, temperature):
+    """Deterministic offline response for tests and local development.
+    
+    TATHYA_AI_STUB_LATENCY (seconds) and TATHYA_AI_STUB_FAILURE_RATE (0-1)
+    make it behave like a slow or flaky API for exercising the executor.
+    """
+    await asyncio.sleep(float(os.environ.get("TATHYA_AI_STUB_LATENCY", "0")))
+    if random.random() < float(os.environ.get("TATHYA_AI_STUB_FAILURE_RATE", "0")):
+        raise StubServiceError()
+    digest = hashlib.sha256(prompt.encode()).hexdigest()[:12]
+    return f"[stub {model} response {digest}] {normalize_prompt(prompt)[:200]}"
+
+async def _gemini_stream(model, prompt, max_tokens, temperature):
+    """Stream text chunks from the Gemini API"""
+    client = _get_gemini_client()
+    from google.genai import types
+    
+    stream = await client.aio.models.generate_content_stream(
+        model=model,
+        contents=prompt,
+        config=types.GenerateContentConfig(
+            max_output_tokens=max_tokens,
+            temperature=temperature
+        )
+    )
+    async for chunk in stream:
+        if chunk.text:
+            yield chunk.text
+
+async def _stub_stream(model, prompt, max_tokens, temperature):
+    """Stream the stub response a few words at a time"""
+    words = (await _stub_generate(model, prompt, max_tokens, temperature)).split(" ")
+    for start in range(0, len(words), 4):
+        await asyncio.sleep(float(os.environ.get("TATHYA_AI_STUB_LATENCY", "0")) / 10)
+        yield " ".join(words[start:start + 4]) + " "
+
+# Backend name -> coroutine function(model, prompt, max_tokens, temperature) returning text
+AI_BACKENDS = {
+    "gemini": _gemini_generate,
+    "stub": _stub_generate,
+}
+
+# Backend name -> async generator function with the same arguments yielding text chunks
+AI_STREAM_BACKENDS = {
+    "gemini": _gemini_stream,
+    "stub": _stub_stream,
+}
+
+def estimate_tokens(text):
+    """Approximate token count (about four characters per token for English)"""
+    return (len(text) + 3) // 4 if text else 0
+
+def normalize_prompt(prompt):
+    """Collapse whitespace so prompts differing only in indentation share a cache entry"""
+    return re.sub(r"\s+", " ", prompt).strip()
+
+def cache_key(model, prompt, max_tokens, temperature):
+    """Cache key for a request"""
+    payload = json.dumps([model, normalize_prompt(prompt), max_tokens, temperature])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def _cache_pool():
+    """Connection pool for the response cache, creating its table on first use"""
+    global _cache_ready
+    pool = get_connection_pool(AI_CACHE_PATH)
+    if not _cache_ready:
+        os.makedirs(os.path.dirname(AI_CACHE_PATH), exist_ok=True)
+        with pool.transaction() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS ai_response_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_ai_response_cache_last_used ON ai_response_cache (last_used_at)")
+        _cache_ready = True
+    return pool
+
+def _record(outcome):
+    with _stats_lock:
+        _cache_stats[outcome] += 1
+
+def _record_prompt(prompt):
+    """Track the estimated size of prompts sent to the backend"""
+    tokens = estimate_tokens(prompt)
+    with _stats_lock:
+        _prompt_stats["requests"] += 1
+        _prompt_stats["prompt_tokens"] += tokens
+        _prompt_stats["last_prompt_tokens"] = tokens
+
+def _flush_touches(conn=None):
+    """Write the last-used times of recent cache hits"""
+    global _last_touch_flush
+    with _touch_lock:
+        touches = list(_pending_touches.items())
+        _pending_touches.clear()
+        _last_touch_flush = time.monotonic()
+    if not touches:
+        return
+    if conn is None:
+        with _cache_pool().transaction() as conn:
+            _flush_touches_into(conn, touches)
+    else:
+        _flush_touches_into(conn, touches)
+
+def _flush_touches_into(conn, touches):
+    """Apply (key, used_at) last-used updates on a connection"""
+    conn.executemany(
+        "UPDATE ai_response_cache SET last_used_at = MAX(last_used_at, ?) WHERE cache_key = ?",
+        [(used_at, key) for key, used_at in touches]
+    )
+
+def _touch(key, now):
+    """Remember a cache hit; flush once enough hits or time have accumulated"""
+    with _touch_lock:
+        _pending_touches[key] = now
+        due = (len(_pending_touches) >= AI_CACHE_TOUCH_BATCH
+               or time.monotonic() - _last_touch_flush >= AI_CACHE_TOUCH_INTERVAL_SECONDS)
+    if due:
+        _flush_touches()
+
+def _cache_get(key):
+    """Get a fresh cached response (a read; the LRU bump is batched)"""
+    now = time.time()
+    with _cache_pool().connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT response FROM ai_response_cache WHERE cache_key = ? AND created_at > ?",
+            (key, now - AI_CACHE_TTL_SECONDS)
+        )
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    _touch(key, now)
+    return row["response"]
+
+def _cache_put(key, model, response):
+    """Store a response, then evict expired and least recently used entries"""
+    now = time.time()
+    with _cache_pool().transaction() as conn:
+        # Eviction below needs current last-used times
+        _flush_touches(conn)
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO ai_response_cache (cache_key, model, response, created_at, last_used_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (key, model, response, now, now))
+        cursor.execute("DELETE FROM ai_response_cache WHERE created_at <= ?", (now - AI_CACHE_TTL_SECONDS,))
+        cursor.execute('''
+            DELETE FROM ai_response_cache WHERE cache_key IN (
+                SELECT cache_key FROM ai_response_cache
+                ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+            )
+        ''', (AI_CACHE_MAX_ENTRIES,))
+
+def generate_text(prompt, max_tokens=1000, temperature=DEFAULT_TEMPERATURE, model=GEMINI_MODEL, use_cache=True,
+                  deadline=ai_executor.AI_REQUEST_DEADLINE_SECONDS):
+    """Generate text for a prompt, serving repeated requests from the response cache.
+    
+    Cache misses go through the rate-limited executor. Raises the backend's
+    exception (or TimeoutError past the deadline) on failure; empty
+    responses and errors are never cached.
+    """
+    key = cache_key(model, prompt, max_tokens, temperature)
+    if use_cache:
+        cached = _cache_get(key)
+        if cached is not None:
+            _record("hits")
+            return cached
+        _record("misses")
+    
+    _record_prompt(prompt)
+    response = ai_executor.run(AI_BACKENDS[AI_BACKEND], model, prompt, max_tokens, temperature, deadline=deadline)
+    if response and use_cache:
+        _cache_put(key, model, response)
+    return response
+
+def generate_texts(prompts, max_tokens=1000, temperature=DEFAULT_TEMPERATURE, model=GEMINI_MODEL, use_cache=True,
+                   deadline=ai_executor.AI_REQUEST_DEADLINE_SECONDS):
+    """Generate text for several prompts concurrently.
+    
+    Returns responses (or the exception for a failed prompt) in input order.
+    Cached prompts are answered without a request unless use_cache is False,
+    which sends every prompt and leaves the cache untouched.
+    """
+    results = [None] * len(prompts)
+    misses = []
+    for index, prompt in enumerate(prompts):
+        key = cache_key(model, prompt, max_tokens, temperature)
+        if not use_cache:
+            misses.append((index, key, prompt))
+            continue
+        cached = _cache_get(key)
+        if cached is not None:
+            _record("hits")
+            results[index] = cached
+        else:
+            _record("misses")
+            misses.append((index, key, prompt))
+    
+    for _, _, prompt in misses:
+        _record_prompt(prompt)
+    responses = ai_executor.run_many(
+        AI_BACKENDS[AI_BACKEND],
+        [(model, prompt, max_tokens, temperature) for _, _, prompt in misses],
+        deadline=deadline
+    )
+    for (index, key, _), response in zip(misses, responses):
+        if response and use_cache and not isinstance(response, Exception):
+            _cache_put(key, model, response)
+        results[index] = response
+    return results
+
+def stream_text(prompt, max_tokens=1000, temperature=DEFAULT_TEMPERATURE, model=GEMINI_MODEL, timing=None,
+                deadline=ai_executor.AI_REQUEST_DEADLINE_SECONDS):
+    """Yield a response in chunks as it is generated.
+    
+    A cached response is yielded whole. Complete streamed responses are
+    cached. If timing is a dict it receives first_token_seconds and
+    total_seconds.
+    """
+    started = time.perf_counter()
+    key = cache_key(model, prompt, max_tokens, temperature)
+    cached = _cache_get(key)
+    if cached is not None:
+        _record("hits")
+        if timing is not None:
+            timing["first_token_seconds"] = timing["total_seconds"] = time.perf_counter() - started
+        yield cached
+        return
+    _record("misses")
+    
+    _record_prompt(prompt)
+    parts = []
+    for chunk in ai_executor.stream(AI_STREAM_BACKENDS[AI_BACKEND], model, prompt, max_tokens, temperature,
+                                    deadline=deadline):
+        if not parts:
+            first_token_seconds = time.perf_counter() - started
+            with _stats_lock:
+                _stream_stats["streams"] += 1
+                _stream_stats["first_token_seconds"] += first_token_seconds
+            if timing is not None:
+                timing["first_token_seconds"] = first_token_seconds
+        parts.append(chunk)
+        yield chunk
+    
+    if timing is not None:
+        timing["total_seconds"] = time.perf_counter() - started
+    if parts:
+        _cache_put(key, model, "".join(parts))
+
+def query_gemini(prompt, max_tokens=1000):
+    """Query Gemini API for intelligent responses"""
+    try:
+        response = generate_text(prompt, max_tokens=max_tokens)
+        return response if response else "Unable to generate response"
+    except Exception as e:
+        return f"Error generating response: {str(e)}"
+
+def get_cache_stats():
+    """Hit/miss, time-to-first-token and prompt-size figures for this process, and the number of cached responses"""
+    with _stats_lock:
+        hits, misses = _cache_stats["hits"], _cache_stats["misses"]
+    with _cache_pool().connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM ai_response_cache")
+        entries = cursor.fetchone()[0]
+    with _stats_lock:
+        streams, first_token_seconds = _stream_stats["streams"], _stream_stats["first_token_seconds"]
+        prompt_stats = dict(_prompt_stats)
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        "entries": entries,
+        "streams": streams,
+        "avg_first_token_seconds": first_token_seconds / streams if streams else None,
+        "avg_prompt_tokens": prompt_stats["prompt_tokens"] / prompt_stats["requests"] if prompt_stats["requests"] else None,
+        "last_prompt_tokens": prompt_stats["last_prompt_tokens"],
+    }
+
+def clear_cache():
+    """Delete every cached response"""
+    with _cache_pool().transaction() as conn:
+        conn.execute("DELETE FROM ai_response_cache")
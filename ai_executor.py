@@ -0,0 +1,196 @@
+import asyncio
+import os
+import queue
+import random
+import threading
+import time
+
+# Quota for outbound AI requests: sustained rate and short burst allowance
+AI_REQUESTS_PER_MINUTE = int(os.environ.get("TATHYA_AI_REQUESTS_PER_MINUTE", "60"))
+AI_RATE_LIMIT_BURST = 5
+
+# Requests in flight at once across all sessions in this process
+AI_MAX_CONCURRENCY = 4
+
+# Each attempt is bounded by AI_ATTEMPT_TIMEOUT_SECONDS and the whole
+# request, retries and rate-limit waits included, by its deadline
+AI_ATTEMPT_TIMEOUT_SECONDS = 60
+AI_REQUEST_DEADLINE_SECONDS = 90
+AI_MAX_RETRIES = 3
+AI_RETRY_BASE_DELAY_SECONDS = 1.0
+AI_RETRY_MAX_DELAY_SECONDS = 20.0
+
+# HTTP status codes worth retrying: timeouts, quota exhaustion, server errors
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """Token-bucket rate limiter; used only from the executor's event loop"""
+    
+    def __init__(self, rate_per_second, capacity):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+    
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+_loop = None
+_loop_lock = threading.Lock()
+_bucket = None
+_semaphore = None
+
+def _get_loop():
+    """Start the executor's event loop thread on first use"""
+    global _loop, _bucket, _semaphore
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="tathya-ai-executor", daemon=True).start()
+            
+            async def create_limits():
+                return TokenBucket(AI_REQUESTS_PER_MINUTE / 60, AI_RATE_LIMIT_BURST), asyncio.Semaphore(AI_MAX_CONCURRENCY)
+            
+            _bucket, _semaphore = asyncio.run_coroutine_threadsafe(create_limits(), loop).result()
+            _loop = loop
+        return _loop
+
+def is_retryable(error):
+    """Check whether a failed attempt is worth retrying"""
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    return code in RETRYABLE_STATUS_CODES
+
+def retry_delay(attempt):
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(AI_RETRY_MAX_DELAY_SECONDS, AI_RETRY_BASE_DELAY_SECONDS * 2 ** attempt))
+
+async def _call_with_retries(call, args, deadline_at):
+    """Run call(*args) under the rate limit and concurrency cap, retrying transient failures"""
+    attempt = 0
+    while True:
+        await _bucket.acquire()
+        async with _semaphore:
+            remaining = deadline_at - time.monotonic()
+            try:
+                return await asyncio.wait_for(call(*args), timeout=min(AI_ATTEMPT_TIMEOUT_SECONDS, remaining))
+            except Exception as e:
+                if attempt >= AI_MAX_RETRIES or not is_retryable(e):
+                    raise
+                error = e
+        delay = retry_delay(attempt)
+        if time.monotonic() + delay >= deadline_at:
+            raise error
+        await asyncio.sleep(delay)
+        attempt += 1
+
+def submit(call, *args, deadline=AI_REQUEST_DEADLINE_SECONDS):
+    """Schedule an async call on the executor; returns a concurrent.futures.Future.
+    
+    Cancelling the future cancels the request, including any pending retry.
+    """
+    loop = _get_loop()
+    deadline_at = time.monotonic() + deadline
+    
+    async def run():
+        return await asyncio.wait_for(_call_with_retries(call, args, deadline_at), timeout=deadline)
+    
+    return asyncio.run_coroutine_threadsafe(run(), loop)
+
+def run(call, *args, deadline=AI_REQUEST_DEADLINE_SECONDS):
+    """Synchronous facade for Streamlit: run one request and wait for its result"""
+    future = submit(call, *args, deadline=deadline)
+    try:
+        return future.result()
+    except BaseException:
+        # Stop the request if the caller gives up (e.g. the script is rerun)
+        future.cancel()
+        raise
+
+def run_many(call, argument_lists, deadline=AI_REQUEST_DEADLINE_SECONDS):
+    """Run several requests concurrently; returns results or exceptions in input order"""
+    futures = [submit(call, *args, deadline=deadline) for args in argument_lists]
+    results = []
+    try:
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+    return results
+
+# Sentinel closing a stream's chunk queue
+_STREAM_END = object()
+
+async def _stream_with_retries(stream_call, args, deadline_at, chunks):
+    """Feed chunks from stream_call(*args) into a queue; retry only before the first chunk"""
+    attempt = 0
+    while True:
+        await _bucket.acquire()
+        started = False
+        try:
+            async with _semaphore:
+                stream = stream_call(*args)
+                try:
+                    while True:
+                        remaining = deadline_at - time.monotonic()
+                        try:
+                            chunk = await asyncio.wait_for(
+                                stream.__anext__(), timeout=min(AI_ATTEMPT_TIMEOUT_SECONDS, remaining)
+                            )
+                        except StopAsyncIteration:
+                            return
+                        started = True
+                        chunks.put(chunk)
+                finally:
+                    await stream.aclose()
+        except Exception as e:
+            # Output already shown to the user cannot be taken back
+            if started or attempt >= AI_MAX_RETRIES or not is_retryable(e):
+                raise
+            delay = retry_delay(attempt)
+            if time.monotonic() + delay >= deadline_at:
+                raise
+        await asyncio.sleep(delay)
+        attempt += 1
+
+def stream(stream_call, *args, deadline=AI_REQUEST_DEADLINE_SECONDS):
+    """Synchronous facade over an async generator: yields its chunks as they arrive.
+    
+    Closing the generator early (or the caller being interrupted) cancels
+    the request.
+    """
+    loop = _get_loop()
+    deadline_at = time.monotonic() + deadline
+    chunks = queue.Queue()
+    
+    async def run():
+        try:
+            await asyncio.wait_for(_stream_with_retries(stream_call, args, deadline_at, chunks), timeout=deadline)
+        finally:
+            chunks.put(_STREAM_END)
+    
+    future = asyncio.run_coroutine_threadsafe(run(), loop)
+    try:
+        while True:
+            chunk = chunks.get()
+            if chunk is _STREAM_END:
+                break
+            yield chunk
+        # Surface errors raised after (or instead of) the last chunk
+        future.result()
+    finally:
+        future.cancel()
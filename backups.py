@@ -0,0 +1,107 @@
+import glob
+import gzip
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+from database import get_db_connection
+
+BACKUPS_DIR = "backups"
+BACKUP_PREFIX = "case_management_backup_"
+
+# Pages copied per backup step, and the pause between steps that lets
+# writers in. Any write made through another connection restarts the
+# copy at the next step, so keep steps large enough to finish under load.
+BACKUP_PAGES_PER_STEP = 1024
+BACKUP_STEP_SLEEP_SECONDS = 0.05
+
+# Number of backups kept by rotate_backups
+BACKUP_RETENTION = 7
+
+def verify_backup(path):
+    """Run PRAGMA integrity_check on a backup file, returning the problems found"""
+    conn = sqlite3.connect(path)
+    try:
+        rows = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+    finally:
+        conn.close()
+    return [] if rows == ["ok"] else rows
+
+def _compress_file(source_path, target_path):
+    """Gzip a file in chunks"""
+    with open(source_path, "rb") as source, gzip.open(target_path, "wb", compresslevel=6) as target:
+        shutil.copyfileobj(source, target, 1024 * 1024)
+
+def list_backups(backups_dir=BACKUPS_DIR):
+    """Get backup file paths, newest first"""
+    pattern = os.path.join(backups_dir, f"{BACKUP_PREFIX}*.db*")
+    return sorted(glob.glob(pattern), reverse=True)
+
+def rotate_backups(retention=BACKUP_RETENTION, backups_dir=BACKUPS_DIR):
+    """Delete all but the newest `retention` backups, returning the removed paths"""
+    removed = list_backups(backups_dir)[retention:]
+    for path in removed:
+        os.remove(path)
+    return removed
+
+def create_backup(compress=True, retention=BACKUP_RETENTION, backups_dir=BACKUPS_DIR, job=None):
+    """Copy the live database page by page into a verified, optionally gzipped, backup file"""
+    os.makedirs(backups_dir, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    backup_path = os.path.join(backups_dir, f"{BACKUP_PREFIX}{timestamp}.db")
+    temp_path = backup_path + ".tmp"
+    
+    def on_progress(status, remaining, total):
+        if job is not None:
+            job.check_cancelled()
+            job.report(0.8 * (total - remaining) / max(total, 1), f"Copied {total - remaining} of {total} pages")
+        # backup() only sleeps on SQLITE_BUSY; pause between every step so
+        # writers get the database between page batches
+        if remaining:
+            time.sleep(BACKUP_STEP_SLEEP_SECONDS)
+    
+    try:
+        # The source is this thread's pooled connection, so job progress
+        # written from the callback goes through it and does not restart
+        # the backup
+        destination = sqlite3.connect(temp_path)
+        try:
+            with get_db_connection() as source:
+                # The file this connection has open, wherever DATABASE_PATH points now
+                source_path = source.execute("PRAGMA database_list").fetchone()[2]
+                source.backup(
+                    destination, pages=BACKUP_PAGES_PER_STEP,
+                    progress=on_progress, sleep=BACKUP_STEP_SLEEP_SECONDS
+                )
+            # Make the copy a single self-contained file
+            destination.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            destination.close()
+        
+        if job is not None:
+            job.report(0.85, "Verifying backup integrity")
+        problems = verify_backup(temp_path)
+        if problems:
+            raise sqlite3.DatabaseError(f"Backup failed integrity check: {problems[:5]}")
+        
+        if compress:
+            if job is not None:
+                job.report(0.9, "Compressing backup")
+            backup_path += ".gz"
+            _compress_file(temp_path, backup_path + ".tmp")
+            os.replace(backup_path + ".tmp", backup_path)
+        else:
+            os.replace(temp_path, backup_path)
+    finally:
+        for path in (temp_path, backup_path + ".tmp"):
+            if os.path.exists(path):
+                os.remove(path)
+    
+    removed = rotate_backups(retention, backups_dir)
+    return {
+        "backup_path": backup_path,
+        "size_bytes": os.path.getsize(backup_path),
+        "source_bytes": os.path.getsize(source_path),
+        "rotated": len(removed),
+    }
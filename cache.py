@@ -0,0 +1,76 @@
+import threading
+import time
+
+class TTLCache:
+    """Process-wide cache for an expensive read, with TTL and explicit invalidation.
+    
+    Values are keyed by the arguments passed to compute. Invalidation bumps a
+    generation counter so a computation that started before a write cannot
+    store its (now stale) result afterwards.
+    """
+    
+    def __init__(self, compute, ttl_seconds):
+        self.compute = compute
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}
+        self._refreshing = set()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, *args, stale_while_revalidate=False):
+        """Return a cached value, recomputing it when missing or expired.
+        
+        With stale_while_revalidate, a value that has only outlived its TTL is
+        returned immediately and refreshed on a background thread; values
+        invalidated by a write are always recomputed before returning.
+        """
+        with self._lock:
+            entry = self._entries.get(args)
+            if entry is not None and entry[2] == self._generation:
+                value, computed_at, _ = entry
+                if time.monotonic() - computed_at < self.ttl_seconds:
+                    self.hits += 1
+                    return value
+                if stale_while_revalidate:
+                    self.hits += 1
+                    self._refresh_in_background(args)
+                    return value
+            self.misses += 1
+        return self._refresh(args)
+    
+    def invalidate(self):
+        """Mark every cached value stale"""
+        with self._lock:
+            self._generation += 1
+    
+    def clear(self):
+        """Drop every cached value"""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+    
+    def _refresh(self, args):
+        with self._lock:
+            generation = self._generation
+        value = self.compute(*args)
+        with self._lock:
+            if generation == self._generation:
+                self._entries[args] = (value, time.monotonic(), generation)
+        return value
+    
+    def _refresh_in_background(self, args):
+        # Caller holds self._lock
+        if args in self._refreshing:
+            return
+        self._refreshing.add(args)
+        
+        def run():
+            try:
+                self._refresh(args)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(args)
+        
+        threading.Thread(target=run, daemon=True).start()
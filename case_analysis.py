@@ -0,0 +1,165 @@
+import hashlib
+from database import get_db_connection, transaction
+from ai_client import GEMINI_MODEL, generate_texts, normalize_prompt
+from prompt_context import fit_fields, CASE_FIELDS_TOKEN_BUDGET
+
+# Bump whenever CASE_ANALYSIS_PROMPT changes; stored analyses are per version
+CASE_ANALYSIS_PROMPT_VERSION = 1
+CASE_ANALYSIS_MAX_TOKENS = 1500
+
+# Cases sent to the executor at once; it applies the rate limit and
+# concurrency cap, this only bounds memory and progress granularity
+CASE_ANALYSIS_BATCH_SIZE = 8
+
+CASE_ANALYSIS_PROMPT = """
+You are an expert fraud investigation analyst. Analyze the following case and provide comprehensive insights:
+
+Case Type: {case_type}
+Case ID: {case_id}
+Customer: {customer_name}
+Loan Amount: {loan_amount}
+Branch: {branch}
+Case Details: {case_details}
+
+Provide analysis in the following format (without bold formatting):
+
+1. CASE OVERVIEW
+Summarize the case in professional terms
+
+2. RISK ASSESSMENT
+- Risk Level: [High/Medium/Low]
+- Fraud Probability: [Percentage]
+- Financial Impact: Amount at risk
+
+3. KEY RED FLAGS
+List specific indicators of fraud or irregularities
+
+4. INVESTIGATION PRIORITIES
+Prioritized list of investigation steps
+
+5. REGULATORY IMPLICATIONS
+Compliance considerations and reporting requirements
+
+6. RECOMMENDED ACTIONS
+Immediate and long-term action items
+
+7. EVIDENCE PRESERVATION
+Critical evidence to secure and preserve
+
+Use professional language suitable for banking compliance and investigation reports.
+"""
+
+def build_case_analysis_prompt(case_type, case_id, customer_name, loan_amount, branch, case_details,
+                               budget=CASE_FIELDS_TOKEN_BUDGET):
+    """Fill the smart case analysis prompt, fitting the case fields to a token budget"""
+    # Identifiers are kept whole; the free-text description is cut first
+    fields, _ = fit_fields([
+        ("case_type", case_type, 0),
+        ("case_id", case_id, 0),
+        ("customer_name", customer_name, 1),
+        ("loan_amount", loan_amount, 1),
+        ("branch", branch, 2),
+        ("case_details", case_details, 3),
+    ], budget)
+    return CASE_ANALYSIS_PROMPT.format(**fields)
+
+def case_analysis_prompt_for(case):
+    """Analysis prompt for a cases row"""
+    return build_case_analysis_prompt(
+        case["case_type"], case["case_id"], case["customer_name"] or "",
+        case["loan_amount"] or "", case["branch_location"] or "", case["case_description"]
+    )
+
+def analysis_input_hash(prompt, model=GEMINI_MODEL):
+    """Fingerprint of everything that determines an analysis"""
+    return hashlib.sha256(f"{model}\n{normalize_prompt(prompt)}".encode()).hexdigest()
+
+def get_case_analysis(case_id, prompt_version=CASE_ANALYSIS_PROMPT_VERSION):
+    """Get the stored analysis of a case for a prompt version"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT * FROM ai_analyses WHERE case_id = ? AND prompt_version = ?",
+            (case_id, prompt_version)
+        )
+        return cursor.fetchone()
+
+def get_case_analyses(status, limit=50, prompt_version=CASE_ANALYSIS_PROMPT_VERSION):
+    """Get stored analyses for cases in a status, newest first"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT a.*, c.case_type, c.product, c.region
+            FROM ai_analyses a
+            JOIN cases c ON c.case_id = a.case_id
+            WHERE c.status = ? AND a.prompt_version = ?
+            ORDER BY a.created_at DESC, a.id DESC
+            LIMIT ?
+        ''', (status, prompt_version, limit))
+        return cursor.fetchall()
+
+def _save_analyses(rows):
+    """Upsert (case_id, input_hash, analysis) rows for the current prompt version"""
+    with transaction() as conn:
+        conn.executemany('''
+            INSERT INTO ai_analyses (case_id, prompt_version, input_hash, model, analysis)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (case_id, prompt_version) DO UPDATE SET
+                input_hash = excluded.input_hash,
+                model = excluded.model,
+                analysis = excluded.analysis,
+                created_at = CURRENT_TIMESTAMP
+        ''', [(case_id, CASE_ANALYSIS_PROMPT_VERSION, input_hash, GEMINI_MODEL, analysis)
+              for case_id, input_hash, analysis in rows])
+
+def analyze_cases(status="Submitted", force=False, job=None):
+    """Analyze every case in a status, skipping cases whose inputs are unchanged.
+    
+    Prompts fan out concurrently through the AI executor in batches, and
+    each batch is saved as it completes so a cancelled run keeps its work.
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT c.*, a.input_hash AS previous_hash
+            FROM cases c
+            LEFT JOIN ai_analyses a ON a.case_id = c.case_id AND a.prompt_version = ?
+            WHERE c.status = ?
+            ORDER BY c.created_at, c.id
+        ''', (CASE_ANALYSIS_PROMPT_VERSION, status))
+        cases = cursor.fetchall()
+    
+    pending = []
+    for case in cases:
+        prompt = case_analysis_prompt_for(case)
+        input_hash = analysis_input_hash(prompt)
+        if force or case["previous_hash"] != input_hash:
+            pending.append((case["case_id"], input_hash, prompt))
+    
+    analyzed = 0
+    failed = []
+    for start in range(0, len(pending), CASE_ANALYSIS_BATCH_SIZE):
+        if job is not None:
+            job.check_cancelled()
+            job.report(start / len(pending), f"Analyzed {start} of {len(pending)} changed cases")
+        batch = pending[start:start + CASE_ANALYSIS_BATCH_SIZE]
+        # Forced re-analysis must reach the model, not the response cache
+        responses = generate_texts([prompt for _, _, prompt in batch], max_tokens=CASE_ANALYSIS_MAX_TOKENS,
+                                   use_cache=not force)
+        
+        rows = []
+        for (case_id, input_hash, _), response in zip(batch, responses):
+            if isinstance(response, Exception) or not response:
+                failed.append(case_id)
+            else:
+                rows.append((case_id, input_hash, response))
+        if rows:
+            _save_analyses(rows)
+            analyzed += len(rows)
+    
+    return {
+        "cases": len(cases),
+        "analyzed": analyzed,
+        "unchanged": len(cases) - len(pending),
+        "failed": failed,
+    }
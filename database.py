@@ -1,24 +1,203 @@
 import sqlite3
 import os
 import hashlib
+import threading
 from datetime import datetime
 from contextlib import contextmanager
 
 DATABASE_PATH = "case_management.db"
 
+# Connection pool settings
+POOL_MAX_IDLE = 8
+BUSY_TIMEOUT_SECONDS = 30
+CONNECTION_PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_SECONDS * 1000}",
+]
+
 def get_password_hash(password):
     """Generate password hash"""
     return hashlib.sha256(password.encode()).hexdigest()
 
+class ConnectionPool:
+    """Thread-safe pool of tuned SQLite connections for one database file.
+
+    A thread checks out one connection for its outermost get_db_connection()
+    block and reuses it for any nested blocks, so helpers such as log_audit
+    called from inside models functions share the caller's connection.
+    """
+
+    def __init__(self, database_path, max_idle=POOL_MAX_IDLE):
+        self.database_path = database_path
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _create_connection(self):
+        """Open a connection and apply pragmas once"""
+        # IMMEDIATE makes implicit write transactions take the write lock up
+        # front, so contention waits on the busy timeout instead of failing
+        # with "database is locked" when a reader tries to upgrade.
+        conn = sqlite3.connect(
+            self.database_path,
+            timeout=BUSY_TIMEOUT_SECONDS,
+            isolation_level="IMMEDIATE",
+            check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._create_connection()
+
+    def _release(self, conn, discard=False):
+        if conn.in_transaction:
+            # Match the old connect/close behaviour: uncommitted work is dropped
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                discard = True
+        if not discard:
+            with self._lock:
+                if len(self._idle) < self.max_idle:
+                    self._idle.append(conn)
+                    return
+        conn.close()
+
+    @contextmanager
+    def connection(self):
+        """Check out this thread's connection, reusing it when nested"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn = self._acquire()
+        self._local.conn = conn
+        self._local.depth = 1
+        discard = False
+        try:
+            yield conn
+        except sqlite3.DatabaseError as e:
+            discard = not isinstance(e, sqlite3.IntegrityError)
+            raise
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            self._release(conn, discard)
+
+    @contextmanager
+    def dedicated_connection(self):
+        """Check out a connection that nested blocks on this thread won't share"""
+        conn = self._acquire()
+        discard = False
+        try:
+            yield conn
+        except sqlite3.DatabaseError as e:
+            discard = not isinstance(e, sqlite3.IntegrityError)
+            raise
+        finally:
+            self._release(conn, discard)
+
+    @contextmanager
+    def transaction(self):
+        """Unit of work: commit everything in the block atomically, or nothing"""
+        with self.connection() as conn:
+            if getattr(self._local, "in_transaction", False):
+                # Join the enclosing unit of work; it owns the commit
+                yield conn
+                return
+
+            self._local.in_transaction = True
+            self._local.after_commit = []
+            try:
+                if not conn.in_transaction:
+                    conn.execute("BEGIN IMMEDIATE")
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                self._local.in_transaction = False
+                callbacks, self._local.after_commit = self._local.after_commit, []
+            
+            for callback in callbacks:
+                callback()
+    
+    def call_after_commit(self, callback):
+        """Run callback once the current unit of work commits (now if there is none)"""
+        if getattr(self._local, "in_transaction", False):
+            self._local.after_commit.append(callback)
+        else:
+            callback()
+
+    def close_all(self):
+        """Close every idle connection (e.g. before replacing the database file)"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_connection_pool(database_path=None):
+    """Get the connection pool for a database file"""
+    database_path = database_path or DATABASE_PATH
+    with _pools_lock:
+        pool = _pools.get(database_path)
+        if pool is None:
+            pool = ConnectionPool(database_path)
+            _pools[database_path] = pool
+        return pool
+
+def close_all_connections():
+    """Close idle pooled connections for every database"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_all()
+
 @contextmanager
 def get_db_connection():
-    """Database connection context manager"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    try:
+    """Database connection context manager backed by the connection pool"""
+    with get_connection_pool().connection() as conn:
         yield conn
-    finally:
-        conn.close()
+
+@contextmanager
+def get_dedicated_connection():
+    """Pooled connection for long-lived cursors, such as streaming exports"""
+    with get_connection_pool().dedicated_connection() as conn:
+        yield conn
+
+@contextmanager
+def transaction():
+    """Unit of work on the pooled connection.
+
+    Writes inside the block, including nested transaction() blocks and
+    log_audit calls, are committed together in a single transaction.
+    """
+    with get_connection_pool().transaction() as conn:
+        yield conn
+
+def call_after_commit(callback):
+    """Defer callback (e.g. a cache invalidation) until the current transaction commits"""
+    get_connection_pool().call_after_commit(callback)
 
 def init_database():
     """Initialize database with tables and default data"""
@@ -169,32 +348,6 @@ def init_database():
         
         conn.commit()
         
-        # Add new columns to existing users table if they don't exist
-        try:
-            cursor.execute("ALTER TABLE users ADD COLUMN name TEXT")
-        except sqlite3.OperationalError:
-            pass  # Column already exists
-        
-        try:
-            cursor.execute("ALTER TABLE users ADD COLUMN team TEXT")
-        except sqlite3.OperationalError:
-            pass  # Column already exists
-        
-        try:
-            cursor.execute("ALTER TABLE users ADD COLUMN functional_designation TEXT")
-        except sqlite3.OperationalError:
-            pass  # Column already exists
-        
-        try:
-            cursor.execute("ALTER TABLE users ADD COLUMN referred_by TEXT")
-        except sqlite3.OperationalError:
-            pass  # Column already exists
-        
-        try:
-            cursor.execute("ALTER TABLE users ADD COLUMN all_roles_access BOOLEAN DEFAULT 0")
-        except sqlite3.OperationalError:
-            pass  # Column already exists
-        
         # Achievement tables
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS achievements (
@@ -223,6 +376,9 @@ def init_database():
         
         conn.commit()
         
+        # Bring older databases up to the current schema version
+        run_migrations(conn)
+        
         # Clean up old test users first
         test_users_to_remove = ["initiator", "reviewer", "approver", "legal", "closure", "actioner"]
         for user_id in test_users_to_remove:
@@ -268,11 +424,663 @@ def init_database():
         conn.commit()
 
 def log_audit(case_id, action, details, performed_by):
-    """Log audit trail"""
-    with get_db_connection() as conn:
+    """Log audit trail (joins the caller's transaction when there is one)"""
+    with transaction() as conn:
         cursor = conn.cursor()
         cursor.execute(
             "INSERT INTO audit_logs (case_id, action, details, performed_by) VALUES (?, ?, ?, ?)",
             (case_id, action, details, performed_by)
         )
-        conn.commit()
+
+def _add_column_if_missing(cursor, table, column, definition):
+    """Add a column unless an earlier unversioned release already added it"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    if column not in [row["name"] for row in cursor.fetchall()]:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def _migration_user_master_columns(cursor):
+    """User master fields added after the first release"""
+    _add_column_if_missing(cursor, "users", "name", "TEXT")
+    _add_column_if_missing(cursor, "users", "team", "TEXT")
+    _add_column_if_missing(cursor, "users", "functional_designation", "TEXT")
+    _add_column_if_missing(cursor, "users", "referred_by", "TEXT")
+    _add_column_if_missing(cursor, "users", "all_roles_access", "BOOLEAN DEFAULT 0")
+
+def _migration_hot_path_indexes(cursor):
+    """Secondary indexes for the listing, detail and audit queries in models.py"""
+    statements = [
+        # get_cases_by_status / recent cases: filter on status, newest first
+        "CREATE INDEX IF NOT EXISTS idx_cases_status_created_at ON cases (status, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_cases_created_at ON cases (created_at)",
+        # get_user_stats / leaderboard: OR across the four *_by columns
+        "CREATE INDEX IF NOT EXISTS idx_cases_created_by ON cases (created_by, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_cases_reviewed_by ON cases (reviewed_by, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_cases_approved_by ON cases (approved_by, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_cases_closed_by ON cases (closed_by, created_at)",
+        # Per-case detail lookups
+        "CREATE INDEX IF NOT EXISTS idx_case_comments_case_id ON case_comments (case_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_documents_case_id ON documents (case_id, uploaded_at)",
+        "CREATE INDEX IF NOT EXISTS idx_investigation_details_case_id ON investigation_details (case_id)",
+        # Audit trail, globally and per case
+        "CREATE INDEX IF NOT EXISTS idx_audit_logs_performed_at ON audit_logs (performed_at)",
+        "CREATE INDEX IF NOT EXISTS idx_audit_logs_case_id ON audit_logs (case_id, performed_at)",
+    ]
+    for statement in statements:
+        cursor.execute(statement)
+
+# Columns indexed by the cases_fts full-text table, in FTS column order
+CASE_SEARCH_COLUMNS = [
+    "case_id", "lan", "customer_name", "customer_pan", "branch_location", "case_description"
+]
+
+def _migration_case_search_index(cursor):
+    """FTS5 index over the searchable case columns, plus filter indexes"""
+    columns = ", ".join(CASE_SEARCH_COLUMNS)
+    new_values = ", ".join(f"new.{column}" for column in CASE_SEARCH_COLUMNS)
+    old_values = ", ".join(f"old.{column}" for column in CASE_SEARCH_COLUMNS)
+    
+    # Indexed predicates for the status/region/product/date filters
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cases_region ON cases (region, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cases_product ON cases (product, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cases_case_date ON cases (case_date)")
+    
+    try:
+        cursor.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS cases_fts USING fts5(
+                {columns},
+                content='cases', content_rowid='id',
+                tokenize='unicode61', prefix='2 3 4'
+            )
+        ''')
+    except sqlite3.OperationalError:
+        return  # SQLite built without FTS5; search_cases falls back to LIKE
+    
+    # Keep the external-content index in sync with cases
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS cases_fts_insert AFTER INSERT ON cases BEGIN
+            INSERT INTO cases_fts (rowid, {columns}) VALUES (new.id, {new_values});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS cases_fts_delete AFTER DELETE ON cases BEGIN
+            INSERT INTO cases_fts (cases_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS cases_fts_update AFTER UPDATE OF {columns} ON cases BEGIN
+            INSERT INTO cases_fts (cases_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO cases_fts (rowid, {columns}) VALUES (new.id, {new_values});
+        END
+    ''')
+    cursor.execute("INSERT INTO cases_fts (cases_fts) VALUES ('rebuild')")
+
+def _migration_case_rollups(cursor):
+    """Trigger-maintained daily rollups of case counts and status transitions"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS case_daily_counts (
+            day DATE NOT NULL,
+            status TEXT NOT NULL,
+            region TEXT NOT NULL,
+            product TEXT NOT NULL,
+            case_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, status, region, product)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS case_status_transitions (
+            day DATE NOT NULL,
+            from_status TEXT NOT NULL,
+            to_status TEXT NOT NULL,
+            transition_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, from_status, to_status)
+        ) WITHOUT ROWID
+    ''')
+    
+    _create_case_rollup_triggers(cursor)
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS case_status_transitions_update
+        AFTER UPDATE OF status ON cases
+        WHEN COALESCE(old.status, '') != COALESCE(new.status, '') BEGIN
+            INSERT INTO case_status_transitions (day, from_status, to_status, transition_count)
+            VALUES (date('now'), COALESCE(old.status, ''), COALESCE(new.status, ''), 1)
+            ON CONFLICT (day, from_status, to_status) DO UPDATE SET transition_count = transition_count + 1;
+        END
+    ''')
+    
+    _rebuild_case_rollups(cursor)
+
+def _create_case_rollup_triggers(cursor):
+    """Triggers keeping case_daily_counts current as cases are written"""
+    # case_daily_counts buckets each case by creation day and current status
+    add_new = '''
+        INSERT INTO case_daily_counts (day, status, region, product, case_count)
+        VALUES (date(new.created_at), COALESCE(new.status, ''), COALESCE(new.region, ''),
+                COALESCE(new.product, ''), 1)
+        ON CONFLICT (day, status, region, product) DO UPDATE SET case_count = case_count + 1;
+    '''
+    # Only the key just decremented is checked for deletion, so each write is O(1)
+    old_key = '''
+        day = date(old.created_at) AND status = COALESCE(old.status, '')
+        AND region = COALESCE(old.region, '') AND product = COALESCE(old.product, '')
+    '''
+    remove_old = f'''
+        UPDATE case_daily_counts SET case_count = case_count - 1 WHERE {old_key};
+        DELETE FROM case_daily_counts WHERE {old_key} AND case_count <= 0;
+    '''
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS case_rollups_insert AFTER INSERT ON cases BEGIN
+            {add_new}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS case_rollups_delete AFTER DELETE ON cases BEGIN
+            {remove_old}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS case_rollups_update
+        AFTER UPDATE OF status, region, product, created_at ON cases BEGIN
+            {remove_old}
+            {add_new}
+        END
+    ''')
+
+def _rebuild_case_rollups(cursor):
+    """Recompute the rollup tables from cases and the audit trail"""
+    cursor.execute("DELETE FROM case_daily_counts")
+    cursor.execute('''
+        INSERT INTO case_daily_counts (day, status, region, product, case_count)
+        SELECT date(created_at), COALESCE(status, ''), COALESCE(region, ''),
+               COALESCE(product, ''), COUNT(*)
+        FROM cases
+        GROUP BY 1, 2, 3, 4
+    ''')
+    
+    # Transitions are replayed from the "Case Created" / "Status Update" audit rows
+    cursor.execute("DELETE FROM case_status_transitions")
+    cursor.execute('''
+        WITH events AS (
+            SELECT id, case_id, action, performed_at,
+                   CASE action
+                       WHEN 'Case Created' THEN substr(details, length('Case created with status: ') + 1)
+                       ELSE substr(details, length('Status changed to: ') + 1)
+                   END AS status
+            FROM audit_logs
+            WHERE action IN ('Case Created', 'Status Update')
+        ),
+        ordered AS (
+            SELECT action, date(performed_at) AS day, status AS to_status,
+                   LAG(status) OVER (PARTITION BY case_id ORDER BY performed_at, id) AS from_status
+            FROM events
+        )
+        INSERT INTO case_status_transitions (day, from_status, to_status, transition_count)
+        SELECT day, from_status, to_status, COUNT(*)
+        FROM ordered
+        WHERE action = 'Status Update' AND from_status IS NOT NULL AND from_status != to_status
+        GROUP BY day, from_status, to_status
+    ''')
+
+# Workflow stages for turnaround time: stage -> (start column, end columns,
+# after columns) on cases. A stage ends at the earliest end column at or
+# after its start, so consecutive stages share a boundary and never
+# overlap. A stage only counts while its start is not older than its after
+# columns: sending a case back overwrites reviewed_at, which retires the
+# later stages of the earlier pass.
+TAT_STAGES = {
+    "Review": ("created_at", ("reviewed_at",), ()),
+    "Approval": ("reviewed_at", ("legal_reviewed_at", "approved_at", "closed_at"), ()),
+    "Legal Review": ("legal_reviewed_at", ("approved_at", "closed_at"), ("reviewed_at",)),
+    "Closure": ("approved_at", ("closed_at",), ("reviewed_at", "legal_reviewed_at")),
+}
+
+def _stage_bounds(row_alias, start_column, end_columns, after_columns):
+    """(start, end, condition) SQL expressions of one stage over a cases row"""
+    start = f"{row_alias}.{start_column}"
+    candidates = " UNION ALL ".join(f"SELECT {row_alias}.{column} AS at" for column in end_columns)
+    end = f"(SELECT at FROM ({candidates}) WHERE julianday(at) >= julianday({start}) ORDER BY julianday(at) LIMIT 1)"
+    conditions = [f"{start} IS NOT NULL", f"{end} IS NOT NULL"] + [
+        f"({row_alias}.{column} IS NULL OR julianday({start}) >= julianday({row_alias}.{column}))"
+        for column in after_columns
+    ]
+    return start, end, " AND ".join(conditions)
+
+def _stage_duration_statements(row_alias, source=""):
+    """INSERT OR REPLACE statements recording every completed stage of a case row"""
+    statements = []
+    for stage, columns in TAT_STAGES.items():
+        start, end, condition = _stage_bounds(row_alias, *columns)
+        statements.append(f'''
+            INSERT OR REPLACE INTO case_stage_durations
+                (case_id, stage, started_at, completed_at, duration_days, region, product)
+            SELECT {row_alias}.case_id, '{stage}', {start}, {end},
+                   julianday({end}) - julianday({start}), {row_alias}.region, {row_alias}.product
+            {source}
+            WHERE {condition}
+        ''')
+    return statements
+
+def _create_stage_duration_trigger(cursor):
+    """Trigger re-deriving a case's stage rows whenever a stage timestamp changes"""
+    timestamp_columns = sorted({
+        column for start, ends, afters in TAT_STAGES.values() for column in (start,) + ends + afters
+    })
+    # Stages whose endpoints no longer qualify lose their row
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS case_stage_durations_update
+        AFTER UPDATE OF {", ".join(timestamp_columns)}, region, product ON cases BEGIN
+            DELETE FROM case_stage_durations WHERE case_id = new.case_id;
+            {";".join(_stage_duration_statements("new"))};
+        END
+    ''')
+
+def _migration_stage_durations(cursor):
+    """Per-stage durations maintained as stage timestamps are written"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS case_stage_durations (
+            case_id TEXT NOT NULL,
+            stage TEXT NOT NULL,
+            started_at TIMESTAMP NOT NULL,
+            completed_at TIMESTAMP NOT NULL,
+            duration_days REAL NOT NULL,
+            region TEXT,
+            product TEXT,
+            PRIMARY KEY (case_id, stage)
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_case_stage_durations_completed_at ON case_stage_durations (completed_at)")
+    
+    _create_stage_duration_trigger(cursor)
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS case_stage_durations_delete AFTER DELETE ON cases BEGIN
+            DELETE FROM case_stage_durations WHERE case_id = old.case_id;
+        END
+    ''')
+    
+    _rebuild_stage_durations(cursor)
+
+def _rebuild_stage_durations(cursor):
+    """Recompute case_stage_durations from the cases timestamps"""
+    cursor.execute("DELETE FROM case_stage_durations")
+    for statement in _stage_duration_statements("c", source="FROM cases c"):
+        cursor.execute(statement)
+
+def _migration_contiguous_stages(cursor):
+    """Re-derive stage durations with contiguous, non-overlapping stage boundaries"""
+    cursor.execute("DROP TRIGGER IF EXISTS case_stage_durations_update")
+    _create_stage_duration_trigger(cursor)
+    _rebuild_stage_durations(cursor)
+
+def _migration_keyed_rollup_cleanup(cursor):
+    """Recreate the case_daily_counts triggers so removals delete only the emptied key"""
+    for trigger in ("case_rollups_insert", "case_rollups_delete", "case_rollups_update"):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    _create_case_rollup_triggers(cursor)
+
+def rebuild_case_rollups():
+    """Repair the case rollup and stage duration tables in one transaction"""
+    with transaction() as conn:
+        cursor = conn.cursor()
+        _rebuild_case_rollups(cursor)
+        _rebuild_stage_durations(cursor)
+
+def _migration_background_jobs(cursor):
+    """Persisted queue for long-running admin jobs"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS background_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_type TEXT NOT NULL,
+            params TEXT,
+            status TEXT NOT NULL DEFAULT 'Queued',
+            progress REAL NOT NULL DEFAULT 0,
+            message TEXT,
+            result TEXT,
+            error TEXT,
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            worker_pid INTEGER,
+            created_by TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_background_jobs_status ON background_jobs (status)")
+
+def _migration_document_blobs(cursor):
+    """Content hashes on documents and reference-counted stored blobs"""
+    _add_column_if_missing(cursor, "documents", "content_hash", "TEXT")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_content_hash ON documents (content_hash)")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS document_blobs (
+            content_hash TEXT PRIMARY KEY,
+            file_path TEXT NOT NULL,
+            file_size INTEGER NOT NULL,
+            ref_count INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Each documents row holding a hash is one reference to its blob
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS document_blobs_insert
+        AFTER INSERT ON documents WHEN new.content_hash IS NOT NULL BEGIN
+            INSERT INTO document_blobs (content_hash, file_path, file_size, ref_count)
+            VALUES (new.content_hash, new.file_path, new.file_size, 1)
+            ON CONFLICT (content_hash) DO UPDATE SET ref_count = ref_count + 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS document_blobs_delete
+        AFTER DELETE ON documents WHEN old.content_hash IS NOT NULL BEGIN
+            UPDATE document_blobs SET ref_count = ref_count - 1 WHERE content_hash = old.content_hash;
+        END
+    ''')
+
+def _migration_document_mime_type(cursor):
+    """MIME type sniffed from uploaded documents"""
+    _add_column_if_missing(cursor, "documents", "mime_type", "TEXT")
+
+# Storage accounting scopes: scope -> key expression over a documents row.
+# These count every document's bytes; the 'all' row counts physical bytes
+# (each stored blob once) and is kept by the storage_total_* triggers.
+STORAGE_USAGE_SCOPES = {
+    "case": "{row}.case_id",
+    "user": "{row}.uploaded_by",
+    "month": "substr({row}.uploaded_at, 1, 7)",
+}
+
+def _storage_usage_statements(row_alias, sign):
+    """Statements adding (sign=1) or removing (sign=-1) one document's bytes in storage_usage"""
+    statements = []
+    for scope, key in STORAGE_USAGE_SCOPES.items():
+        key = key.format(row=row_alias)
+        statements.append(f'''
+            INSERT INTO storage_usage (scope, scope_key, file_count, total_bytes)
+            VALUES ('{scope}', COALESCE({key}, ''), {sign}, {sign} * {row_alias}.file_size)
+            ON CONFLICT (scope, scope_key) DO UPDATE SET
+                file_count = file_count + {sign},
+                total_bytes = total_bytes + {sign} * {row_alias}.file_size
+        ''')
+        if sign < 0:
+            # Only the row just decremented, so each write stays O(1)
+            statements.append(f'''
+                DELETE FROM storage_usage
+                WHERE scope = '{scope}' AND scope_key = COALESCE({key}, '') AND file_count <= 0
+            ''')
+    return statements
+
+def _migration_storage_usage(cursor):
+    """Trigger-maintained document storage totals per case, user and month"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS storage_usage (
+            scope TEXT NOT NULL,
+            scope_key TEXT NOT NULL,
+            file_count INTEGER NOT NULL DEFAULT 0,
+            total_bytes INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (scope, scope_key)
+        ) WITHOUT ROWID
+    ''')
+    
+    _create_storage_usage_triggers(cursor)
+    _rebuild_storage_usage(cursor)
+
+def _create_storage_usage_triggers(cursor):
+    """Triggers keeping the per-case, user and month storage_usage rows current"""
+    add_new = ";".join(_storage_usage_statements("new", 1))
+    remove_old = ";".join(_storage_usage_statements("old", -1))
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS storage_usage_insert AFTER INSERT ON documents BEGIN
+            {add_new};
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS storage_usage_delete AFTER DELETE ON documents BEGIN
+            {remove_old};
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS storage_usage_update
+        AFTER UPDATE OF case_id, uploaded_by, uploaded_at, file_size ON documents BEGIN
+            {remove_old};
+            {add_new};
+        END
+    ''')
+
+def _physical_storage_statement(row_alias, sign):
+    """Statement adding (sign=1) or removing (sign=-1) one stored file's bytes in the 'all' row"""
+    return f'''
+        UPDATE storage_usage SET
+            file_count = file_count + {sign},
+            total_bytes = total_bytes + {sign} * {row_alias}.file_size
+        WHERE scope = 'all' AND scope_key = ''
+    '''
+
+# Triggers maintaining the physical 'all' total: name -> (event, statement)
+PHYSICAL_STORAGE_TRIGGERS = {
+    # Documents without a content hash are legacy files stored once per row
+    "storage_total_legacy_insert": (
+        "AFTER INSERT ON documents WHEN new.content_hash IS NULL", _physical_storage_statement("new", 1)
+    ),
+    "storage_total_legacy_delete": (
+        "AFTER DELETE ON documents WHEN old.content_hash IS NULL", _physical_storage_statement("old", -1)
+    ),
+    # A blob counts while at least one document references it
+    "storage_total_blob_insert": (
+        "AFTER INSERT ON document_blobs WHEN new.ref_count > 0", _physical_storage_statement("new", 1)
+    ),
+    "storage_total_blob_referenced": (
+        "AFTER UPDATE OF ref_count ON document_blobs WHEN old.ref_count <= 0 AND new.ref_count > 0",
+        _physical_storage_statement("new", 1)
+    ),
+    "storage_total_blob_unreferenced": (
+        "AFTER UPDATE OF ref_count ON document_blobs WHEN old.ref_count > 0 AND new.ref_count <= 0",
+        _physical_storage_statement("old", -1)
+    ),
+    "storage_total_blob_delete": (
+        "AFTER DELETE ON document_blobs WHEN old.ref_count > 0", _physical_storage_statement("old", -1)
+    ),
+}
+
+def _migration_physical_storage_total(cursor):
+    """Count each deduplicated blob once in the 'all' storage total"""
+    # Recreate the document triggers without the old per-document 'all' row
+    for trigger in ("storage_usage_insert", "storage_usage_delete", "storage_usage_update"):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    _create_storage_usage_triggers(cursor)
+    
+    for name, (event, statement) in PHYSICAL_STORAGE_TRIGGERS.items():
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {statement}; END")
+    
+    _rebuild_storage_usage(cursor)
+
+def _migration_keyed_storage_cleanup(cursor):
+    """Recreate the storage_usage triggers so removals delete only the emptied row"""
+    for trigger in ("storage_usage_insert", "storage_usage_delete", "storage_usage_update"):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    _create_storage_usage_triggers(cursor)
+
+def _rebuild_storage_usage(cursor):
+    """Recompute storage_usage from documents and document_blobs"""
+    cursor.execute("DELETE FROM storage_usage")
+    for scope, key in STORAGE_USAGE_SCOPES.items():
+        cursor.execute(f'''
+            INSERT INTO storage_usage (scope, scope_key, file_count, total_bytes)
+            SELECT '{scope}', COALESCE({key.format(row="d")}, ''), COUNT(*), COALESCE(SUM(d.file_size), 0)
+            FROM documents d
+            GROUP BY 2
+        ''')
+    cursor.execute('''
+        INSERT INTO storage_usage (scope, scope_key, file_count, total_bytes)
+        SELECT 'all', '', COUNT(*), COALESCE(SUM(file_size), 0) FROM (
+            SELECT file_size FROM document_blobs WHERE ref_count > 0
+            UNION ALL
+            SELECT file_size FROM documents WHERE content_hash IS NULL
+        )
+    ''')
+
+def _migration_ai_analyses(cursor):
+    """Stored AI case analyses, one per case and prompt version"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ai_analyses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            case_id TEXT NOT NULL,
+            prompt_version INTEGER NOT NULL,
+            input_hash TEXT NOT NULL,
+            model TEXT NOT NULL,
+            analysis TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (case_id, prompt_version),
+            FOREIGN KEY (case_id) REFERENCES cases (case_id)
+        )
+    ''')
+
+def _migration_case_vectors(cursor):
+    """Stored case vectors for similar-case lookups"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS case_vectors (
+            case_id TEXT PRIMARY KEY,
+            source_hash TEXT NOT NULL,
+            vector BLOB NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (case_id) REFERENCES cases (case_id)
+        )
+    ''')
+
+def _migration_job_heartbeats(cursor):
+    """Heartbeat lease on background jobs so any process can tell live jobs from dead ones"""
+    _add_column_if_missing(cursor, "background_jobs", "heartbeat_at", "TIMESTAMP")
+    cursor.execute('''
+        UPDATE background_jobs SET heartbeat_at = COALESCE(started_at, created_at)
+        WHERE heartbeat_at IS NULL
+    ''')
+
+# Identifier columns indexed by cases_id_fts for substring matches
+CASE_ID_SEARCH_COLUMNS = ["case_id", "lan"]
+
+def _migration_case_id_fragment_index(cursor):
+    """Trigram FTS5 index so fragments from the middle of a case ID or LAN match"""
+    columns = ", ".join(CASE_ID_SEARCH_COLUMNS)
+    new_values = ", ".join(f"new.{column}" for column in CASE_ID_SEARCH_COLUMNS)
+    old_values = ", ".join(f"old.{column}" for column in CASE_ID_SEARCH_COLUMNS)
+    
+    try:
+        cursor.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS cases_id_fts USING fts5(
+                {columns},
+                content='cases', content_rowid='id',
+                tokenize='trigram'
+            )
+        ''')
+    except sqlite3.OperationalError:
+        return  # No FTS5 or no trigram tokenizer (SQLite < 3.34); searches use cases_fts or LIKE
+    
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS cases_id_fts_insert AFTER INSERT ON cases BEGIN
+            INSERT INTO cases_id_fts (rowid, {columns}) VALUES (new.id, {new_values});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS cases_id_fts_delete AFTER DELETE ON cases BEGIN
+            INSERT INTO cases_id_fts (cases_id_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS cases_id_fts_update AFTER UPDATE OF {columns} ON cases BEGIN
+            INSERT INTO cases_id_fts (cases_id_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO cases_id_fts (rowid, {columns}) VALUES (new.id, {new_values});
+        END
+    ''')
+    cursor.execute("INSERT INTO cases_id_fts (cases_id_fts) VALUES ('rebuild')")
+
+def rebuild_storage_usage():
+    """Repair the storage_usage totals in one transaction"""
+    with transaction() as conn:
+        _rebuild_storage_usage(conn.cursor())
+
+# Ordered schema migrations: (version, description, function(cursor)).
+# Append new entries; never edit or reorder ones that have shipped.
+MIGRATIONS = [
+    (1, "User master columns", _migration_user_master_columns),
+    (2, "Hot path secondary indexes", _migration_hot_path_indexes),
+    (3, "Case full-text search index", _migration_case_search_index),
+    (4, "Case rollup tables", _migration_case_rollups),
+    (5, "Case stage durations", _migration_stage_durations),
+    (6, "Background jobs", _migration_background_jobs),
+    (7, "Deduplicated document blobs", _migration_document_blobs),
+    (8, "Document MIME types", _migration_document_mime_type),
+    (9, "Document storage usage", _migration_storage_usage),
+    (10, "AI case analyses", _migration_ai_analyses),
+    (11, "Similar case vectors", _migration_case_vectors),
+    (12, "Physical storage total", _migration_physical_storage_total),
+    (13, "Keyed storage usage cleanup", _migration_keyed_storage_cleanup),
+    (14, "Contiguous TAT stages", _migration_contiguous_stages),
+    (15, "Keyed case rollup cleanup", _migration_keyed_rollup_cleanup),
+    (16, "Background job heartbeats", _migration_job_heartbeats),
+    (17, "Case ID fragment search", _migration_case_id_fragment_index),
+]
+
+def get_schema_version(conn):
+    """Get the highest applied migration version"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+    return cursor.fetchone()[0]
+
+def run_migrations(conn):
+    """Apply pending migrations, each in its own transaction"""
+    current_version = get_schema_version(conn)
+    conn.commit()
+    
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        if version <= current_version:
+            continue
+        cursor = conn.cursor()
+        try:
+            # Explicit BEGIN so DDL is rolled back with the rest on failure
+            cursor.execute("BEGIN IMMEDIATE")
+            # Another process may have applied it while we waited for the lock
+            cursor.execute("SELECT 1 FROM schema_migrations WHERE version = ?", (version,))
+            if cursor.fetchone():
+                conn.rollback()
+                continue
+            migrate(cursor)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, description) VALUES (?, ?)",
+                (version, description)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+def explain_query_plan(query, params=()):
+    """Return the EXPLAIN QUERY PLAN detail lines for a query"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"EXPLAIN QUERY PLAN {query}", params)
+        return [row["detail"] for row in cursor.fetchall()]
+
+def find_full_table_scans(query, params=()):
+    """Return plan steps that read a whole table without an index.
+    
+    Scans of materialized or co-routine subqueries read rows an earlier
+    plan step already selected, so they are not reported.
+    """
+    details = explain_query_plan(query, params)
+    subqueries = {
+        detail.split(" ", 1)[1] for detail in details
+        if detail.startswith(("MATERIALIZE ", "CO-ROUTINE "))
+    }
+    return [
+        detail for detail in details
+        if detail.startswith("SCAN ") and " USING " not in detail
+        and "VIRTUAL TABLE" not in detail and detail[len("SCAN "):] not in subqueries
+    ]
@@ -0,0 +1,261 @@
+import hashlib
+import mimetypes
+import os
+import time
+import uuid
+from database import get_db_connection, transaction, call_after_commit, rebuild_storage_usage
+
+# Content-addressed evidence store: uploads/objects/ab/cd/<sha256>.
+# Two levels of two hex characters cap any directory at 256 entries
+# above the leaves and spread the files evenly.
+UPLOADS_DIR = "uploads"
+OBJECTS_DIR = os.path.join(UPLOADS_DIR, "objects")
+INCOMING_DIR = os.path.join(UPLOADS_DIR, "incoming")
+
+# Bytes read from an upload per write/hash step
+STORE_CHUNK_BYTES = 1024 * 1024
+
+def blob_path(content_hash):
+    """Sharded path of the blob with this SHA-256 hex digest"""
+    return os.path.join(OBJECTS_DIR, content_hash[:2], content_hash[2:4], content_hash)
+
+# Leading bytes of common evidence formats -> MIME type. Office files are
+# containers (OLE or ZIP), so those fall back to the extension below.
+MIME_SIGNATURES = [
+    (b"%PDF-", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF8", "image/gif"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+]
+CONTAINER_SIGNATURES = [b"PK\x03\x04", b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"]
+
+def detect_mime_type(head, filename=None):
+    """Guess a MIME type from the first bytes of a file, falling back to its name"""
+    for signature, mime_type in MIME_SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    guessed = mimetypes.guess_type(filename)[0] if filename else None
+    if guessed:
+        return guessed
+    if any(head.startswith(signature) for signature in CONTAINER_SIGNATURES):
+        return "application/zip" if head.startswith(b"PK") else "application/x-ole-storage"
+    return "application/octet-stream"
+
+def _iter_chunks(source, chunk_size=STORE_CHUNK_BYTES):
+    """Read a file-like object in chunks from the start"""
+    if hasattr(source, "seek"):
+        source.seek(0)
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+def store_blob(source, filename=None):
+    """Stream a file-like object into the store, hashing while writing.
+    
+    Returns (content_hash, file_path, file_size, mime_type). Only one chunk
+    is held in memory at a time. Identical content is stored once; a
+    second copy is discarded after hashing.
+    """
+    os.makedirs(INCOMING_DIR, exist_ok=True)
+    temp_path = os.path.join(INCOMING_DIR, f"{uuid.uuid4().hex}.tmp")
+    
+    digest = hashlib.sha256()
+    file_size = 0
+    mime_type = None
+    try:
+        with open(temp_path, "wb") as f:
+            for chunk in _iter_chunks(source):
+                if mime_type is None:
+                    mime_type = detect_mime_type(chunk[:64], filename)
+                digest.update(chunk)
+                f.write(chunk)
+                file_size += len(chunk)
+        
+        content_hash = digest.hexdigest()
+        file_path = blob_path(content_hash)
+        try:
+            # Touch the existing copy so reconcile_storage leaves it alone
+            # until the document row referencing it has committed
+            os.utime(file_path)
+            os.remove(temp_path)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            os.replace(temp_path, file_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    
+    return content_hash, file_path, file_size, mime_type or detect_mime_type(b"", filename)
+
+def get_blob(content_hash):
+    """Get the blob row for a content hash"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM document_blobs WHERE content_hash = ?", (content_hash,))
+        return cursor.fetchone()
+
+# Unreferenced files younger than this may belong to an upload whose
+# case transaction has not committed yet
+ORPHAN_GRACE_SECONDS = 3600
+
+def _within_grace(path):
+    """Check whether a file was written or touched during the grace period"""
+    try:
+        return time.time() - os.stat(path).st_mtime <= ORPHAN_GRACE_SECONDS
+    except FileNotFoundError:
+        return False
+
+def collect_unreferenced_blobs():
+    """Delete blobs no document refers to any more, returning how many were removed.
+    
+    Blobs touched within ORPHAN_GRACE_SECONDS are kept: store_blob touches
+    a blob on every upload of its content, before the documents row that
+    references it commits.
+    """
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT content_hash FROM document_blobs WHERE ref_count <= 0")
+        hashes = [row["content_hash"] for row in cursor.fetchall()]
+        hashes = [content_hash for content_hash in hashes if not _within_grace(blob_path(content_hash))]
+        cursor.executemany("DELETE FROM document_blobs WHERE content_hash = ?", [(h,) for h in hashes])
+        
+        def remove_files():
+            for content_hash in hashes:
+                path = blob_path(content_hash)
+                # Re-check: an upload may have deduplicated to it since the rows went
+                if os.path.exists(path) and not _within_grace(path):
+                    os.remove(path)
+        
+        # Only remove files once the rows are gone for good
+        call_after_commit(remove_files)
+    return len(hashes)
+
+def get_storage_usage(scope, limit=None):
+    """Get storage totals for a scope ('case', 'user' or 'month'), largest first"""
+    query = "SELECT scope_key, file_count, total_bytes FROM storage_usage WHERE scope = ? ORDER BY total_bytes DESC"
+    params = [scope]
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+def get_storage_total():
+    """Get (file_count, total_bytes) of the files actually stored, each blob counted once"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT file_count, total_bytes FROM storage_usage WHERE scope = 'all'")
+        row = cursor.fetchone()
+        return (row["file_count"], row["total_bytes"]) if row else (0, 0)
+
+def _walk_files(directory):
+    """Yield file paths under a directory, skipping in-flight incoming writes"""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.path != INCOMING_DIR:
+                    yield from _walk_files(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                yield entry.path
+
+def _in_object_store(path):
+    """Check whether a path lies inside the content-addressed object store"""
+    objects_dir = os.path.abspath(OBJECTS_DIR)
+    return os.path.commonpath([objects_dir, os.path.abspath(path)]) == objects_dir
+
+def _remove_orphans(paths):
+    """Delete object-store files that are still unreferenced and past the grace period.
+    
+    The check runs under the write lock, so no document row referencing a
+    file can commit between the check and the delete. Files outside
+    OBJECTS_DIR are never deleted.
+    """
+    removed = 0
+    with transaction() as conn:
+        cursor = conn.cursor()
+        for path in paths:
+            if not _in_object_store(path):
+                continue
+            cursor.execute('''
+                SELECT 1 FROM documents WHERE file_path = ?
+                UNION ALL
+                SELECT 1 FROM document_blobs WHERE file_path = ?
+                LIMIT 1
+            ''', (path, path))
+            if cursor.fetchone():
+                continue
+            try:
+                # A deduplicated upload may have touched the file since the scan
+                if _within_grace(path):
+                    continue
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            removed += 1
+    return removed
+
+def reconcile_storage(remove_orphans=False, job=None):
+    """Repair storage totals and compare documents rows with the files on disk.
+    
+    Orphaned files are blobs in the object store that nothing references;
+    missing files are referenced by a row but absent on disk. Other files
+    under uploads/ (flat files from before the object store) are only
+    counted as untracked and never deleted. Orphans older than
+    ORPHAN_GRACE_SECONDS are deleted when remove_orphans is set.
+    """
+    if job is not None:
+        job.report(0.0, "Rebuilding storage totals")
+    rebuild_storage_usage()
+    unreferenced_blobs = collect_unreferenced_blobs()
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT DISTINCT file_path FROM documents")
+        referenced = {os.path.normpath(row["file_path"]) for row in cursor.fetchall()}
+        cursor.execute("SELECT file_path FROM document_blobs")
+        blob_paths = {os.path.normpath(row["file_path"]) for row in cursor.fetchall()}
+    
+    on_disk = set()
+    if os.path.exists(UPLOADS_DIR):
+        for count, path in enumerate(_walk_files(UPLOADS_DIR), 1):
+            on_disk.add(os.path.normpath(path))
+            if job is not None and count % 5000 == 0:
+                job.check_cancelled()
+                job.report(0.5, f"Scanned {count} files")
+    
+    if job is not None:
+        job.report(0.8, "Comparing files with documents")
+    unreferenced = on_disk - referenced - blob_paths
+    orphaned = sorted(path for path in unreferenced if _in_object_store(path))
+    untracked = len(unreferenced) - len(orphaned)
+    missing = sorted(referenced - on_disk)
+    
+    orphaned_bytes = 0
+    removable = []
+    now = time.time()
+    for path in orphaned:
+        stat = os.stat(path)
+        orphaned_bytes += stat.st_size
+        if remove_orphans and now - stat.st_mtime > ORPHAN_GRACE_SECONDS:
+            removable.append(path)
+    removed = _remove_orphans(removable) if removable else 0
+    
+    return {
+        "files_on_disk": len(on_disk),
+        "orphaned_files": len(orphaned),
+        "orphaned_bytes": orphaned_bytes,
+        "missing_files": len(missing),
+        "untracked_files": untracked,
+        "removed_orphans": removed,
+        "unreferenced_blobs": unreferenced_blobs,
+        # A sample for the admin page; the counts above are complete
+        "orphaned_sample": orphaned[:20],
+        "missing_sample": missing[:20],
+    }
@@ -0,0 +1,33 @@
+import streamlit as st
+from models import get_documents_for_cases
+from previews import get_preview, render_previews, previews_pending, is_rendering
+
+# Width of inline document previews in the case panels
+PREVIEW_DISPLAY_WIDTH = 240
+
+# How often a page checks whether its remaining previews have rendered
+PREVIEW_POLL_INTERVAL = "2s"
+
+def prepare_case_previews(cases):
+    """Render the previews for a page of cases up front, waiting for them together.
+    
+    Previews still rendering after the shared deadline show a placeholder,
+    and the page reruns once they are ready.
+    """
+    documents = get_documents_for_cases([case["case_id"] for case in cases])
+    rendering = render_previews(documents)
+    if rendering:
+        st.fragment(_rerun_when_rendered, run_every=PREVIEW_POLL_INTERVAL)(rendering)
+
+def _rerun_when_rendered(keys):
+    """Rerun the page once none of these previews is rendering any more"""
+    if not previews_pending(keys):
+        st.rerun()
+
+def show_document_preview(document):
+    """Show an inline preview of a case document when one has been rendered"""
+    path = get_preview(document)
+    if path:
+        st.image(path, caption=document["original_filename"], width=PREVIEW_DISPLAY_WIDTH)
+    elif is_rendering(document):
+        st.caption(f"🖼️ Preview of {document['original_filename']} is being generated…")
@@ -0,0 +1,265 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from database import get_db_connection, transaction
+import maintenance
+
+# Worker threads for background jobs; SQLite releases the GIL during
+# VACUUM/ANALYZE/exports, so threads keep the Streamlit script threads free
+JOB_WORKERS = 2
+
+JOB_STATUSES = ["Queued", "Running", "Succeeded", "Failed", "Cancelled"]
+FINISHED_STATUSES = ["Succeeded", "Failed", "Cancelled"]
+
+# Each process refreshes heartbeat_at on the jobs it owns; a Queued/Running job
+# whose heartbeat is older than the lease belongs to a process that has died
+JOB_HEARTBEAT_SECONDS = 30
+JOB_LEASE_SECONDS = 300
+
+# Job type -> (label, function(job, **params))
+JOB_TYPES = {
+    "backup": ("Database Backup", maintenance.create_database_backup),
+    "vacuum": ("Vacuum Database", maintenance.vacuum_database),
+    "analyze": ("Analyze Database", maintenance.analyze_database),
+    "reindex": ("Rebuild Database Indexes", maintenance.rebuild_database_indexes),
+    "rebuild_rollups": ("Rebuild Case Rollups", maintenance.rebuild_rollups),
+    "export_all_data": ("Export All Data", maintenance.export_all_data),
+    "parquet_snapshot": ("Export Parquet Snapshot", maintenance.export_parquet_snapshot),
+    "prune_exports": ("Prune Old Exports", maintenance.prune_exports),
+    "reconcile_storage": ("Reconcile Document Storage", maintenance.reconcile_document_storage),
+    "report_bundle": ("Investigation Report Bundle", maintenance.export_report_bundle),
+    "case_analysis": ("Batch Case Analysis", maintenance.analyze_case_queue),
+    "similar_case_index": ("Rebuild Similar Case Index", maintenance.rebuild_similar_cases),
+}
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="tathya-job")
+_owned_lock = threading.Lock()
+_owned_jobs = set()
+_heartbeat_thread = None
+_recovery_lock = threading.Lock()
+_last_recovery = None
+
+class JobCancelled(Exception):
+    """Raised inside a job when an admin has asked for it to stop"""
+
+class JobContext:
+    """Handle passed to job functions for progress reporting and cancellation"""
+    
+    def __init__(self, job_id):
+        self.job_id = job_id
+    
+    def report(self, progress, message=None):
+        """Record progress (0.0-1.0) and an optional status message"""
+        with transaction() as conn:
+            conn.execute(
+                "UPDATE background_jobs SET progress = ?, message = COALESCE(?, message), "
+                "heartbeat_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (max(0.0, min(1.0, progress)), message, self.job_id)
+            )
+    
+    def cancelled(self):
+        """Check whether cancellation has been requested"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT cancel_requested FROM background_jobs WHERE id = ?", (self.job_id,))
+            row = cursor.fetchone()
+            return bool(row and row["cancel_requested"])
+    
+    def check_cancelled(self):
+        """Raise JobCancelled if cancellation has been requested"""
+        if self.cancelled():
+            raise JobCancelled()
+
+def _set_job_state(job_id, status, **fields):
+    """Update a job's status and any extra columns; finished states get finished_at"""
+    assignments = ["status = ?"] + [f"{name} = ?" for name in fields]
+    if status in FINISHED_STATUSES:
+        assignments.append("finished_at = CURRENT_TIMESTAMP")
+    with transaction() as conn:
+        conn.execute(
+            f"UPDATE background_jobs SET {', '.join(assignments)} WHERE id = ?",
+            [status] + list(fields.values()) + [job_id]
+        )
+
+def _run_job(job_id, job_type, params):
+    """Executor entry point: run one job and persist its outcome"""
+    try:
+        _execute_job(job_id, job_type, params)
+    finally:
+        with _owned_lock:
+            _owned_jobs.discard(job_id)
+
+def _execute_job(job_id, job_type, params):
+    """Claim a queued job, run its function and record the result"""
+    job = JobContext(job_id)
+    
+    # Claim the job unless it was cancelled while queued
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE background_jobs
+            SET status = 'Running', started_at = CURRENT_TIMESTAMP, heartbeat_at = CURRENT_TIMESTAMP, worker_pid = ?
+            WHERE id = ? AND status = 'Queued' AND cancel_requested = 0
+        ''', (os.getpid(), job_id))
+        claimed = cursor.rowcount == 1
+    if not claimed:
+        _set_job_state(job_id, "Cancelled")
+        return
+    
+    _, function = JOB_TYPES[job_type]
+    try:
+        result = function(job=job, **params)
+        _set_job_state(job_id, "Succeeded", progress=1.0, result=json.dumps(result, default=str))
+    except JobCancelled:
+        _set_job_state(job_id, "Cancelled", message="Cancelled by request")
+    except Exception as e:
+        _set_job_state(job_id, "Failed", error=f"{e}\n{traceback.format_exc()}")
+
+def _heartbeat_loop():
+    """Refresh the lease on every job this process has queued or is running"""
+    while True:
+        time.sleep(JOB_HEARTBEAT_SECONDS)
+        with _owned_lock:
+            job_ids = list(_owned_jobs)
+        if not job_ids:
+            continue
+        placeholders = ",".join("?" * len(job_ids))
+        try:
+            with transaction() as conn:
+                conn.execute(f'''
+                    UPDATE background_jobs SET heartbeat_at = CURRENT_TIMESTAMP
+                    WHERE id IN ({placeholders}) AND status IN ('Queued', 'Running')
+                ''', job_ids)
+        except sqlite3.Error:
+            # A long write (VACUUM, backup) held the lock; the lease outlasts a few misses
+            pass
+
+def _own_job(job_id):
+    """Track a job for heartbeats, starting the heartbeat thread on first use"""
+    global _heartbeat_thread
+    with _owned_lock:
+        _owned_jobs.add(job_id)
+        if _heartbeat_thread is None:
+            _heartbeat_thread = threading.Thread(target=_heartbeat_loop, name="tathya-job-heartbeat", daemon=True)
+            _heartbeat_thread.start()
+
+def recover_interrupted_jobs():
+    """Mark Queued/Running jobs whose heartbeat lease has expired as Failed.
+    
+    Works across server processes: a job is only recovered once its owner
+    has stopped refreshing heartbeat_at, never because it belongs to another
+    process. Runs at most once per heartbeat interval.
+    """
+    global _last_recovery
+    with _recovery_lock:
+        now = time.monotonic()
+        if _last_recovery is not None and now - _last_recovery < JOB_HEARTBEAT_SECONDS:
+            return
+        _last_recovery = now
+    
+    with _owned_lock:
+        owned = list(_owned_jobs)
+    placeholders = ",".join("?" * len(owned))
+    with transaction() as conn:
+        conn.execute(f'''
+            UPDATE background_jobs
+            SET status = 'Failed', error = 'Interrupted: worker stopped responding', finished_at = CURRENT_TIMESTAMP
+            WHERE status IN ('Queued', 'Running')
+              AND COALESCE(heartbeat_at, created_at) < datetime('now', ?)
+              AND id NOT IN ({placeholders})
+        ''', [f"-{JOB_LEASE_SECONDS} seconds"] + owned)
+
+def _active_job_exists(cursor, job_type=None):
+    """Check for a queued or running job of this type (or of any type)"""
+    query = "SELECT 1 FROM background_jobs WHERE status IN ('Queued', 'Running')"
+    params = []
+    if job_type:
+        query += " AND job_type = ?"
+        params.append(job_type)
+    cursor.execute(query + " LIMIT 1", params)
+    return cursor.fetchone() is not None
+
+def _queue_job(job_type, created_by, params, unique=False, interval_hours=None):
+    """Insert and dispatch a job; the duplicate and schedule checks share the insert's write lock"""
+    if job_type not in JOB_TYPES:
+        raise ValueError(f"Unknown job type: {job_type}")
+    recover_interrupted_jobs()
+    
+    with transaction() as conn:
+        cursor = conn.cursor()
+        if unique and _active_job_exists(cursor, job_type):
+            return None
+        if interval_hours is not None:
+            cursor.execute('''
+                SELECT 1 FROM background_jobs
+                WHERE job_type = ? AND status = 'Succeeded' AND finished_at > datetime('now', ?)
+                LIMIT 1
+            ''', (job_type, f"-{interval_hours} hours"))
+            if cursor.fetchone():
+                return None
+        cursor.execute('''
+            INSERT INTO background_jobs (job_type, params, created_by, worker_pid, heartbeat_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ''', (job_type, json.dumps(params), created_by, os.getpid()))
+        job_id = cursor.lastrowid
+    
+    _own_job(job_id)
+    _executor.submit(_run_job, job_id, job_type, params)
+    return job_id
+
+def submit_job(job_type, created_by, **params):
+    """Queue a job for the background workers and return its id"""
+    return _queue_job(job_type, created_by, params)
+
+def submit_unique_job(job_type, created_by, **params):
+    """Queue a job unless one of the same type is already queued or running; returns the job id or None"""
+    return _queue_job(job_type, created_by, params, unique=True)
+
+def cancel_job(job_id):
+    """Request cancellation; queued jobs never start, running jobs stop at their next check"""
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE background_jobs SET cancel_requested = 1 WHERE id = ? AND status IN ('Queued', 'Running')",
+            (job_id,)
+        )
+
+def get_job(job_id):
+    """Get one job row"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM background_jobs WHERE id = ?", (job_id,))
+        return cursor.fetchone()
+
+def list_jobs(limit=20):
+    """Get the most recent jobs, newest first"""
+    recover_interrupted_jobs()
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM background_jobs ORDER BY id DESC LIMIT ?", (limit,))
+        return cursor.fetchall()
+
+def has_active_job(job_type=None):
+    """Check whether a job of this type (or of any type) is queued or running"""
+    recover_interrupted_jobs()
+    with get_db_connection() as conn:
+        return _active_job_exists(conn.cursor(), job_type)
+
+def get_latest_job(job_type, status=None):
+    """Get the newest job of a type, optionally with a given status"""
+    query = "SELECT * FROM background_jobs WHERE job_type = ?"
+    params = [job_type]
+    if status:
+        query += " AND status = ?"
+        params.append(status)
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query + " ORDER BY id DESC LIMIT 1", params)
+        return cursor.fetchone()
+
+def submit_if_due(job_type, interval_hours, created_by, **params):
+    """Queue a periodic job when its last run is older than interval_hours; returns the job id or None"""
+    return _queue_job(job_type, created_by, params, unique=True, interval_hours=interval_hours)
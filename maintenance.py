@@ -0,0 +1,134 @@
+import os
+import shutil
+import time
+from datetime import datetime
+from database import get_db_connection, rebuild_case_rollups
+from utils import export_query_to_csv_file
+from backups import create_backup
+from document_store import reconcile_storage
+from reports import generate_report_bundle, REPORT_BUNDLES_DIR
+from case_analysis import analyze_cases
+from similar_cases import rebuild_similar_case_index
+
+# Tables written by export_all_data: file prefix -> query
+EXPORT_QUERIES = {
+    "cases_export": "SELECT * FROM cases",
+    # Users without password hashes
+    "users_export": "SELECT id, username, role, email, created_at, is_active FROM users",
+    "audit_logs": "SELECT * FROM audit_logs"
+}
+
+EXPORTS_DIR = "exports"
+
+# Streamed CSV exports and report bundles are deleted after this many
+# days; only the newest SNAPSHOT_RETENTION Parquet snapshots are kept
+EXPORT_RETENTION_DAYS = 7
+PRUNED_EXPORT_DIRS = [EXPORTS_DIR, REPORT_BUNDLES_DIR]
+SNAPSHOT_RETENTION = 3
+
+def _report(job, progress, message):
+    """Report progress when running as a background job"""
+    if job is not None:
+        job.report(progress, message)
+
+def create_database_backup(compress=True, job=None):
+    """Create an online backup of the live database in backups/"""
+    _report(job, 0.0, "Starting online backup")
+    return create_backup(compress=compress, job=job)
+
+def rebuild_database_indexes(job=None):
+    """Rebuild database indexes"""
+    _report(job, 0.0, "Rebuilding indexes")
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("REINDEX")
+        conn.commit()
+
+def vacuum_database(job=None):
+    """Vacuum database to reclaim space"""
+    _report(job, 0.0, "Vacuuming database")
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("VACUUM")
+        conn.commit()
+
+def analyze_database(job=None):
+    """Analyze database for optimization"""
+    _report(job, 0.0, "Analyzing database")
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("ANALYZE")
+        conn.commit()
+
+def rebuild_rollups(job=None):
+    """Recompute the case rollup and stage duration tables"""
+    _report(job, 0.0, "Rebuilding case rollups")
+    rebuild_case_rollups()
+
+def export_all_data(compress=False, job=None):
+    """Stream every exportable table to CSV files in exports/"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    
+    exported_files = []
+    for i, (prefix, query) in enumerate(EXPORT_QUERIES.items()):
+        if job is not None:
+            job.check_cancelled()
+        _report(job, i / len(EXPORT_QUERIES), f"Exporting {prefix}")
+        exported_files.append(
+            export_query_to_csv_file(query, (), os.path.join("exports", f"{prefix}_{timestamp}.csv"), compress=compress)
+        )
+    return {"files": exported_files}
+
+def prune_exports(retention_days=EXPORT_RETENTION_DAYS, snapshot_retention=SNAPSHOT_RETENTION, job=None):
+    """Delete exported files (and abandoned temp files) older than retention_days, and old snapshots"""
+    from snapshots import list_snapshots
+    
+    _report(job, 0.0, "Pruning old exports")
+    cutoff = time.time() - retention_days * 86400
+    removed = 0
+    freed_bytes = 0
+    for directory in PRUNED_EXPORT_DIRS:
+        if not os.path.isdir(directory):
+            continue
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                stat = entry.stat()
+                if stat.st_mtime >= cutoff:
+                    continue
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    continue
+                removed += 1
+                freed_bytes += stat.st_size
+    
+    snapshots_removed = list_snapshots()[snapshot_retention:]
+    for snapshot_dir in snapshots_removed:
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+    return {"removed": removed, "freed_bytes": freed_bytes, "snapshots_removed": len(snapshots_removed)}
+
+def export_parquet_snapshot(job=None):
+    """Write a month-partitioned Parquet snapshot of cases, audit logs and comments"""
+    from snapshots import export_snapshot
+    
+    _report(job, 0.0, "Writing Parquet snapshot")
+    return {"row_counts": export_snapshot()}
+
+def reconcile_document_storage(remove_orphans=False, job=None):
+    """Repair storage totals and report orphaned or missing document files"""
+    return reconcile_storage(remove_orphans=remove_orphans, job=job)
+
+def export_report_bundle(status=None, date_from=None, date_to=None, region=None, product=None, job=None):
+    """Render investigation reports for the matching cases into a ZIP in exports/reports/"""
+    return generate_report_bundle(status=status, date_from=date_from, date_to=date_to,
+                                  region=region, product=product, job=job)
+
+def analyze_case_queue(status="Submitted", force=False, job=None):
+    """Run smart case analysis over every changed case in a status"""
+    return analyze_cases(status=status, force=force, job=job)
+
+def rebuild_similar_cases(job=None):
+    """Re-index every case for similar-case lookups"""
+    return rebuild_similar_case_index(job=job)
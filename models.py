@@ -1,6 +1,9 @@
+import re
 import sqlite3
 from datetime import datetime
-from database import get_db_connection, log_audit
+from database import get_db_connection, transaction, call_after_commit, log_audit, find_full_table_scans
+from similar_cases import mark_case_changed
+from cache import TTLCache
 
 def get_user_by_username(username):
     """Get user by username"""
@@ -16,7 +19,7 @@ def get_user_role(username):
 
 def create_case(case_data, created_by):
     """Create a new case"""
-    with get_db_connection() as conn:
+    with transaction() as conn:
         cursor = conn.cursor()
         
         # Check if case_id already exists
@@ -52,48 +55,120 @@ def create_case(case_data, created_by):
             case_data.get("disbursement_date", "")
         ))
         
-        conn.commit()
+        invalidate_case_caches()
+        mark_case_changed(case_data["case_id"])
         
-        # Log audit
+        # Log audit in the same transaction
         log_audit(case_data["case_id"], "Case Created", f"Case created with status: {case_data.get('status', 'Draft')}", created_by)
         
         return True, "Case created successfully"
 
-def get_cases_by_status(status=None, created_by=None):
-    """Get cases by status and/or creator"""
+DEFAULT_PAGE_SIZE = 20
+
+def _case_filter_conditions(status=None, created_by=None):
+    """WHERE conditions for status (single value or list) and creator"""
+    conditions = []
+    params = []
+    
+    if isinstance(status, (list, tuple)):
+        conditions.append(f"status IN ({', '.join('?' for _ in status)})")
+        params.extend(status)
+    elif status:
+        conditions.append("status = ?")
+        params.append(status)
+    
+    if created_by:
+        conditions.append("created_by = ?")
+        params.append(created_by)
+    
+    return conditions, params
+
+def _page_query(query, conditions, params, after, page_size, prefix="", keyset=None, descending=True):
+    """Build a keyset-paginated query, by default ordered by (created_at, id) descending.
+    
+    keyset is a list of (sort expression, result column) pairs that ends in
+    a unique column. Returns (sql, params, keyset); one extra row is
+    fetched to tell whether another page follows.
+    """
+    keyset = keyset or [(f"{prefix}created_at", "created_at"), (f"{prefix}id", "id")]
+    expressions = [expression for expression, _ in keyset]
+    if after:
+        comparison = "<" if descending else ">"
+        conditions = conditions + [
+            f"({', '.join(expressions)}) {comparison} ({', '.join('?' for _ in expressions)})"
+        ]
+        params = list(params) + list(after)
+    
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    direction = "DESC" if descending else "ASC"
+    query += " ORDER BY " + ", ".join(f"{expression} {direction}" for expression in expressions) + " LIMIT ?"
+    return query, list(params) + [page_size + 1], keyset
+
+def _page_rows(cursor, page_query, page_size):
+    """Run a _page_query result; returns (rows, next_cursor), next_cursor None on the last page"""
+    query, params, keyset = page_query
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        return rows, tuple(rows[-1][column] for _, column in keyset)
+    return rows, None
+
+def _cases_page_query(status=None, created_by=None, after=None, page_size=DEFAULT_PAGE_SIZE):
+    """Page query behind get_cases_page"""
+    conditions, params = _case_filter_conditions(status, created_by)
+    return _page_query("SELECT * FROM cases", conditions, params, after, page_size)
+
+def get_cases_page(status=None, created_by=None, after=None, page_size=DEFAULT_PAGE_SIZE):
+    """Get one page of cases, newest first.
+    
+    after is the (created_at, id) cursor returned for the previous page.
+    """
+    with get_db_connection() as conn:
+        return _page_rows(conn.cursor(), _cases_page_query(status, created_by, after, page_size), page_size)
+
+def count_cases(status=None, created_by=None):
+    """Count cases by status (single value or list) and/or creator"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        
-        query = "SELECT * FROM cases"
-        params = []
-        conditions = []
-        
-        if status:
-            conditions.append("status = ?")
-            params.append(status)
-        
-        if created_by:
-            conditions.append("created_by = ?")
-            params.append(created_by)
-        
+        conditions, params = _case_filter_conditions(status, created_by)
+        query = "SELECT COUNT(*) FROM cases"
         if conditions:
             query += " WHERE " + " AND ".join(conditions)
-        
-        query += " ORDER BY created_at DESC"
-        
         cursor.execute(query, params)
+        return cursor.fetchone()[0]
+
+def _cases_by_status_query(status=None, created_by=None):
+    """(sql, params) behind get_cases_by_status"""
+    query = "SELECT * FROM cases"
+    conditions, params = _case_filter_conditions(status, created_by)
+    
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    
+    query += " ORDER BY created_at DESC"
+    return query, params
+
+def get_cases_by_status(status=None, created_by=None):
+    """Get cases by status and/or creator"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(*_cases_by_status_query(status, created_by))
         return cursor.fetchall()
 
+CASE_BY_ID_QUERY = "SELECT * FROM cases WHERE case_id = ?"
+
 def get_case_by_id(case_id):
     """Get case by case_id"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM cases WHERE case_id = ?", (case_id,))
+        cursor.execute(CASE_BY_ID_QUERY, (case_id,))
         return cursor.fetchone()
 
 def update_case_status(case_id, new_status, updated_by, comments=None):
     """Update case status"""
-    with get_db_connection() as conn:
+    with transaction() as conn:
         cursor = conn.cursor()
         
         # Update case status
@@ -133,154 +208,361 @@ def update_case_status(case_id, new_status, updated_by, comments=None):
                 VALUES (?, ?, ?, ?)
             ''', (case_id, comments, f"Status Change to {new_status}", updated_by))
         
-        conn.commit()
+        invalidate_case_caches()
+        mark_case_changed(case_id)
         
-        # Log audit
+        # Log audit in the same transaction
         log_audit(case_id, "Status Update", f"Status changed to: {new_status}", updated_by)
         
         return True
 
+CASE_COMMENTS_QUERY = "SELECT * FROM case_comments WHERE case_id = ? ORDER BY created_at DESC"
+
 def get_case_comments(case_id):
     """Get comments for a case"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('''
-            SELECT * FROM case_comments 
-            WHERE case_id = ? 
-            ORDER BY created_at DESC
-        ''', (case_id,))
+        cursor.execute(CASE_COMMENTS_QUERY, (case_id,))
         return cursor.fetchall()
 
 def add_case_comment(case_id, comment, comment_type, created_by):
     """Add comment to a case"""
-    with get_db_connection() as conn:
+    with transaction() as conn:
         cursor = conn.cursor()
         cursor.execute('''
             INSERT INTO case_comments (case_id, comment, comment_type, created_by)
             VALUES (?, ?, ?, ?)
         ''', (case_id, comment, comment_type, created_by))
-        conn.commit()
+        mark_case_changed(case_id)
         
-        # Log audit
+        # Log audit in the same transaction
         log_audit(case_id, "Comment Added", f"Comment type: {comment_type}", created_by)
 
+CASE_DOCUMENTS_QUERY = "SELECT * FROM documents WHERE case_id = ? ORDER BY uploaded_at DESC"
+
 def get_case_documents(case_id):
     """Get documents for a case"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('''
-            SELECT * FROM documents 
-            WHERE case_id = ? 
-            ORDER BY uploaded_at DESC
-        ''', (case_id,))
+        cursor.execute(CASE_DOCUMENTS_QUERY, (case_id,))
         return cursor.fetchall()
 
-def add_case_document(case_id, filename, original_filename, file_path, file_size, uploaded_by):
-    """Add document to a case"""
+def get_documents_for_cases(case_ids):
+    """Get the documents of several cases in one query"""
+    if not case_ids:
+        return []
     with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT * FROM documents WHERE case_id IN ({','.join('?' * len(case_ids))})",
+            list(case_ids)
+        )
+        return cursor.fetchall()
+
+def add_case_document(case_id, filename, original_filename, file_path, file_size, uploaded_by, content_hash=None, mime_type=None):
+    """Add document to a case; documents with a content hash reference a shared blob"""
+    with transaction() as conn:
         cursor = conn.cursor()
         cursor.execute('''
-            INSERT INTO documents (case_id, filename, original_filename, file_path, file_size, uploaded_by)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (case_id, filename, original_filename, file_path, file_size, uploaded_by))
-        conn.commit()
+            INSERT INTO documents (case_id, filename, original_filename, file_path, file_size, uploaded_by,
+                                   content_hash, mime_type)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (case_id, filename, original_filename, file_path, file_size, uploaded_by, content_hash, mime_type))
         
-        # Log audit
+        # Log audit in the same transaction
         log_audit(case_id, "Document Added", f"Document: {original_filename}", uploaded_by)
 
-def get_case_statistics():
-    """Get case statistics for dashboard"""
+def create_case_with_documents(case_data, created_by, documents):
+    """Create a case and register its already-stored documents in one transaction"""
+    with transaction():
+        success, message = create_case(case_data, created_by)
+        if success:
+            for document in documents:
+                add_case_document(
+                    case_data["case_id"], document["unique_filename"], document["original_filename"],
+                    document["file_path"], document["file_size"], created_by,
+                    document.get("content_hash"), document.get("mime_type")
+                )
+    return success, message
+
+# Dashboard statistics are cached process-wide and invalidated by case writes
+STATS_CACHE_TTL_SECONDS = 60
+
+RECENT_CASES_QUERY = "SELECT * FROM cases ORDER BY created_at DESC LIMIT 10"
+
+def _compute_case_statistics():
+    """Compute dashboard statistics from the case_daily_counts rollup"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
-        stats = {}
-        
-        # Total cases
-        cursor.execute("SELECT COUNT(*) FROM cases")
-        stats["total_cases"] = cursor.fetchone()[0]
-        
-        # Cases by status
-        cursor.execute("SELECT status, COUNT(*) FROM cases GROUP BY status")
-        stats["by_status"] = dict(cursor.fetchall())
-        
-        # Cases by region
-        cursor.execute("SELECT region, COUNT(*) FROM cases GROUP BY region")
-        stats["by_region"] = dict(cursor.fetchall())
+        stats = {"total_cases": 0, "by_status": {}, "by_region": {}, "by_product": {}}
         
-        # Cases by product
-        cursor.execute("SELECT product, COUNT(*) FROM cases GROUP BY product")
-        stats["by_product"] = dict(cursor.fetchall())
+        # Totals by status, region and product in one pass over the rollup groups
+        cursor.execute('''
+            SELECT status, region, product, SUM(case_count)
+            FROM case_daily_counts
+            GROUP BY status, region, product
+        ''')
+        for status, region, product, count in cursor.fetchall():
+            stats["total_cases"] += count
+            stats["by_status"][status] = stats["by_status"].get(status, 0) + count
+            stats["by_region"][region] = stats["by_region"].get(region, 0) + count
+            stats["by_product"][product] = stats["by_product"].get(product, 0) + count
         
         # Recent cases
-        cursor.execute("SELECT * FROM cases ORDER BY created_at DESC LIMIT 10")
+        cursor.execute(RECENT_CASES_QUERY)
         stats["recent_cases"] = cursor.fetchall()
         
         return stats
 
+_case_statistics_cache = TTLCache(_compute_case_statistics, STATS_CACHE_TTL_SECONDS)
+
+# Caches derived from case rows; invalidated together after case writes commit
+_case_caches = [_case_statistics_cache]
+
+def register_case_cache(cache):
+    """Have a cache derived from case data invalidated by case writes"""
+    _case_caches.append(cache)
+
+def get_case_statistics(stale_while_revalidate=True):
+    """Get case statistics for dashboard.
+    
+    Served from a process-wide cache that case writes invalidate. With
+    stale_while_revalidate, a value past its TTL is returned immediately
+    while a fresh one is computed in the background.
+    """
+    return _case_statistics_cache.get(stale_while_revalidate=stale_while_revalidate)
+
+def invalidate_case_caches():
+    """Mark cached case statistics stale once the current write commits"""
+    for cache in _case_caches:
+        call_after_commit(cache.invalidate)
+
+def get_daily_case_counts(date_from=None, date_to=None, status=None, region=None, product=None):
+    """Get (day, case_count) rows of cases created per day from the rollup table"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        
+        conditions = []
+        params = []
+        for column, value in [("status", status), ("region", region), ("product", product)]:
+            if value:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if date_from:
+            conditions.append("day >= ?")
+            params.append(str(date_from))
+        if date_to:
+            conditions.append("day <= ?")
+            params.append(str(date_to))
+        
+        query = "SELECT day, SUM(case_count) AS case_count FROM case_daily_counts"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " GROUP BY day ORDER BY day"
+        
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+def get_status_transitions(date_from=None, date_to=None):
+    """Get (day, from_status, to_status, transition_count) rows from the rollup table"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT day, from_status, to_status, transition_count
+            FROM case_status_transitions
+            WHERE day >= COALESCE(?, day) AND day <= COALESCE(?, day)
+            ORDER BY day
+        ''', (str(date_from) if date_from else None, str(date_to) if date_to else None))
+        return cursor.fetchall()
+
+AUDIT_LOGS_QUERY = "SELECT * FROM audit_logs ORDER BY performed_at DESC LIMIT ?"
+CASE_AUDIT_LOGS_QUERY = "SELECT * FROM audit_logs WHERE case_id = ? ORDER BY performed_at DESC LIMIT ?"
+
 def get_audit_logs(case_id=None, limit=100):
     """Get audit logs"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
         if case_id:
-            cursor.execute('''
-                SELECT * FROM audit_logs 
-                WHERE case_id = ? 
-                ORDER BY performed_at DESC 
-                LIMIT ?
-            ''', (case_id, limit))
+            cursor.execute(CASE_AUDIT_LOGS_QUERY, (case_id, limit))
         else:
-            cursor.execute('''
-                SELECT * FROM audit_logs 
-                ORDER BY performed_at DESC 
-                LIMIT ?
-            ''', (limit,))
+            cursor.execute(AUDIT_LOGS_QUERY, (limit,))
         
         return cursor.fetchall()
 
-def get_cases_by_status(status):
-    """Get cases by status"""
+def _build_fts_query(search_term):
+    """Turn free text into an FTS5 query: every word must match as a prefix"""
+    words = re.findall(r"\w+", search_term or "")
+    return " AND ".join(f'"{word}"*' for word in words)
+
+def _build_id_fragment_query(search_term):
+    """Trigram query for a single word of 3+ characters that may sit inside a case ID or LAN"""
+    words = re.findall(r"\w+", search_term or "")
+    if len(words) == 1 and len(words[0]) >= 3:
+        return f'"{words[0]}"'
+    return ""
+
+# Case ID/LAN fragment matches rank ahead of text matches (FTS5 ranks are negative bm25 scores)
+ID_FRAGMENT_RANK = -1.0e9
+
+def _has_case_search_index(cursor, table="cases_fts"):
+    """Check whether a case full-text table exists (FTS5 or its trigram tokenizer may be unavailable)"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    return cursor.fetchone() is not None
+
+def _case_search_query(cursor, search_term, filters):
+    """Build FROM clause, conditions, params and rank ordering for a case search"""
+    conditions = []
+    params = []
+    rank_order = None
+    from_clause = "FROM cases c"
+    
+    search_term = (search_term or "").strip()
+    fts_query = _build_fts_query(search_term)
+    id_fragment = _build_id_fragment_query(search_term)
+    if fts_query and _has_case_search_index(cursor):
+        if id_fragment and _has_case_search_index(cursor, "cases_id_fts"):
+            # Word-prefix matches plus case IDs/LANs containing the term anywhere
+            from_clause = '''FROM (
+                SELECT rowid, MIN(rank) AS rank FROM (
+                    SELECT rowid, rank FROM cases_fts WHERE cases_fts MATCH ?
+                    UNION ALL
+                    SELECT rowid, ? FROM cases_id_fts WHERE cases_id_fts MATCH ?
+                ) GROUP BY rowid
+            ) AS matches JOIN cases c ON c.id = matches.rowid'''
+            params.extend([fts_query, ID_FRAGMENT_RANK, id_fragment])
+            rank_order = "matches.rank"
+        else:
+            from_clause = "FROM cases_fts JOIN cases c ON c.id = cases_fts.rowid"
+            conditions.append("cases_fts MATCH ?")
+            params.append(fts_query)
+            rank_order = "cases_fts.rank"
+    elif search_term:
+        conditions.append("(c.case_id LIKE ? OR c.lan LIKE ? OR c.case_description LIKE ?)")
+        params.extend([f"%{search_term}%"] * 3)
+    
+    if filters:
+        if filters.get("status"):
+            conditions.append("c.status = ?")
+            params.append(filters["status"])
+        
+        if filters.get("region"):
+            conditions.append("c.region = ?")
+            params.append(filters["region"])
+        
+        if filters.get("product"):
+            conditions.append("c.product = ?")
+            params.append(filters["product"])
+        
+        if filters.get("date_from"):
+            conditions.append("c.case_date >= ?")
+            params.append(filters["date_from"])
+        
+        if filters.get("date_to"):
+            conditions.append("c.case_date <= ?")
+            params.append(filters["date_to"])
+    
+    return from_clause, conditions, params, rank_order
+
+def _search_cases_sql(cursor, search_term, filters=None):
+    """(sql, params) behind search_cases"""
+    from_clause, conditions, params, rank_order = _case_search_query(cursor, search_term, filters)
+    
+    query = f"SELECT c.* {from_clause}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    
+    # Rank ties (e.g. every case ID fragment match) break on id, as in the paged and export queries
+    query += f" ORDER BY {rank_order}, c.id" if rank_order else " ORDER BY c.created_at DESC"
+    return query, params
+
+def search_cases(search_term, filters=None):
+    """Search cases with optional filters, best full-text matches first"""
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM cases WHERE status = ? ORDER BY created_at DESC", (status,))
+        cursor.execute(*_search_cases_sql(cursor, search_term, filters))
         return cursor.fetchall()
 
-def search_cases(search_term, filters=None):
-    """Search cases with optional filters"""
+def _search_page_query(cursor, search_term, filters=None, after=None, page_size=DEFAULT_PAGE_SIZE):
+    """Page query behind search_cases_page"""
+    from_clause, conditions, params, rank_order = _case_search_query(cursor, search_term, filters)
+    if rank_order:
+        return _page_query(f"SELECT c.*, {rank_order} AS search_rank {from_clause}", conditions, params,
+                           after, page_size, keyset=[(rank_order, "search_rank"), ("c.id", "id")],
+                           descending=False)
+    return _page_query(f"SELECT c.* {from_clause}", conditions, params, after, page_size, prefix="c.")
+
+def search_cases_page(search_term, filters=None, after=None, page_size=DEFAULT_PAGE_SIZE):
+    """Get one page of search results.
+    
+    Full-text searches are ordered by relevance (keyset on rank, id); other
+    searches newest first (keyset on created_at, id). Ranks depend on the
+    whole index, so a page cursor is only meaningful until cases change.
+    """
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        
-        query = '''
-            SELECT * FROM cases 
-            WHERE (case_id LIKE ? OR lan LIKE ? OR case_description LIKE ?)
-        '''
-        params = [f"%{search_term}%", f"%{search_term}%", f"%{search_term}%"]
-        
-        if filters:
-            if filters.get("status"):
-                query += " AND status = ?"
-                params.append(filters["status"])
-            
-            if filters.get("region"):
-                query += " AND region = ?"
-                params.append(filters["region"])
-            
-            if filters.get("product"):
-                query += " AND product = ?"
-                params.append(filters["product"])
-            
-            if filters.get("date_from"):
-                query += " AND case_date >= ?"
-                params.append(filters["date_from"])
-            
-            if filters.get("date_to"):
-                query += " AND case_date <= ?"
-                params.append(filters["date_to"])
-        
-        query += " ORDER BY created_at DESC"
-        
-        cursor.execute(query, params)
-        return cursor.fetchall()
+        return _page_rows(cursor, _search_page_query(cursor, search_term, filters, after, page_size), page_size)
+
+def get_search_summary(search_term, filters=None):
+    """Get total matches and status/region breakdowns for a case search"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        from_clause, conditions, params, _ = _case_search_query(cursor, search_term, filters)
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        
+        summary = {}
+        for column in ["status", "region"]:
+            cursor.execute(f"SELECT c.{column}, COUNT(*) {from_clause}{where} GROUP BY c.{column}", params)
+            summary[f"by_{column}"] = dict(cursor.fetchall())
+        summary["total"] = sum(summary["by_status"].values())
+        return summary
+
+def get_search_export_query(search_term, filters=None):
+    """Build the (sql, params) for exporting every case matching a search"""
+    with get_db_connection() as conn:
+        from_clause, conditions, params, rank_order = _case_search_query(conn.cursor(), search_term, filters)
+    
+    query = f"SELECT c.* {from_clause}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    # Same order as the on-screen results
+    query += f" ORDER BY {rank_order}, c.id" if rank_order else " ORDER BY c.created_at DESC"
+    return query, params
+
+# Hot read queries that must stay index-backed: name -> function(cursor)
+# returning (sql, params). Each builds its SQL with the same constant or
+# builder the model function executes, with sample parameters.
+HOT_QUERIES = {
+    "get_cases_by_status": lambda cursor: _cases_by_status_query("Submitted"),
+    "get_cases_by_status_for_creator": lambda cursor: _cases_by_status_query("Submitted", "admin"),
+    "get_cases_page": lambda cursor: _cases_page_query("Submitted", after=("2025-01-01 00:00:00", 1))[:2],
+    "recent_cases": lambda cursor: (RECENT_CASES_QUERY, ()),
+    "get_case_by_id": lambda cursor: (CASE_BY_ID_QUERY, ("CASE0",)),
+    "get_case_comments": lambda cursor: (CASE_COMMENTS_QUERY, ("CASE0",)),
+    "get_case_documents": lambda cursor: (CASE_DOCUMENTS_QUERY, ("CASE0",)),
+    "get_audit_logs": lambda cursor: (AUDIT_LOGS_QUERY, (100,)),
+    "get_audit_logs_for_case": lambda cursor: (CASE_AUDIT_LOGS_QUERY, ("CASE0", 100)),
+    "search_cases": lambda cursor: _search_cases_sql(cursor, "fraud", {"region": "North"}),
+    "search_cases_page": lambda cursor: _search_page_query(cursor, "fraud", after=(-1.0, 1))[:2],
+    "search_cases_words": lambda cursor: _search_cases_sql(cursor, "salary slips", {"region": "North"}),
+    "search_cases_filters_only": lambda cursor: _search_cases_sql(
+        cursor, "", {"region": "North", "date_from": "2025-01-01"}
+    ),
+    "get_user_stats_total": lambda cursor: (USER_CASES_QUERY, ("admin",) * 4),
+    "get_user_stats_this_month": lambda cursor: (USER_CASES_THIS_MONTH_QUERY, ("admin",) * 4),
+}
+
+def check_query_plans():
+    """Return {query name: full-scan plan steps} for hot queries that lost their index"""
+    with get_db_connection() as conn:
+        queries = {name: build(conn.cursor()) for name, build in HOT_QUERIES.items()}
+    regressions = {}
+    for name, (query, params) in queries.items():
+        scans = find_full_table_scans(query, params)
+        if scans:
+            regressions[name] = scans
+    return regressions
 
 
 # Achievement and Gamification Functions
@@ -300,6 +582,16 @@ def get_user_achievements(username):
         except:
             return []  # Return empty if tables don't exist yet
 
+USER_CASES_QUERY = """
+    SELECT COUNT(*) FROM cases
+    WHERE created_by = ? OR reviewed_by = ? OR approved_by = ? OR closed_by = ?
+"""
+USER_CASES_THIS_MONTH_QUERY = """
+    SELECT COUNT(*) FROM cases
+    WHERE (created_by = ? OR reviewed_by = ? OR approved_by = ? OR closed_by = ?)
+    AND created_at >= date('now', 'start of month')
+"""
+
 def get_user_stats(username):
     """Get comprehensive user statistics for gamification"""
     with get_db_connection() as conn:
@@ -308,18 +600,11 @@ def get_user_stats(username):
         stats = {}
         
         # Total cases handled
-        cursor.execute('''
-            SELECT COUNT(*) FROM cases 
-            WHERE created_by = ? OR reviewed_by = ? OR approved_by = ? OR closed_by = ?
-        ''', (username, username, username, username))
+        cursor.execute(USER_CASES_QUERY, (username,) * 4)
         stats["total_cases"] = cursor.fetchone()[0]
         
         # Cases this month
-        cursor.execute('''
-            SELECT COUNT(*) FROM cases 
-            WHERE (created_by = ? OR reviewed_by = ? OR approved_by = ? OR closed_by = ?)
-            AND created_at >= date('now', 'start of month')
-        ''', (username, username, username, username))
+        cursor.execute(USER_CASES_THIS_MONTH_QUERY, (username,) * 4)
         stats["cases_this_month"] = cursor.fetchone()[0]
         
         # Mock values for demo
@@ -1,10 +1,19 @@
 import streamlit as st
 import sqlite3
 import hashlib
-from database import get_db_connection, get_password_hash
-from models import get_audit_logs, get_case_statistics
-from utils import format_datetime
-from auth import require_role
+import json
+import os
+from database import get_db_connection, get_password_hash, get_schema_version
+from models import get_audit_logs, get_case_statistics, check_query_plans
+from utils import format_datetime, format_file_size
+from auth import require_role, get_current_user
+from backups import list_backups, BACKUP_RETENTION
+from jobs import JOB_TYPES, submit_unique_job, cancel_job, list_jobs, has_active_job, get_latest_job, submit_if_due
+from document_store import get_storage_usage, get_storage_total
+
+# Hours between automatic document storage reconciliations
+STORAGE_RECONCILE_INTERVAL_HOURS = 24
+EXPORT_PRUNE_INTERVAL_HOURS = 24
 
 @require_role(["Admin"])
 def show():
@@ -127,12 +136,9 @@ def show_system_statistics():
         st.metric("Total Users", total_users)
     
     with col3:
-        # Get storage usage (simplified)
-        import os
-        uploads_size = sum(os.path.getsize(os.path.join("uploads", f)) 
-                          for f in os.listdir("uploads") if os.path.isfile(os.path.join("uploads", f))) if os.path.exists("uploads") else 0
-        storage_mb = uploads_size / (1024 * 1024)
-        st.metric("Storage Used", f"{storage_mb:.1f} MB")
+        # Maintained incrementally from documents.file_size
+        file_count, storage_bytes = get_storage_total()
+        st.metric("Storage Used", format_file_size(storage_bytes) if storage_bytes else "0 B", help=f"{file_count} documents")
     
     with col4:
         # Database size
@@ -163,6 +169,49 @@ def show_system_statistics():
                 title="Regional Distribution"
             )
             st.plotly_chart(fig, use_container_width=True)
+    
+    show_storage_usage()
+
+def show_storage_usage():
+    """Storage breakdown and the latest reconciliation report"""
+    st.subheader("💽 Document Storage")
+    
+    # Reconcile once a day in the background
+    submit_if_due("reconcile_storage", STORAGE_RECONCILE_INTERVAL_HOURS, get_current_user())
+    
+    col1, col2, col3 = st.columns(3)
+    for column, scope, label in [(col1, "user", "User"), (col2, "case", "Case ID"), (col3, "month", "Month")]:
+        with column:
+            st.write(f"**Top by {label}**")
+            usage = get_storage_usage(scope, limit=10)
+            if usage:
+                st.dataframe([
+                    {label: row["scope_key"], "Files": row["file_count"], "Size": format_file_size(row["total_bytes"])}
+                    for row in usage
+                ], use_container_width=True, hide_index=True)
+            else:
+                st.info("No documents yet")
+    
+    last_run = get_latest_job("reconcile_storage", status="Succeeded")
+    if last_run and last_run["result"]:
+        report = json.loads(last_run["result"])
+        st.caption(
+            f"Last reconciliation {format_datetime(last_run['finished_at'])}: "
+            f"{report['files_on_disk']} files on disk, "
+            f"{report['orphaned_files']} orphaned ({format_file_size(report['orphaned_bytes'])}), "
+            f"{report['missing_files']} missing, "
+            f"{report.get('untracked_files', 0)} untracked legacy files (kept)"
+        )
+        if report["missing_sample"]:
+            with st.expander("Missing files"):
+                st.write(report["missing_sample"])
+        if report["orphaned_sample"]:
+            with st.expander("Orphaned files"):
+                st.write(report["orphaned_sample"])
+    
+    remove_orphans = st.checkbox("Delete orphaned object-store blobs older than an hour", value=False)
+    if st.button("🧾 Reconcile Storage Now"):
+        start_job("reconcile_storage", remove_orphans=remove_orphans)
 
 def show_audit_logs():
     """Display audit logs"""
@@ -247,9 +296,13 @@ def show_system_settings():
     with st.expander("💾 Backup & Maintenance"):
         st.write("**Database Backup**")
         
+        compress_backup = st.checkbox("Gzip backup", value=True)
         if st.button("📦 Create Database Backup"):
-            create_database_backup()
-            st.success("Database backup created successfully")
+            start_job("backup", compress=compress_backup)
+        
+        backups = list_backups()
+        if backups:
+            st.caption(f"{len(backups)} backups kept (newest: {os.path.basename(backups[0])}, up to {BACKUP_RETENTION} retained)")
         
         st.write("**System Maintenance**")
         
@@ -258,13 +311,15 @@ def show_system_settings():
             st.success("Temporary files cleaned")
         
         if st.button("🔄 Rebuild Database Indexes"):
-            rebuild_database_indexes()
-            st.success("Database indexes rebuilt")
+            start_job("reindex")
 
 def show_database_management():
     """Database management interface"""
     st.subheader("🗄️ Database Management")
     
+    # Drop exports past their retention once a day in the background
+    submit_if_due("prune_exports", EXPORT_PRUNE_INTERVAL_HOURS, get_current_user())
+    
     # Database statistics
     st.write("**Database Statistics**")
     
@@ -278,7 +333,19 @@ def show_database_management():
             cursor.execute(f"SELECT COUNT(*) FROM {table}")
             count = cursor.fetchone()[0]
             st.write(f"**{table.title()}:** {count} records")
-    
+
+        st.write(f"**Schema Version:** {get_schema_version(conn)}")
+
+    # Query plan health
+    if st.button("🩺 Check Query Plans"):
+        regressions = check_query_plans()
+        if regressions:
+            st.error("Some hot queries are scanning full tables")
+            for name, scans in regressions.items():
+                st.write(f"**{name}:** {', '.join(scans)}")
+        else:
+            st.success("All hot queries are index-backed")
+
     st.divider()
     
     # Database operations
@@ -288,24 +355,79 @@ def show_database_management():
         st.write("**Maintenance Operations**")
         
         if st.button("🔄 Vacuum Database"):
-            vacuum_database()
-            st.success("Database vacuumed successfully")
+            start_job("vacuum")
         
         if st.button("📊 Analyze Database"):
-            analyze_database()
-            st.success("Database analysis completed")
+            start_job("analyze")
+        
+        if st.button("🧮 Rebuild Case Rollups"):
+            start_job("rebuild_rollups")
+        
+        if st.button("🔎 Rebuild Similar Case Index"):
+            start_job("similar_case_index")
     
     with col2:
         st.write("**Data Operations**")
         
+        compress_export = st.checkbox("Gzip exports", value=True)
         if st.button("📥 Export All Data"):
-            export_all_data()
-            st.success("Data export initiated")
+            start_job("export_all_data", compress=compress_export)
+        
+        if st.button("🗂️ Export Parquet Snapshot"):
+            start_job("parquet_snapshot")
         
         if st.button("🔄 Reset Demo Data"):
             if st.checkbox("⚠️ I understand this will reset all data"):
                 reset_demo_data()
                 st.success("Demo data reset completed")
+    
+    st.divider()
+    polling = has_active_job()
+    st.fragment(show_background_jobs, run_every="2s" if polling else None)(polling)
+
+def start_job(job_type, **params):
+    """Queue a maintenance job unless one of the same type is already pending"""
+    label, _ = JOB_TYPES[job_type]
+    job_id = submit_unique_job(job_type, get_current_user(), **params)
+    if job_id is None:
+        st.warning(f"{label} is already queued or running")
+        return
+    st.success(f"{label} queued as job #{job_id}. Progress is shown under Background Jobs.")
+
+def show_background_jobs(polling):
+    """Display recent background jobs, polling only while one is queued or running"""
+    st.write("**Background Jobs**")
+    
+    if polling and not has_active_job():
+        # Everything finished; rerun the page so polling stops
+        st.rerun()
+    
+    jobs = list_jobs(limit=10)
+    if not jobs:
+        st.info("No background jobs yet")
+        return
+    
+    for job in jobs:
+        label = JOB_TYPES.get(job["job_type"], (job["job_type"], None))[0]
+        col1, col2, col3 = st.columns([3, 2, 1])
+        
+        with col1:
+            st.write(f"**#{job['id']} {label}** — {job['created_by']} at {format_datetime(job['created_at'])}")
+            if job["status"] == "Running":
+                st.progress(job["progress"], text=job["message"] or "Running")
+            elif job["status"] == "Failed":
+                st.caption(f"❌ {(job['error'] or '').splitlines()[0] if job['error'] else 'Failed'}")
+            elif job["status"] == "Succeeded" and job["result"] not in (None, "null"):
+                st.caption(job["result"])
+        
+        with col2:
+            st.write(job["status"] + (" (cancelling)" if job["cancel_requested"] and job["status"] in ("Queued", "Running") else ""))
+        
+        with col3:
+            if job["status"] in ("Queued", "Running") and not job["cancel_requested"]:
+                if st.button("Cancel", key=f"cancel_job_{job['id']}"):
+                    cancel_job(job["id"])
+                    st.rerun(scope="fragment")
 
 # Helper functions
 def get_all_users():
@@ -362,66 +484,20 @@ def delete_user(user_id):
     except:
         return False
 
-def create_database_backup():
-    """Create database backup"""
-    import shutil
-    from datetime import datetime
-    
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_name = f"case_management_backup_{timestamp}.db"
-    shutil.copy2("case_management.db", backup_name)
-
 def clean_temp_files():
     """Clean temporary files"""
-    import os
     import glob
+    import time
+    from document_store import INCOMING_DIR
     
     # Clean any temporary files in uploads directory
     temp_files = glob.glob("uploads/*.tmp")
+    # Abandoned document store writes; skip recent ones that may still be in flight
+    temp_files += [path for path in glob.glob(os.path.join(INCOMING_DIR, "*.tmp"))
+                   if time.time() - os.path.getmtime(path) > 3600]
     for temp_file in temp_files:
         os.remove(temp_file)
 
-def rebuild_database_indexes():
-    """Rebuild database indexes"""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("REINDEX")
-        conn.commit()
-
-def vacuum_database():
-    """Vacuum database to reclaim space"""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("VACUUM")
-        conn.commit()
-
-def analyze_database():
-    """Analyze database for optimization"""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("ANALYZE")
-        conn.commit()
-
-def export_all_data():
-    """Export all data to CSV files"""
-    import pandas as pd
-    from datetime import datetime
-    
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    
-    with get_db_connection() as conn:
-        # Export cases
-        cases_df = pd.read_sql_query("SELECT * FROM cases", conn)
-        cases_df.to_csv(f"exports/cases_export_{timestamp}.csv", index=False)
-        
-        # Export users (without passwords)
-        users_df = pd.read_sql_query("SELECT id, username, role, email, created_at, is_active FROM users", conn)
-        users_df.to_csv(f"exports/users_export_{timestamp}.csv", index=False)
-        
-        # Export audit logs
-        logs_df = pd.read_sql_query("SELECT * FROM audit_logs", conn)
-        logs_df.to_csv(f"exports/audit_logs_{timestamp}.csv", index=False)
-
 def reset_demo_data():
     """Reset database to demo state"""
     # This would truncate tables and insert demo data
@@ -2,8 +2,12 @@ import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
-from models import get_case_statistics, search_cases
-from utils import export_cases_to_csv, get_dropdown_options, format_datetime
+import os
+from models import get_case_statistics, search_cases_page, get_search_summary, get_search_export_query
+from pagination import show_paginated
+from trends import get_case_trend, TREND_FREQUENCIES, TREND_DIMENSIONS
+from snapshots import list_snapshots, snapshot_months, snapshot_case_counts
+from utils import export_query_to_csv_file, format_csv_timestamp, get_dropdown_options, format_datetime
 from datetime import datetime, timedelta
 
 def show():
@@ -31,6 +35,11 @@ def show():
     with col4:
         filter_region = st.selectbox("Region", ["All"] + options["regions"])
     
+    search_term = st.text_input(
+        "Search",
+        placeholder="Case ID, LAN, customer name, PAN, branch or description"
+    )
+    
     # Apply filters and get data
     filters = {}
     if filter_status != "All":
@@ -42,8 +51,8 @@ def show():
     if date_to:
         filters["date_to"] = date_to.strftime("%Y-%m-%d")
     
-    # Search cases with filters
-    filtered_cases = search_cases("", filters) if filters else None
+    # Summarize matches with grouped counts; rows are only fetched a page at a time
+    search_summary = get_search_summary(search_term, filters) if filters or search_term else None
     
     st.divider()
     
@@ -72,8 +81,8 @@ def show():
         st.metric("Pending Cases", pending_cases)
     
     with col5:
-        if len(filtered_cases) > 0:
-            st.metric("Filtered Results", len(filtered_cases))
+        if search_summary and search_summary["total"] > 0:
+            st.metric("Filtered Results", search_summary["total"])
         else:
             st.metric("No Filter Applied", "")
     
@@ -83,15 +92,24 @@ def show():
     # Case trend over time
     st.subheader("Case Trend Over Time")
     if stats["total_cases"] > 0:
-        # This would ideally use actual date-based data
-        # For now, showing sample trend
-        dates = pd.date_range(start=date_from, end=date_to, freq='D')
-        sample_data = pd.DataFrame({
-            'Date': dates,
-            'Cases': [abs(hash(str(d)) % 10) for d in dates]  # Sample data
-        })
+        col1, col2 = st.columns(2)
+        with col1:
+            granularity = st.selectbox("Granularity", list(TREND_FREQUENCIES.keys()))
+        with col2:
+            breakdown = st.selectbox("Break Down By", ["None"] + list(TREND_DIMENSIONS.keys()))
+        
+        group_by = TREND_DIMENSIONS.get(breakdown)
+        trend_data = get_case_trend(
+            date_from, date_to,
+            freq=TREND_FREQUENCIES[granularity],
+            group_by=group_by,
+            filters=filters
+        )
         
-        fig = px.line(sample_data, x='Date', y='Cases', title='Daily Case Creation Trend')
+        fig = px.line(
+            trend_data, x='Date', y='Cases', color=group_by,
+            title=f'{granularity} Case Creation Trend'
+        )
         st.plotly_chart(fig, use_container_width=True)
     else:
         st.info("No data available for trend analysis")
@@ -148,28 +166,60 @@ def show():
     else:
         st.info("No status data available for funnel")
     
+    # Month-partitioned Parquet snapshot: only the date range's months are read, not the live database
+    st.subheader("🗂️ Snapshot Analysis")
+    snapshots = list_snapshots()
+    if snapshots:
+        col1, col2 = st.columns(2)
+        with col1:
+            snapshot_dir = st.selectbox("Snapshot", snapshots, format_func=os.path.basename)
+        with col2:
+            snapshot_breakdown = st.selectbox("Break Down By", list(TREND_DIMENSIONS.keys()), key="snapshot_breakdown")
+        
+        group_by = TREND_DIMENSIONS[snapshot_breakdown]
+        snapshot_counts = snapshot_case_counts(group_by, snapshot_months(date_from, date_to), snapshot_dir)
+        if not snapshot_counts.empty:
+            fig = px.bar(
+                snapshot_counts, x="case_month", y="Cases", color=group_by,
+                title=f"Cases per Month by {snapshot_breakdown} (snapshot {os.path.basename(snapshot_dir)})"
+            )
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.info("The snapshot has no cases dated in the selected range")
+    else:
+        st.info("No Parquet snapshots yet. An admin can create one with Export Parquet Snapshot in the Admin Panel.")
+    
     # Data export section
     st.subheader("📥 Export Data")
     
     col1, col2, col3 = st.columns([2, 1, 1])
     
     with col1:
-        st.info(f"Ready to export {len(filtered_cases) if filtered_cases else stats['total_cases']} cases")
+        st.info(f"Ready to export {search_summary['total'] if search_summary else stats['total_cases']} cases")
     
     with col2:
+        compress_export = st.checkbox("Gzip", value=False, key="analytics_export_gzip")
         if st.button("📊 Export to CSV", use_container_width=True):
-            cases_to_export = filtered_cases if filtered_cases else search_cases("", {})
-            if cases_to_export:
-                csv_data = export_cases_to_csv(cases_to_export)
-                if csv_data:
-                    st.download_button(
-                        label="📥 Download CSV",
-                        data=csv_data,
-                        file_name=f"cases_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                        mime="text/csv"
+            export_count = search_summary["total"] if search_summary else stats["total_cases"]
+            if export_count:
+                # Stream rows straight to a file in exports/ instead of building the CSV in memory
+                query, params = get_search_export_query(search_term, filters)
+                file_name = f"cases_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+                try:
+                    file_path = export_query_to_csv_file(
+                        query, params, os.path.join("exports", file_name),
+                        formatters={"created_at": format_csv_timestamp, "updated_at": format_csv_timestamp},
+                        compress=compress_export
                     )
-                else:
-                    st.error("❌ Error generating CSV")
+                    with open(file_path, "rb") as f:
+                        st.download_button(
+                            label="📥 Download CSV",
+                            data=f,
+                            file_name=os.path.basename(file_path),
+                            mime="application/gzip" if compress_export else "text/csv"
+                        )
+                except Exception as e:
+                    st.error(f"❌ Error generating CSV: {str(e)}")
             else:
                 st.warning("No cases to export")
     
@@ -178,44 +228,45 @@ def show():
             st.info("📋 Detailed report generation feature coming soon!")
     
     # Summary statistics
-    if filtered_cases:
+    if search_summary and search_summary["total"]:
         st.subheader("📋 Filtered Results Summary")
         
-        # Convert to DataFrame for easier analysis
-        df = pd.DataFrame([dict(case) for case in filtered_cases])
-        
         # Summary metrics
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            st.metric("Filtered Cases", len(df))
+            st.metric("Filtered Cases", search_summary["total"])
         
         with col2:
-            if 'status' in df.columns:
-                most_common_status = df['status'].mode().iloc[0] if not df.empty else "N/A"
-                st.metric("Most Common Status", most_common_status)
+            most_common_status = max(search_summary["by_status"], key=search_summary["by_status"].get)
+            st.metric("Most Common Status", most_common_status)
         
         with col3:
-            if 'region' in df.columns:
-                most_common_region = df['region'].mode().iloc[0] if not df.empty else "N/A"
-                st.metric("Most Common Region", most_common_region)
+            most_common_region = max(search_summary["by_region"], key=search_summary["by_region"].get)
+            st.metric("Most Common Region", most_common_region)
         
-        # Display filtered data
+        # Display filtered data one page at a time
         st.subheader("Filtered Cases")
-        display_data = []
-        for case in filtered_cases[:50]:  # Limit to 50 for performance
-            display_data.append({
-                "Case ID": case["case_id"],
-                "Status": case["status"],
-                "Product": case["product"],
-                "Region": case["region"],
-                "Created": format_datetime(case["created_at"]),
-                "Created By": case["created_by"]
-            })
         
-        if display_data:
+        def render_page(cases):
+            display_data = []
+            for case in cases:
+                display_data.append({
+                    "Case ID": case["case_id"],
+                    "Status": case["status"],
+                    "Product": case["product"],
+                    "Region": case["region"],
+                    "Created": format_datetime(case["created_at"]),
+                    "Created By": case["created_by"]
+                })
             st.dataframe(display_data, use_container_width=True)
-            if len(filtered_cases) > 50:
-                st.info(f"Showing first 50 of {len(filtered_cases)} cases")
-        else:
-            st.info("No cases match the applied filters")
+        
+        # Filters are part of the key so changing them starts again at page 1
+        show_paginated(
+            f"analytics_{search_term}_{sorted(filters.items())}",
+            lambda after, size: search_cases_page(search_term, filters, after=after, page_size=size),
+            total=search_summary["total"],
+            empty_message="No cases match the applied filters",
+            page_size=50,
+            render_page=render_page
+        )
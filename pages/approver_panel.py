@@ -1,7 +1,9 @@
 import streamlit as st
-from models import get_cases_by_status, update_case_status, get_case_comments, add_case_comment, get_case_documents
+from models import update_case_status, get_case_comments, add_case_comment, get_case_documents
 from utils import get_status_color, format_datetime, format_file_size
 from auth import get_current_user, require_role
+from pagination import show_case_pages
+from document_views import show_document_preview
 
 @require_role(["Approver", "Admin"])
 def show():
@@ -15,14 +17,12 @@ def show():
     
     with tab1:
         st.subheader("Cases Pending Approval")
-        approved_cases = get_cases_by_status("Approved")  # Cases approved by reviewers, pending final approval
+        def render_approved_case(case):
+            with st.expander(f"Case: {case['case_id']} - {case['product']} ({case['region']})"):
+                show_case_details_for_approval(case, current_user)
         
-        if approved_cases:
-            for case in approved_cases:
-                with st.expander(f"Case: {case['case_id']} - {case['product']} ({case['region']})"):
-                    show_case_details_for_approval(case, current_user)
-        else:
-            st.info("📭 No cases pending approval")
+        # Cases approved by reviewers, pending final approval
+        show_case_pages("approver_approved", "Approved", render_approved_case, "📭 No cases pending approval")
     
     with tab2:
         st.subheader("Final Approved Cases")
@@ -31,14 +31,11 @@ def show():
     
     with tab3:
         st.subheader("Rejected Cases")
-        rejected_cases = get_cases_by_status("Rejected")
+        def render_rejected_case(case):
+            with st.expander(f"Case: {case['case_id']} - {get_status_color(case['status'])} {case['status']}"):
+                show_read_only_case_details(case)
         
-        if rejected_cases:
-            for case in rejected_cases:
-                with st.expander(f"Case: {case['case_id']} - {get_status_color(case['status'])} {case['status']}"):
-                    show_read_only_case_details(case)
-        else:
-            st.info("📭 No rejected cases")
+        show_case_pages("approver_rejected", "Rejected", render_rejected_case, "📭 No rejected cases")
 
 def show_case_details_for_approval(case, current_user):
     """Display case details for approval workflow"""
@@ -85,6 +82,7 @@ def show_case_details_for_approval(case, current_user):
                 st.write(format_file_size(doc['file_size']))
             with col3:
                 st.write(format_datetime(doc['uploaded_at']))
+            show_document_preview(doc)
     
     # Approval actions
     st.write("**Approval Actions:**")
@@ -193,3 +191,4 @@ def show_read_only_case_details(case):
                 st.write(format_file_size(doc['file_size']))
             with col3:
                 st.write(format_datetime(doc['uploaded_at']))
+            show_document_preview(doc)
@@ -1,7 +1,9 @@
 import streamlit as st
-from models import get_cases_by_status, update_case_status, get_case_comments, add_case_comment, get_case_documents
+from models import update_case_status, get_case_comments, add_case_comment, get_case_documents
 from utils import get_status_color, format_datetime, format_file_size
 from auth import get_current_user, require_role
+from pagination import show_case_pages
+from document_views import show_document_preview
 
 @require_role(["Actioner", "Admin"])
 def show():
@@ -17,25 +19,19 @@ def show():
         st.subheader("Cases Ready for Closure")
         
         # Cases that can be closed (approved cases, legal cleared cases, etc.)
-        approved_cases = get_cases_by_status("Approved")
+        def render_approved_case(case):
+            with st.expander(f"Case: {case['case_id']} - {case['product']} ({case['region']})"):
+                show_closure_case_details(case, current_user)
         
-        if approved_cases:
-            for case in approved_cases:
-                with st.expander(f"Case: {case['case_id']} - {case['product']} ({case['region']})"):
-                    show_closure_case_details(case, current_user)
-        else:
-            st.info("📭 No cases ready for closure")
+        show_case_pages("closure_approved", "Approved", render_approved_case, "📭 No cases ready for closure")
     
     with tab2:
         st.subheader("Closed Cases")
-        closed_cases = get_cases_by_status("Closed")
+        def render_closed_case(case):
+            with st.expander(f"Case: {case['case_id']} - {get_status_color(case['status'])} Closed"):
+                show_closed_case_details(case)
         
-        if closed_cases:
-            for case in closed_cases:
-                with st.expander(f"Case: {case['case_id']} - {get_status_color(case['status'])} Closed"):
-                    show_closed_case_details(case)
-        else:
-            st.info("📭 No closed cases")
+        show_case_pages("closure_closed", "Closed", render_closed_case, "📭 No closed cases")
     
     with tab3:
         st.subheader("Closure Analytics")
@@ -86,6 +82,7 @@ def show_closure_case_details(case, current_user):
                 st.write(format_file_size(doc['file_size']))
             with col3:
                 st.write(format_datetime(doc['uploaded_at']))
+            show_document_preview(doc)
     
     # Closure actions
     st.write("**Closure Actions:**")
@@ -254,6 +251,7 @@ def show_closed_case_details(case):
                 st.write(format_file_size(doc['file_size']))
             with col3:
                 st.write(format_datetime(doc['uploaded_at']))
+            show_document_preview(doc)
 
 def show_closure_analytics():
     """Display closure analytics and statistics"""
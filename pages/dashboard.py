@@ -1,9 +1,14 @@
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
-from models import get_case_statistics, get_audit_logs
+from models import get_case_statistics, get_audit_logs, get_cases_page, count_cases
 from utils import get_status_color, format_datetime
 from auth import get_current_user_role
+from tat import get_tat_summary, get_stage_metric, TAT_STAGES
+from datetime import date, timedelta
+
+# Rows shown in the dashboard's review/approval queues
+DASHBOARD_QUEUE_SIZE = 50
 
 def show():
     """Display dashboard page"""
@@ -36,57 +41,40 @@ def show():
     # TAT (Turn Around Time) Section
     st.subheader("📊 Turn Around Time (TAT) Metrics")
     
-    col1, col2, col3, col4 = st.columns(4)
-    
-    with col1:
-        st.metric("Avg. Review TAT", "2.5 days", delta="-0.3 days")
-    
-    with col2:
-        st.metric("Avg. Approval TAT", "1.8 days", delta="+0.2 days")
-    
-    with col3:
-        st.metric("Avg. Legal Review TAT", "3.2 days", delta="-0.5 days")
-    
-    with col4:
-        st.metric("Avg. Closure TAT", "1.2 days", delta="-0.1 days")
+    # Last 30 days against the 30 days before, from case_stage_durations
+    today = date.today()
+    current_tat = get_tat_summary(today - timedelta(days=29), today)
+    previous_tat = get_tat_summary(today - timedelta(days=59), today - timedelta(days=30))
+    
+    tat_columns = st.columns(len(TAT_STAGES))
+    for column, stage in zip(tat_columns, TAT_STAGES):
+        with column:
+            current = get_stage_metric(current_tat, stage)
+            previous = get_stage_metric(previous_tat, stage)
+            delta = f"{current - previous:+.1f} days" if current is not None and previous is not None else None
+            st.metric(
+                f"Avg. {stage} TAT",
+                f"{current:.1f} days" if current is not None else "N/A",
+                delta=delta,
+                delta_color="inverse"
+            )
     
     # TAT Trend Chart
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("TAT Trends")
-        # Sample data for TAT trends
-        import plotly.graph_objects as go
+        weekly_tat = get_tat_summary(today - timedelta(weeks=8), today, group_by="week")
         
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(
-            x=["Week 1", "Week 2", "Week 3", "Week 4"],
-            y=[2.8, 2.5, 2.3, 2.5],
-            mode='lines+markers',
-            name='Review TAT',
-            line=dict(color='blue')
-        ))
-        fig.add_trace(go.Scatter(
-            x=["Week 1", "Week 2", "Week 3", "Week 4"],
-            y=[2.0, 1.8, 1.6, 1.8],
-            mode='lines+markers',
-            name='Approval TAT',
-            line=dict(color='green')
-        ))
-        fig.add_trace(go.Scatter(
-            x=["Week 1", "Week 2", "Week 3", "Week 4"],
-            y=[3.7, 3.2, 3.0, 3.2],
-            mode='lines+markers',
-            name='Legal Review TAT',
-            line=dict(color='purple')
-        ))
-        fig.update_layout(
-            title="TAT Trends (Days)",
-            xaxis_title="Time Period",
-            yaxis_title="Days",
-            height=400
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        if not weekly_tat.empty:
+            fig = px.line(
+                weekly_tat, x="week", y="mean_days", color="stage", markers=True,
+                labels={"week": "Week", "mean_days": "Days", "stage": "Stage"}
+            )
+            fig.update_layout(title="TAT Trends (Days)", height=400)
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.info("No stages completed in the last 8 weeks")
     
     with col2:
         st.subheader("SLA Compliance")
@@ -162,8 +150,7 @@ def show():
     if user_role in ["Reviewer", "Admin"]:
         st.subheader("🔍 Cases Requiring Review")
         # Get cases that need review (Submitted status)
-        from models import get_cases_by_status
-        review_cases = get_cases_by_status("Submitted")
+        review_cases, _ = get_cases_page(status="Submitted", page_size=DASHBOARD_QUEUE_SIZE)
         
         if review_cases:
             review_data = []
@@ -177,13 +164,14 @@ def show():
                     "Submitted": format_datetime(case["created_at"])
                 })
             st.dataframe(review_data, use_container_width=True)
+            show_queue_caption(len(review_cases), count_cases("Submitted"), "Reviewer Panel")
         else:
             st.info("📭 No cases pending review")
     
     if user_role in ["Approver", "Admin"]:
         st.subheader("✅ Cases Requiring Approval")
         # Get cases that need approval (Approved by reviewer status)
-        approval_cases = get_cases_by_status("Approved")
+        approval_cases, _ = get_cases_page(status="Approved", page_size=DASHBOARD_QUEUE_SIZE)
         
         if approval_cases:
             approval_data = []
@@ -197,6 +185,7 @@ def show():
                     "Reviewed": format_datetime(case["updated_at"])
                 })
             st.dataframe(approval_data, use_container_width=True)
+            show_queue_caption(len(approval_cases), count_cases("Approved"), "Approver Panel")
         else:
             st.info("📭 No cases pending approval")
     
@@ -217,3 +206,8 @@ def show():
         st.dataframe(activity_data, use_container_width=True)
     else:
         st.info("No recent activity found")
+
+def show_queue_caption(shown, total, panel_name):
+    """Note how much of a queue is shown when it is longer than one page"""
+    if total > shown:
+        st.caption(f"Showing newest {shown} of {total} cases. Open the {panel_name} for the full queue.")
@@ -3,14 +3,11 @@ import pandas as pd
 from datetime import datetime, date
 from auth import require_role, get_current_user
 from models import get_cases_by_status, get_case_by_id, update_case_status, get_case_comments
-from database import get_db_connection, log_audit
+from database import get_db_connection, transaction, log_audit
 from utils import generate_case_id
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib import colors
-import io
+from reports import get_investigation_report, get_latest_investigation
+from jobs import submit_unique_job, get_latest_job, has_active_job
+import json
 import os
 
 @require_role(["Investigator", "Admin"])
@@ -382,8 +379,8 @@ def show_investigation_details():
                 'investigation_date': datetime.now()
             }
             
-            # Create investigation details table if not exists and save data
-            with get_db_connection() as conn:
+            # Save investigation details, comment, status change and audit row as one unit of work
+            with transaction() as conn:
                 cursor = conn.cursor()
                 
                 # Create investigation table if not exists
@@ -450,8 +447,6 @@ def show_investigation_details():
                     investigation_data['investigation_date']
                 ))
                 
-                conn.commit()
-                
                 # Add investigation comment to case comments for reviewer workflow
                 from models import add_case_comment
                 investigation_summary = f"""Investigation Summary:
@@ -489,15 +484,16 @@ Comments: {investigation_comments[:100]}{'...' if len(investigation_comments) >
                 elif investigation_status == "Escalated":
                     update_case_status(selected_case, "Escalated", current_user, "Investigation escalated")
                 
-                st.success("✅ Investigation details saved successfully!")
-                st.info("📋 Investigation findings have been added to case comments for reviewer workflow.")
-                
                 log_audit(
                     selected_case, 
                     "Investigation Details Saved", 
                     f"Investigation completed by {username} - Status: {investigation_status}", 
                     username
                 )
+            
+            # Only reached once the unit of work has committed
+            st.success("✅ Investigation details saved successfully!")
+            st.info("📋 Investigation findings have been added to case comments for reviewer workflow.")
 
 def show_investigation_analytics():
     """Show investigation analytics and metrics"""
@@ -579,18 +575,16 @@ def show_pdf_generation():
         # Get case and investigation details
         case_details = get_case_by_id(selected_case_id)
         
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM investigation_details WHERE case_id = ?", (selected_case_id,))
-            investigation_details = cursor.fetchone()
+        investigation_details = get_latest_investigation(selected_case_id)
         
         if st.button("📄 Generate PDF Report", use_container_width=True):
             if case_details:
-                pdf_buffer = generate_investigation_pdf_report(case_details, investigation_details)
+                # Served from the report cache while the case and investigation are unchanged
+                pdf_bytes = get_investigation_report(case_details, investigation_details)
                 
                 st.download_button(
                     label="📥 Download Investigation Report PDF",
-                    data=pdf_buffer.getvalue(),
+                    data=pdf_bytes,
                     file_name=f"Investigation_Report_{selected_case_id}_{datetime.now().strftime('%Y%m%d')}.pdf",
                     mime="application/pdf"
                 )
@@ -598,207 +592,72 @@ def show_pdf_generation():
                 st.success("✅ PDF report generated successfully!")
             else:
                 st.error("❌ Case details not found")
-
-def generate_investigation_pdf_report(case_details, investigation_details):
-    """Generate PDF report using ReportLab"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch)
-    styles = getSampleStyleSheet()
-    story = []
     
-    # Convert sqlite3.Row to dict for easier access
-    if case_details:
-        case_dict = dict(case_details)
-    else:
-        case_dict = {}
+    st.divider()
+    show_batch_report_generation()
+
+def show_batch_report_generation():
+    """Queue month-end report bundles, polling only while one is in progress"""
+    st.subheader("📦 Batch Report Bundle")
     
-    if investigation_details:
-        investigation_dict = dict(investigation_details)
+    polling = has_active_job("report_bundle")
+    st.fragment(show_report_bundle_status, run_every="3s" if polling else None)(polling)
+
+def show_report_bundle_status(polling):
+    """Bundle form and the latest bundle's progress or download"""
+    bundle_running = has_active_job("report_bundle")
+    if polling and not bundle_running:
+        # The bundle finished; rerun the page so polling stops and the download is built once
+        st.rerun()
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        statuses = st.multiselect(
+            "Case Status",
+            ["Draft", "Submitted", "Under Review", "Approved", "Rejected", "Legal Review", "Closed"],
+            key="bundle_statuses"
+        )
+    with col2:
+        today = date.today()
+        date_range = st.date_input("Case Date Range", value=(today.replace(day=1), today), key="bundle_dates")
+    
+    if st.button("📦 Generate Report Bundle", use_container_width=True, disabled=bundle_running):
+        # date_input returns a partial tuple while a range is being picked
+        dates = date_range if isinstance(date_range, tuple) else (date_range,)
+        date_from = dates[0] if dates else None
+        date_to = dates[1] if len(dates) > 1 else None
+        st.session_state.bundle_job_queued = submit_unique_job(
+            "report_bundle", get_current_user(),
+            status=statuses or None,
+            date_from=str(date_from) if date_from else None,
+            date_to=str(date_to) if date_to else None
+        )
+        # Rerun the page so the status fragment starts polling
+        st.rerun()
+    
+    job_id = st.session_state.pop("bundle_job_queued", None)
+    if job_id:
+        st.success(f"Report bundle queued as job #{job_id}")
+    
+    latest = get_latest_job("report_bundle")
+    if not latest:
+        return
+    if latest["status"] in ("Queued", "Running"):
+        st.progress(latest["progress"], text=latest["message"] or "Waiting for a worker")
+    elif latest["status"] == "Succeeded":
+        result = json.loads(latest["result"])
+        st.caption(
+            f"{result['reports']} reports ({result.get('rendered', result['reports'])} rendered, the rest from the report cache) "
+            f"in {result['seconds']}s"
+        )
+        if os.path.exists(result["bundle_path"]):
+            with open(result["bundle_path"], "rb") as f:
+                st.download_button(
+                    label="📥 Download Report Bundle",
+                    data=f,
+                    file_name=os.path.basename(result["bundle_path"]),
+                    mime="application/zip"
+                )
     else:
-        investigation_dict = {}
-    
-    # Title
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        spaceAfter=20,
-        textColor=colors.darkblue,
-        alignment=1  # Center alignment
-    )
-    
-    story.append(Paragraph("Investigation Report on Actual or Suspected Frauds", title_style))
-    story.append(Paragraph("(Vide Chapter IV)", styles['Normal']))
-    story.append(Spacer(1, 20))
-    
-    # PART A: FRAUD REPORT
-    story.append(Paragraph("PART A: FRAUD REPORT", styles['Heading2']))
-    story.append(Spacer(1, 12))
-    
-    # NBFC Details
-    nbfc_data = [
-        ["Name of NBFC", "Aditya Birch Capital Limited"],
-        ["Fraud Number", case_dict.get('case_id', 'N/A')],
-    ]
-    
-    # Branch Details
-    branch_data = [
-        ["Name of the Branch", case_dict.get('branch_location', 'N/A')],
-        ["Branch Type", "Branch Office"],
-        ["Place", case_dict.get('branch_location', 'N/A')],
-        ["District", "N/A"],
-        ["State", "N/A"]
-    ]
-    
-    # Create tables
-    for title, data in [("NBFC Information", nbfc_data), ("Branch Details", branch_data)]:
-        story.append(Paragraph(title, styles['Heading3']))
-        table = Table(data, colWidths=[2*inch, 4*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), colors.lightgrey),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        story.append(table)
-        story.append(Spacer(1, 12))
-    
-    # Case Details
-    case_data = [
-        ["Name of Principal Party/Account", "[Redacted for Privacy]"],
-        ["Area of Operations", case_dict.get('case_type', 'N/A')],
-        ["Nature of Fraud", case_dict.get('case_type', 'N/A')],
-        ["Total Amount Involved", f"₹{case_dict.get('loan_amount', 'N/A')}"],
-        ["Date of Occurrence", str(case_dict.get('case_date', 'N/A'))],
-        ["Date of Detection", str(case_dict.get('created_at', 'N/A'))[:10]],
-    ]
-    
-    story.append(Paragraph("Case Information", styles['Heading3']))
-    case_table = Table(case_data, colWidths=[2*inch, 4*inch])
-    case_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.lightgrey),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    story.append(case_table)
-    story.append(Spacer(1, 12))
-    
-    # Brief History
-    story.append(Paragraph("Brief History", styles['Heading3']))
-    story.append(Paragraph(case_details.get('case_description', 'N/A'), styles['Normal']))
-    story.append(Spacer(1, 12))
-    
-    # Loan Account Details
-    loan_data = [
-        ["LAN No.", case_details.get('lan', 'N/A')],
-        ["Product", case_details.get('product', 'N/A')],
-        ["Sanction Amount", f"₹{case_details.get('loan_amount', 'N/A')}"],
-        ["Sanction Date", str(case_details.get('disbursement_date', 'N/A'))],
-        ["Loan Status", case_details.get('status', 'N/A')]
-    ]
-    
-    story.append(Paragraph("Loan Account Details", styles['Heading3']))
-    loan_table = Table(loan_data, colWidths=[2*inch, 4*inch])
-    loan_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.lightgrey),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    story.append(loan_table)
-    story.append(Spacer(1, 12))
-    
-    # Investigation Findings (if available)
-    if investigation_details:
-        story.append(Paragraph("Investigation Findings", styles['Heading3']))
-        
-        findings_data = [
-            ["PAN Verification", investigation_details.get('pan_verification', 'N/A')],
-            ["Aadhaar Verification", investigation_details.get('aadhaar_verification', 'N/A')],
-            ["Bank Statement Verification", investigation_details.get('bank_statement_verification', 'N/A')],
-            ["Address Verification", investigation_details.get('address_verification', 'N/A')],
-            ["Employment Verification", investigation_details.get('employment_verification', 'N/A')],
-            ["Mobile Verification", investigation_details.get('mobile_verification', 'N/A')],
-            ["CIBIL Review", investigation_details.get('cibil_review', 'N/A')],
-            ["Form 26AS Review", investigation_details.get('form26as_review', 'N/A')]
-        ]
-        
-        findings_table = Table(findings_data, colWidths=[2*inch, 4*inch])
-        findings_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), colors.lightgrey),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        story.append(findings_table)
-        story.append(Spacer(1, 12))
-        
-        # Modus Operandi
-        if investigation_details.get('modus_operandi'):
-            story.append(Paragraph("Modus Operandi Summary", styles['Heading3']))
-            story.append(Paragraph(investigation_details.get('modus_operandi'), styles['Normal']))
-            story.append(Spacer(1, 12))
-        
-        # Root Cause Analysis
-        if investigation_details.get('root_cause_analysis'):
-            story.append(Paragraph("Root Cause Analysis", styles['Heading3']))
-            story.append(Paragraph(investigation_details.get('root_cause_analysis'), styles['Normal']))
-            story.append(Spacer(1, 12))
-        
-        # Recommended Actions
-        actions_data = [
-            ["Business Team", investigation_details.get('business_action', 'N/A')],
-            ["RCU or Credit", investigation_details.get('rcu_action', 'N/A')],
-            ["ORM or Policy", investigation_details.get('orm_action', 'N/A')],
-            ["Compliance", investigation_details.get('compliance_action', 'N/A')],
-            ["IT", investigation_details.get('it_action', 'N/A')],
-            ["Legal", investigation_details.get('legal_action', 'N/A')]
-        ]
-        
-        story.append(Paragraph("Recommended Actions", styles['Heading3']))
-        actions_table = Table(actions_data, colWidths=[2*inch, 4*inch])
-        actions_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), colors.lightgrey),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        story.append(actions_table)
-        story.append(Spacer(1, 12))
-    
-    # Annexures
-    story.append(Paragraph("Annexures", styles['Heading3']))
-    annexures = [
-        "Annexure 1: Fabricated Documents",
-        "Annexure 2: Site Visit Reports", 
-        "Annexure 3: Statement of Account"
-    ]
-    for annexure in annexures:
-        story.append(Paragraph(f"• {annexure}", styles['Normal']))
-    story.append(Spacer(1, 12))
-    
-    # Footer
-    story.append(Spacer(1, 20))
-    story.append(Paragraph(f"Report Generated on: {datetime.now().strftime('%d-%b-%Y %H:%M')}", styles['Normal']))
-    story.append(Paragraph("Generated by: Tathya Case Management System", styles['Normal']))
-    
-    # Build PDF
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
\ No newline at end of file
+        detail = (latest["error"] or latest["message"] or "").splitlines()
+        st.error(f"Last bundle {latest['status'].lower()}" + (f": {detail[0]}" if detail else ""))
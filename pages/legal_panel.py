@@ -1,7 +1,9 @@
 import streamlit as st
-from models import get_cases_by_status, update_case_status, get_case_comments, add_case_comment, get_case_documents
+from models import update_case_status, get_case_comments, add_case_comment, get_case_documents
 from utils import get_status_color, format_datetime, format_file_size
 from auth import get_current_user, require_role
+from pagination import show_case_pages
+from document_views import show_document_preview
 
 @require_role(["Legal Reviewer", "Admin"])
 def show():
@@ -15,14 +17,11 @@ def show():
     
     with tab1:
         st.subheader("Cases Requiring Legal Review")
-        legal_cases = get_cases_by_status("Legal Review")
+        def render_legal_case(case):
+            with st.expander(f"Case: {case['case_id']} - {case['product']} ({case['region']})"):
+                show_legal_case_details(case, current_user)
         
-        if legal_cases:
-            for case in legal_cases:
-                with st.expander(f"Case: {case['case_id']} - {case['product']} ({case['region']})"):
-                    show_legal_case_details(case, current_user)
-        else:
-            st.info("📭 No cases pending legal review")
+        show_case_pages("legal_legal", "Legal Review", render_legal_case, "📭 No cases pending legal review")
     
     with tab2:
         st.subheader("Show Cause Notices & Orders")
@@ -78,6 +77,7 @@ def show_legal_case_details(case, current_user):
                 st.write(format_file_size(doc['file_size']))
             with col3:
                 st.write(format_datetime(doc['uploaded_at']))
+            show_document_preview(doc)
     
     # Legal review actions
     st.write("**Legal Review Actions:**")
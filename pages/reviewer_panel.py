@@ -1,7 +1,9 @@
 import streamlit as st
-from models import get_cases_by_status, get_case_by_id, update_case_status, get_case_comments, add_case_comment, get_case_documents
+from models import get_case_by_id, update_case_status, get_case_comments, add_case_comment, get_case_documents
 from utils import get_status_color, format_datetime, format_file_size
 from auth import get_current_user, require_role
+from pagination import show_case_pages
+from document_views import show_document_preview
 
 @require_role(["Reviewer", "Investigator", "Admin"])
 def show():
@@ -15,36 +17,27 @@ def show():
     
     with tab1:
         st.subheader("Cases Pending Review")
-        submitted_cases = get_cases_by_status("Submitted")
+        def render_submitted_case(case):
+            with st.expander(f"Case: {case['case_id']} - {case['product']} ({case['region']})"):
+                show_case_details(case, current_user, allow_review=True)
         
-        if submitted_cases:
-            for case in submitted_cases:
-                with st.expander(f"Case: {case['case_id']} - {case['product']} ({case['region']})"):
-                    show_case_details(case, current_user, allow_review=True)
-        else:
-            st.info("📭 No cases pending review")
+        show_case_pages("reviewer_submitted", "Submitted", render_submitted_case, "📭 No cases pending review")
     
     with tab2:
         st.subheader("Cases Under Review")
-        under_review_cases = get_cases_by_status("Under Review")
+        def render_under_review_case(case):
+            with st.expander(f"Case: {case['case_id']} - {case['product']} ({case['region']})"):
+                show_case_details(case, current_user, allow_review=True)
         
-        if under_review_cases:
-            for case in under_review_cases:
-                with st.expander(f"Case: {case['case_id']} - {case['product']} ({case['region']})"):
-                    show_case_details(case, current_user, allow_review=True)
-        else:
-            st.info("📭 No cases under review")
+        show_case_pages("reviewer_under_review", "Under Review", render_under_review_case, "📭 No cases under review")
     
     with tab3:
         st.subheader("Reviewed Cases")
-        reviewed_cases = get_cases_by_status("Approved") + get_cases_by_status("Rejected")
+        def render_reviewed_case(case):
+            with st.expander(f"Case: {case['case_id']} - {get_status_color(case['status'])} {case['status']}"):
+                show_case_details(case, current_user, allow_review=False)
         
-        if reviewed_cases:
-            for case in reviewed_cases:
-                with st.expander(f"Case: {case['case_id']} - {get_status_color(case['status'])} {case['status']}"):
-                    show_case_details(case, current_user, allow_review=False)
-        else:
-            st.info("📭 No reviewed cases")
+        show_case_pages("reviewer_reviewed", ["Approved", "Rejected"], render_reviewed_case, "📭 No reviewed cases")
 
 def show_case_details(case, current_user, allow_review=True):
     """Display detailed case information"""
@@ -82,6 +75,7 @@ def show_case_details(case, current_user, allow_review=True):
                 st.write(format_file_size(doc['file_size']))
             with col3:
                 st.write(format_datetime(doc['uploaded_at']))
+            show_document_preview(doc)
     
     # Comments
     comments = get_case_comments(case['case_id'])
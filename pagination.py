@@ -0,0 +1,68 @@
+import streamlit as st
+from models import DEFAULT_PAGE_SIZE, get_cases_page, count_cases
+from document_views import prepare_case_previews
+
+def show_paginated(key, fetch_page, render_row=None, total=None, empty_message="📭 No cases found",
+                   page_size=DEFAULT_PAGE_SIZE, render_page=None):
+    """Render one page of rows with Previous/Next navigation.
+    
+    fetch_page(after, page_size) must return (rows, next_cursor) as the
+    models *_page functions do. Cursors for visited pages are kept in
+    session state under key, so only page_size rows are loaded per rerun.
+    Pass render_row to draw each row, or render_page to draw the page at once.
+    """
+    cursors_key = f"{key}_page_cursors"
+    cursors = st.session_state.setdefault(cursors_key, [None])
+    
+    rows, next_cursor = fetch_page(cursors[-1], page_size)
+    if not rows and len(cursors) > 1:
+        # Page emptied since the last rerun (cases moved on); start over
+        cursors = st.session_state[cursors_key] = [None]
+        rows, next_cursor = fetch_page(None, page_size)
+    
+    if not rows:
+        st.info(empty_message)
+        return
+    
+    if render_page:
+        render_page(rows)
+    else:
+        for row in rows:
+            render_row(row)
+    
+    page_number = len(cursors)
+    first = (page_number - 1) * page_size + 1
+    last = first + len(rows) - 1
+    
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if page_number > 1 and st.button("⬅️ Previous", key=f"{key}_prev"):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        summary = f"Showing {first}–{last}"
+        if total is not None:
+            summary += f" of {total}"
+        st.caption(summary)
+    with col3:
+        if next_cursor and st.button("Next ➡️", key=f"{key}_next"):
+            cursors.append(next_cursor)
+            st.rerun()
+
+def show_case_pages(key, status, render_case, empty_message="📭 No cases found",
+                    page_size=DEFAULT_PAGE_SIZE):
+    """Paginated list of cases in one or more statuses, newest first"""
+    def render_page(cases):
+        # Document previews for the whole page render in parallel, not per expander
+        prepare_case_previews(cases)
+        for case in cases:
+            render_case(case)
+    
+    show_paginated(
+        key,
+        lambda after, size: get_cases_page(status=status, after=after, page_size=size),
+        total=count_cases(status),
+        empty_message=empty_message,
+        page_size=page_size,
+        render_page=render_page
+    )
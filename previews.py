@@ -0,0 +1,211 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor, wait
+
+# Rendered previews, keyed by document content hash. Kept outside
+# uploads/ so storage reconciliation does not see them as orphans.
+PREVIEWS_DIR = os.path.join("cache", "previews")
+
+# Longest edge of a preview in pixels, and the JPEG quality used
+PREVIEW_MAX_SIZE = 480
+PREVIEW_QUALITY = 80
+
+# Least recently viewed previews are evicted beyond this many bytes
+PREVIEW_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+# Decoding large scans is CPU-bound, so previews render in worker processes
+PREVIEW_WORKERS = 2
+
+# A page waits this long, once, for all of its uncached previews together
+PREVIEW_PAGE_TIMEOUT = 1.0
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = {}
+_failed = set()
+_pending_lock = threading.Lock()
+# Running size of the preview cache; None until first measured
+_cache_bytes = None
+_cache_lock = threading.Lock()
+
+def _get_executor():
+    """Create the preview process pool on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawned workers: forking the multithreaded app can copy held locks
+            _executor = ProcessPoolExecutor(max_workers=PREVIEW_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+def preview_key(document):
+    """Cache key for a document: its content hash, or path, size and mtime for legacy files"""
+    if document["content_hash"]:
+        return document["content_hash"]
+    stat = os.stat(document["file_path"])
+    return hashlib.sha256(f"{document['file_path']}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()
+
+def preview_path(key):
+    """Path of the cached preview for a key"""
+    return os.path.join(PREVIEWS_DIR, key[:2], f"{key}.jpg")
+
+def _document_mime_type(document):
+    """MIME type recorded at upload, or guessed from the file name for older rows"""
+    from document_store import detect_mime_type
+    
+    return document["mime_type"] or detect_mime_type(b"", document["original_filename"])
+
+def can_preview(document):
+    """Check whether previews are generated for this kind of document"""
+    mime_type = _document_mime_type(document)
+    return mime_type.startswith("image/") or mime_type == "application/pdf"
+
+def render_preview(source_path, mime_type, target_path):
+    """Render a downscaled JPEG of an image or the first page of a PDF (runs in a worker process)"""
+    from PIL import Image
+    
+    if mime_type == "application/pdf":
+        import pypdfium2 as pdfium
+        
+        pdf = pdfium.PdfDocument(source_path)
+        try:
+            page = pdf[0]
+            width, height = page.get_size()
+            image = page.render(scale=PREVIEW_MAX_SIZE / max(width, height)).to_pil()
+        finally:
+            pdf.close()
+    else:
+        image = Image.open(source_path)
+        # Let the JPEG decoder downscale while decoding instead of after
+        image.draft("RGB", (PREVIEW_MAX_SIZE, PREVIEW_MAX_SIZE))
+    
+    image.thumbnail((PREVIEW_MAX_SIZE, PREVIEW_MAX_SIZE))
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    temp_path = f"{target_path}.{uuid.uuid4().hex}.tmp"
+    image.save(temp_path, "JPEG", quality=PREVIEW_QUALITY)
+    os.replace(temp_path, target_path)
+    return target_path
+
+def _cache_entries():
+    """(mtime, size, path) for every cached preview"""
+    entries = []
+    for directory, _, files in os.walk(PREVIEWS_DIR):
+        for name in files:
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+    return entries
+
+def evict_previews(max_bytes=PREVIEW_CACHE_MAX_BYTES):
+    """Delete least recently used previews until the cache fits in max_bytes"""
+    global _cache_bytes
+    with _cache_lock:
+        entries = _cache_entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        _cache_bytes = total
+    return removed
+
+def _record_preview(path):
+    """Add a new preview to the running cache size; walk the cache only to evict"""
+    global _cache_bytes
+    with _cache_lock:
+        if _cache_bytes is None:
+            _cache_bytes = sum(size for _, size, _ in _cache_entries())
+        elif os.path.exists(path):
+            _cache_bytes += os.path.getsize(path)
+        over_budget = _cache_bytes > PREVIEW_CACHE_MAX_BYTES
+    if over_budget:
+        evict_previews(PREVIEW_CACHE_MAX_BYTES)
+
+def _on_rendered(key, future):
+    """Keep the cache in budget, then drop a finished render from the in-flight map"""
+    if future.exception() is None:
+        _record_preview(future.result())
+    with _pending_lock:
+        _pending.pop(key, None)
+        # Unreadable files and missing renderers are not retried in this process
+        if future.exception() is not None:
+            _failed.add(key)
+
+def request_preview(document):
+    """Start rendering a document's preview if it is not cached; returns a future or None"""
+    if not can_preview(document) or not os.path.exists(document["file_path"]):
+        return None
+    key = preview_key(document)
+    if os.path.exists(preview_path(key)):
+        return None
+    
+    with _pending_lock:
+        if key in _failed:
+            return None
+        future = _pending.get(key)
+        if future is None:
+            # Absolute paths: worker processes keep the working directory they were spawned in
+            future = _get_executor().submit(
+                render_preview, os.path.abspath(document["file_path"]), _document_mime_type(document),
+                os.path.abspath(preview_path(key))
+            )
+            _pending[key] = future
+            future.add_done_callback(lambda f: _on_rendered(key, f))
+    return future
+
+def get_preview(document):
+    """Get the cached preview path for a document without waiting.
+    
+    Returns None when the document cannot be previewed or its preview is
+    not rendered yet; a missing preview is started in the background and
+    picked up on a later rerun.
+    """
+    if not can_preview(document) or not os.path.exists(document["file_path"]):
+        return None
+    path = preview_path(preview_key(document))
+    if os.path.exists(path):
+        # The mtime doubles as the LRU timestamp
+        os.utime(path)
+        return path
+    request_preview(document)
+    return None
+
+def render_previews(documents, timeout=PREVIEW_PAGE_TIMEOUT):
+    """Start every uncached preview for a page of documents and wait for them together.
+    
+    Returns the keys of previews still rendering after timeout seconds.
+    """
+    futures = {}
+    for document in documents:
+        future = request_preview(document)
+        if future is not None:
+            futures[future] = preview_key(document)
+    if not futures:
+        return []
+    _, not_done = wait(futures, timeout=timeout)
+    return [futures[future] for future in not_done]
+
+def previews_pending(keys):
+    """Check whether any of these previews is still rendering"""
+    with _pending_lock:
+        return any(key in _pending and not _pending[key].done() for key in keys)
+
+def is_rendering(document):
+    """Check whether a document's preview is being rendered right now"""
+    if not can_preview(document) or not os.path.exists(document["file_path"]):
+        return False
+    return previews_pending([preview_key(document)])
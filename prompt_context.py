@@ -0,0 +1,126 @@
+from ai_client import estimate_tokens, generate_text
+
+# Token budgets for the context placed into prompts (instructions excluded)
+CHAT_CONTEXT_TOKEN_BUDGET = 1500
+CASE_FIELDS_TOKEN_BUDGET = 1200
+
+# Share of the chat budget the running summary of older turns may use
+CHAT_SUMMARY_BUDGET_SHARE = 0.3
+CHAT_SUMMARY_MAX_TOKENS = 300
+
+# Fields are never cut below this many tokens
+MIN_FIELD_TOKENS = 16
+
+TRUNCATION_MARKER = " …[truncated]"
+
+def fit_text(text, max_tokens):
+    """Trim text to about max_tokens, preferring a sentence or word boundary"""
+    text = text or ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    limit = max(0, max_tokens * 4 - len(TRUNCATION_MARKER))
+    cut = text[:limit]
+    boundary = max(cut.rfind(". "), cut.rfind("\n"))
+    if boundary < limit // 2:
+        boundary = cut.rfind(" ")
+    if boundary > 0:
+        cut = cut[:boundary + 1]
+    return cut.rstrip() + TRUNCATION_MARKER
+
+def fit_fields(fields, budget=CASE_FIELDS_TOKEN_BUDGET):
+    """Fit (name, value, priority) fields into a token budget.
+    
+    Lower priority numbers matter more. While over budget, the least
+    important field that is still longer than MIN_FIELD_TOKENS is
+    truncated. Returns ({name: value}, [truncated names]).
+    """
+    values = {name: str(value) if value is not None else "" for name, value, _ in fields}
+    priorities = {name: priority for name, _, priority in fields}
+    truncated = []
+    
+    overflow = sum(estimate_tokens(value) for value in values.values()) - budget
+    for name in sorted(values, key=lambda name: priorities[name], reverse=True):
+        if overflow <= 0:
+            break
+        tokens = estimate_tokens(values[name])
+        if tokens <= MIN_FIELD_TOKENS:
+            continue
+        target = max(MIN_FIELD_TOKENS, tokens - overflow)
+        values[name] = fit_text(values[name], target)
+        overflow -= tokens - estimate_tokens(values[name])
+        truncated.append(name)
+    return values, truncated
+
+def _format_turns(messages):
+    return "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+
+def summarize_turns(previous_summary, messages):
+    """Fold older chat turns into the running summary"""
+    prompt = (
+        "Update the summary of an investigation assistant conversation. Keep case identifiers, "
+        "facts, decisions and open questions; drop pleasantries. Answer with the summary only.\n\n"
+        f"Current summary:\n{previous_summary or '(none)'}\n\n"
+        f"New turns:\n{_format_turns(messages)}"
+    )
+    try:
+        summary = generate_text(prompt, max_tokens=CHAT_SUMMARY_MAX_TOKENS, temperature=0.0)
+    except Exception:
+        summary = None
+    if not summary:
+        # Without the model, keep the start of each turn
+        summary = "\n".join(filter(None, [previous_summary] + [
+            f"{message['role']}: {fit_text(message['content'], 40)}" for message in messages
+        ]))
+    return fit_text(summary, int(CHAT_CONTEXT_TOKEN_BUDGET * CHAT_SUMMARY_BUDGET_SHARE))
+
+def build_chat_context(history, memory, budget=CHAT_CONTEXT_TOKEN_BUDGET):
+    """Conversation context for the next chat prompt within a token budget.
+    
+    Recent turns are kept verbatim, newest first, while they fit. Turns that
+    no longer fit are folded into memory["summary"] once; memory["summarized"]
+    counts the history entries already folded in, so each turn is
+    summarized only once. Returns (context, report).
+    """
+    memory.setdefault("summary", "")
+    memory.setdefault("summarized", 0)
+    
+    # Interrupted answers are incomplete; leave them out of the context
+    messages = [
+        (index, message) for index, message in enumerate(history)
+        if index >= memory["summarized"] and not message.get("streaming")
+    ]
+    
+    available = budget - estimate_tokens(memory["summary"])
+    recent = []
+    for index, message in reversed(messages):
+        tokens = estimate_tokens(message["content"]) + 4
+        if tokens > available:
+            break
+        recent.insert(0, (index, message))
+        available -= tokens
+    
+    # When summarizing anyway, fold enough turns to leave headroom so the
+    # next few turns fit without another summary call
+    if len(recent) < len(messages):
+        headroom = budget * CHAT_SUMMARY_BUDGET_SHARE
+        while len(recent) > 2 and available < headroom:
+            available += estimate_tokens(recent.pop(0)[1]["content"]) + 4
+    
+    first_recent = recent[0][0] if recent else len(history)
+    aged_out = [message for index, message in messages if index < first_recent]
+    if aged_out:
+        memory["summary"] = summarize_turns(memory["summary"], aged_out)
+        memory["summarized"] = first_recent
+    
+    parts = []
+    if memory["summary"]:
+        parts.append(f"Summary of earlier conversation:\n{memory['summary']}")
+    if recent:
+        parts.append("Previous conversation:\n" + _format_turns([message for _, message in recent]))
+    context = "\n\n".join(parts)
+    
+    return context, {
+        "context_tokens": estimate_tokens(context),
+        "recent_turns": len(recent),
+        "summarized_turns": memory["summarized"],
+    }
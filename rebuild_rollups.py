@@ -0,0 +1,20 @@
+from database import init_database, rebuild_case_rollups, get_db_connection
+
+def rebuild_rollups():
+    """Recompute case_daily_counts and case_status_transitions from source tables"""
+    init_database()
+    rebuild_case_rollups()
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*), COALESCE(SUM(case_count), 0) FROM case_daily_counts")
+        groups, cases = cursor.fetchone()
+        cursor.execute("SELECT COUNT(*) FROM case_status_transitions")
+        transitions = cursor.fetchone()[0]
+    
+    print("Rebuilt case rollups:")
+    print(f"Daily count groups: {groups} ({cases} cases)")
+    print(f"Status transition rows: {transitions}")
+
+if __name__ == "__main__":
+    rebuild_rollups()
@@ -0,0 +1,347 @@
+import glob
+import hashlib
+import io
+import multiprocessing
+import os
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, date
+from functools import lru_cache
+from database import get_db_connection
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.lib import colors
+
+REPORT_BUNDLES_DIR = os.path.join("exports", "reports")
+
+# Worker processes for batch report generation, and how many reports each
+# may have queued so memory stays flat for large bundles
+REPORT_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+REPORTS_IN_FLIGHT_PER_WORKER = 4
+
+# Cases fetched from SQLite per batch when building a bundle
+REPORT_FETCH_BATCH = 200
+
+# Bump when the report layout changes so cached PDFs are regenerated
+REPORT_TEMPLATE_VERSION = 2
+REPORT_CACHE_DIR = os.path.join("cache", "reports")
+
+NBFC_NAME = "Aditya Birch Capital Limited"
+
+# (label, investigation_details column) rows of the findings and actions tables
+FINDINGS_FIELDS = [
+    ("PAN Verification", "pan_verification"),
+    ("Aadhaar Verification", "aadhaar_verification"),
+    ("Bank Statement Verification", "bank_statement_verification"),
+    ("Address Verification", "address_verification"),
+    ("Employment Verification", "employment_verification"),
+    ("Mobile Verification", "mobile_verification"),
+    ("CIBIL Review", "cibil_review"),
+    ("Form 26AS Review", "form26as_review"),
+]
+ACTION_FIELDS = [
+    ("Business Team", "business_action"),
+    ("RCU or Credit", "rcu_action"),
+    ("ORM or Policy", "orm_action"),
+    ("Compliance", "compliance_action"),
+    ("IT", "it_action"),
+    ("Legal", "legal_action"),
+]
+ANNEXURES = [
+    "Annexure 1: Fabricated Documents",
+    "Annexure 2: Site Visit Reports",
+    "Annexure 3: Statement of Account",
+]
+
+@lru_cache(maxsize=1)
+def _report_template():
+    """Styles and static layout shared by every report, built once per process"""
+    styles = getSampleStyleSheet()
+    return {
+        "title": ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=16,
+            spaceAfter=20,
+            textColor=colors.darkblue,
+            alignment=1  # Center alignment
+        ),
+        "normal": styles['Normal'],
+        "heading2": styles['Heading2'],
+        "heading3": styles['Heading3'],
+        "table": TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), colors.lightgrey),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]),
+        "col_widths": [2*inch, 4*inch],
+    }
+
+def _add_table(story, template, title, rows):
+    """Append a titled two-column label/value table"""
+    story.append(Paragraph(title, template["heading3"]))
+    table = Table(rows, colWidths=template["col_widths"])
+    table.setStyle(template["table"])
+    story.append(table)
+    story.append(Spacer(1, 12))
+
+def _add_section(story, template, title, text):
+    """Append a titled free-text section"""
+    story.append(Paragraph(title, template["heading3"]))
+    story.append(Paragraph(text, template["normal"]))
+    story.append(Spacer(1, 12))
+
+def generate_investigation_pdf_report(case_details, investigation_details, generated_on=None):
+    """Generate PDF report using ReportLab; generated_on (a date) defaults to today"""
+    template = _report_template()
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch)
+    story = []
+    
+    # Convert sqlite3.Row to dict for easier access
+    case_dict = dict(case_details) if case_details else {}
+    investigation_dict = dict(investigation_details) if investigation_details else {}
+    
+    # Title
+    story.append(Paragraph("Investigation Report on Actual or Suspected Frauds", template["title"]))
+    story.append(Paragraph("(Vide Chapter IV)", template["normal"]))
+    story.append(Spacer(1, 20))
+    
+    # PART A: FRAUD REPORT
+    story.append(Paragraph("PART A: FRAUD REPORT", template["heading2"]))
+    story.append(Spacer(1, 12))
+    
+    _add_table(story, template, "NBFC Information", [
+        ["Name of NBFC", NBFC_NAME],
+        ["Fraud Number", case_dict.get('case_id', 'N/A')],
+    ])
+    _add_table(story, template, "Branch Details", [
+        ["Name of the Branch", case_dict.get('branch_location', 'N/A')],
+        ["Branch Type", "Branch Office"],
+        ["Place", case_dict.get('branch_location', 'N/A')],
+        ["District", "N/A"],
+        ["State", "N/A"]
+    ])
+    _add_table(story, template, "Case Information", [
+        ["Name of Principal Party/Account", "[Redacted for Privacy]"],
+        ["Area of Operations", case_dict.get('case_type', 'N/A')],
+        ["Nature of Fraud", case_dict.get('case_type', 'N/A')],
+        ["Total Amount Involved", f"₹{case_dict.get('loan_amount', 'N/A')}"],
+        ["Date of Occurrence", str(case_dict.get('case_date', 'N/A'))],
+        ["Date of Detection", str(case_dict.get('created_at', 'N/A'))[:10]],
+    ])
+    _add_section(story, template, "Brief History", case_dict.get('case_description', 'N/A'))
+    _add_table(story, template, "Loan Account Details", [
+        ["LAN No.", case_dict.get('lan', 'N/A')],
+        ["Product", case_dict.get('product', 'N/A')],
+        ["Sanction Amount", f"₹{case_dict.get('loan_amount', 'N/A')}"],
+        ["Sanction Date", str(case_dict.get('disbursement_date', 'N/A'))],
+        ["Loan Status", case_dict.get('status', 'N/A')]
+    ])
+    
+    # Investigation Findings (if available)
+    if investigation_dict:
+        _add_table(story, template, "Investigation Findings", [
+            [label, investigation_dict.get(column, 'N/A')] for label, column in FINDINGS_FIELDS
+        ])
+        if investigation_dict.get('modus_operandi'):
+            _add_section(story, template, "Modus Operandi Summary", investigation_dict['modus_operandi'])
+        if investigation_dict.get('root_cause_analysis'):
+            _add_section(story, template, "Root Cause Analysis", investigation_dict['root_cause_analysis'])
+        _add_table(story, template, "Recommended Actions", [
+            [label, investigation_dict.get(column, 'N/A')] for label, column in ACTION_FIELDS
+        ])
+    
+    # Annexures
+    story.append(Paragraph("Annexures", template["heading3"]))
+    for annexure in ANNEXURES:
+        story.append(Paragraph(f"• {annexure}", template["normal"]))
+    story.append(Spacer(1, 12))
+    
+    # Footer
+    story.append(Spacer(1, 20))
+    # Date only: cached reports are reused for the rest of the day
+    story.append(Paragraph(f"Report Generated on: {(generated_on or date.today()).strftime('%d-%b-%Y')}", template["normal"]))
+    story.append(Paragraph("Generated by: Tathya Case Management System", template["normal"]))
+    
+    # Build PDF
+    doc.build(story)
+    buffer.seek(0)
+    return buffer
+
+def _report_cache_path(case_dict, investigation_dict, generated_on):
+    """Cache file for a report, keyed by case and investigation row versions and the generation date"""
+    key = "|".join(str(part) for part in (
+        REPORT_TEMPLATE_VERSION,
+        generated_on.isoformat(),
+        case_dict["case_id"],
+        case_dict.get("updated_at"),
+        investigation_dict.get("id") if investigation_dict else None,
+        investigation_dict.get("updated_at") if investigation_dict else None,
+    ))
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return os.path.join(REPORT_CACHE_DIR, f"{case_dict['case_id']}_{digest[:16]}.pdf")
+
+def get_latest_investigation(case_id):
+    """Get the newest investigation_details row for a case"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT * FROM investigation_details WHERE case_id = ? ORDER BY id DESC LIMIT 1",
+            (case_id,)
+        )
+        return cursor.fetchone()
+
+def get_investigation_report(case_details, investigation_details):
+    """PDF bytes for a case report, reusing the cached file while neither row has changed"""
+    case_dict = dict(case_details)
+    investigation_dict = dict(investigation_details) if investigation_details else None
+    generated_on = date.today()
+    cache_path = _report_cache_path(case_dict, investigation_dict, generated_on)
+    if os.path.exists(cache_path):
+        with open(cache_path, "rb") as f:
+            return f.read()
+    
+    pdf_bytes = generate_investigation_pdf_report(case_dict, investigation_dict, generated_on).getvalue()
+    os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+    temp_path = f"{cache_path}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(pdf_bytes)
+    os.replace(temp_path, cache_path)
+    
+    # Drop reports cached for earlier versions of this case or earlier days
+    for stale_path in glob.glob(os.path.join(REPORT_CACHE_DIR, f"{glob.escape(case_dict['case_id'])}_*.pdf")):
+        if stale_path != cache_path:
+            try:
+                os.remove(stale_path)
+            except FileNotFoundError:
+                # Another session already dropped it
+                pass
+    return pdf_bytes
+
+def _render_report(case_dict, investigation_dict, use_cache=True):
+    """(case_id, PDF bytes, whether it was rendered rather than read from the report cache); runs in a worker process"""
+    if not use_cache:
+        return case_dict["case_id"], generate_investigation_pdf_report(case_dict, investigation_dict).getvalue(), True
+    cached = os.path.exists(_report_cache_path(case_dict, investigation_dict, date.today()))
+    return case_dict["case_id"], get_investigation_report(case_dict, investigation_dict), not cached
+
+def _report_case_filter(status=None, date_from=None, date_to=None, region=None, product=None):
+    """WHERE conditions and params for the cases included in a bundle"""
+    conditions = []
+    params = []
+    if status:
+        statuses = [status] if isinstance(status, str) else list(status)
+        conditions.append(f"status IN ({', '.join('?' for _ in statuses)})")
+        params.extend(statuses)
+    if date_from:
+        conditions.append("case_date >= ?")
+        params.append(str(date_from))
+    if date_to:
+        conditions.append("case_date <= ?")
+        params.append(str(date_to))
+    if region:
+        conditions.append("region = ?")
+        params.append(region)
+    if product:
+        conditions.append("product = ?")
+        params.append(product)
+    return conditions, params
+
+def _iter_report_inputs(conditions, params):
+    """Yield (case dict, investigation dict) pairs in batches from SQLite"""
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT * FROM cases {where} ORDER BY case_date, case_id", params)
+        while True:
+            cases = [dict(row) for row in cursor.fetchmany(REPORT_FETCH_BATCH)]
+            if not cases:
+                break
+            case_ids = [case["case_id"] for case in cases]
+            investigation_cursor = conn.cursor()
+            investigation_cursor.execute(
+                f"SELECT * FROM investigation_details WHERE case_id IN ({', '.join('?' for _ in case_ids)}) ORDER BY id",
+                case_ids
+            )
+            # The latest investigation row wins when a case has several
+            investigations = {row["case_id"]: dict(row) for row in investigation_cursor.fetchall()}
+            for case in cases:
+                yield case, investigations.get(case["case_id"])
+
+def count_report_cases(**case_filter):
+    """Count the cases a bundle with this filter would contain"""
+    conditions, params = _report_case_filter(**case_filter)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT COUNT(*) FROM cases {where}", params)
+        return cursor.fetchone()[0]
+
+def generate_report_bundle(status=None, date_from=None, date_to=None, region=None, product=None,
+                           workers=REPORT_WORKERS, use_cache=True, job=None):
+    """Render investigation reports for every matching case into one ZIP.
+    
+    Reports render in worker processes and are written to the archive as
+    they complete; at most workers * REPORTS_IN_FLIGHT_PER_WORKER are
+    pending at once. With use_cache=False every report is rendered, which
+    is what throughput figures should measure.
+    """
+    case_filter = dict(status=status, date_from=date_from, date_to=date_to, region=region, product=product)
+    total = count_report_cases(**case_filter)
+    conditions, params = _report_case_filter(**case_filter)
+    
+    os.makedirs(REPORT_BUNDLES_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    bundle_path = os.path.join(REPORT_BUNDLES_DIR, f"Investigation_Reports_{timestamp}_{uuid.uuid4().hex[:6]}.zip")
+    temp_path = bundle_path + ".tmp"
+    
+    started = time.perf_counter()
+    completed = 0
+    rendered = 0
+    try:
+        # Spawned workers: forking the multithreaded app can copy held locks
+        with zipfile.ZipFile(temp_path, "w", zipfile.ZIP_DEFLATED) as bundle, \
+                ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            pending = set()
+            
+            def collect(return_when):
+                nonlocal pending, completed, rendered
+                done, pending = wait(pending, return_when=return_when)
+                for future in done:
+                    case_id, pdf_bytes, was_rendered = future.result()
+                    bundle.writestr(f"Investigation_Report_{case_id}.pdf", pdf_bytes)
+                    completed += 1
+                    rendered += was_rendered
+                if job is not None and done:
+                    job.check_cancelled()
+                    job.report(completed / max(total, 1), f"Rendered {completed} of {total} reports")
+            
+            for case_dict, investigation_dict in _iter_report_inputs(conditions, params):
+                pending.add(executor.submit(_render_report, case_dict, investigation_dict, use_cache))
+                if len(pending) >= workers * REPORTS_IN_FLIGHT_PER_WORKER:
+                    collect(FIRST_COMPLETED)
+            while pending:
+                collect(FIRST_COMPLETED)
+        os.replace(temp_path, bundle_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    
+    elapsed = time.perf_counter() - started
+    return {
+        "bundle_path": bundle_path,
+        "reports": completed,
+        "rendered": rendered,
+        "seconds": round(elapsed, 2),
+        "reports_per_second": round(completed / elapsed, 2) if elapsed else None,
+    }
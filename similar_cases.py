@@ -0,0 +1,309 @@
+import hashlib
+import math
+import re
+import threading
+import zlib
+from collections import Counter
+import numpy as np
+from database import get_db_connection, transaction, call_after_commit
+from prompt_context import fit_text
+
+# Hashed TF-IDF vectors: terms are hashed into VECTOR_DIM buckets, so new
+# vocabulary never forces a rebuild and cases can be indexed one at a time.
+# Changing VECTOR_DIM or the tokenizer re-indexes every case on next load.
+VECTOR_DIM = 1024
+
+# Random-projection LSH: NUM_TABLES tables of SIGNATURE_BITS hyperplanes.
+# Below ANN_MIN_CASES an exact scan is faster than bucket lookups.
+NUM_TABLES = 8
+SIGNATURE_BITS = 10
+ANN_MIN_CASES = 2000
+LSH_SEED = 20250728
+
+# Case comments that carry investigation findings or closure notes
+INDEXED_COMMENT_TYPES = ("Investigation Report", "Closure Note", "Status Change to Closed")
+
+# investigation_details text columns (the table has two historical layouts)
+INVESTIGATION_TEXT_COLUMNS = (
+    "investigation_findings", "fraud_indicators", "risk_assessment", "final_conclusion",
+    "modus_operandi", "root_cause_analysis", "investigation_comments"
+)
+
+# Cases vectorized and stored per transaction
+INDEX_BATCH_SIZE = 500
+
+SIMILAR_CASES_TOKEN_BUDGET = 600
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have he her his in is it its of on or she that the their
+this to was were which with not no but been being than then there they them we our you your
+""".split())
+
+def tokenize(text):
+    """Lower-case word tokens plus adjacent-word bigrams"""
+    words = [word for word in re.findall(r"[a-z0-9]{2,}", (text or "").lower()) if word not in STOPWORDS]
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+def vectorize(text):
+    """Signed hashed term-frequency vector (sublinear tf) of a text"""
+    vector = np.zeros(VECTOR_DIM, dtype=np.float32)
+    for term, count in Counter(tokenize(text)).items():
+        bucket = zlib.crc32(term.encode())
+        sign = 1.0 if bucket & 0x80000000 else -1.0
+        vector[bucket % VECTOR_DIM] += sign * (1.0 + math.log(count))
+    return vector
+
+def _case_texts(cursor, case_ids):
+    """{case_id: indexed text} from the description, investigation and closure notes"""
+    placeholders = ",".join("?" * len(case_ids))
+    texts = {}
+    cursor.execute(
+        f"SELECT case_id, case_type, product, case_description, closure_reason FROM cases WHERE case_id IN ({placeholders})",
+        case_ids
+    )
+    for row in cursor.fetchall():
+        texts[row["case_id"]] = [row["case_type"], row["product"], row["case_description"], row["closure_reason"]]
+    
+    cursor.execute(f"SELECT * FROM investigation_details WHERE case_id IN ({placeholders})", case_ids)
+    for row in cursor.fetchall():
+        if row["case_id"] in texts:
+            texts[row["case_id"]].extend(row[column] for column in INVESTIGATION_TEXT_COLUMNS if column in row.keys())
+    
+    type_placeholders = ",".join("?" * len(INDEXED_COMMENT_TYPES))
+    cursor.execute(f'''
+        SELECT case_id, comment FROM case_comments
+        WHERE case_id IN ({placeholders}) AND comment_type IN ({type_placeholders})
+        ORDER BY id
+    ''', list(case_ids) + list(INDEXED_COMMENT_TYPES))
+    for row in cursor.fetchall():
+        if row["case_id"] in texts:
+            texts[row["case_id"]].append(row["comment"])
+    
+    return {case_id: "\n".join(str(part) for part in parts if part) for case_id, parts in texts.items()}
+
+def _source_hash(text):
+    """Fingerprint of the indexed text, so unchanged cases are not re-vectorized"""
+    return hashlib.sha256(f"{VECTOR_DIM}\n{text}".encode()).hexdigest()
+
+class SimilarCaseIndex:
+    """In-memory vector index over all cases with LSH buckets for large case books"""
+    
+    def __init__(self):
+        rng = np.random.default_rng(LSH_SEED)
+        self.hyperplanes = rng.standard_normal((NUM_TABLES * SIGNATURE_BITS, VECTOR_DIM)).astype(np.float32)
+        self.bit_weights = 1 << np.arange(SIGNATURE_BITS)
+        self.case_ids = []
+        self.rows = {}
+        self.vectors = np.zeros((64, VECTOR_DIM), dtype=np.float32)
+        self.signatures = np.zeros((64, NUM_TABLES), dtype=np.int64)
+        self.buckets = [{} for _ in range(NUM_TABLES)]
+        self.document_frequency = np.zeros(VECTOR_DIM, dtype=np.float32)
+    
+    def _signature(self, vector):
+        bits = (self.hyperplanes @ vector > 0).reshape(NUM_TABLES, SIGNATURE_BITS)
+        return bits @ self.bit_weights
+    
+    def upsert(self, case_id, vector):
+        """Add or replace a case's vector"""
+        row = self.rows.get(case_id)
+        if row is None:
+            row = len(self.case_ids)
+            if row == len(self.vectors):
+                self.vectors = np.concatenate([self.vectors, np.zeros_like(self.vectors)])
+                self.signatures = np.concatenate([self.signatures, np.zeros_like(self.signatures)])
+            self.case_ids.append(case_id)
+            self.rows[case_id] = row
+        else:
+            self.document_frequency -= self.vectors[row] != 0
+            for table, signature in enumerate(self.signatures[row]):
+                self.buckets[table][signature].discard(row)
+        
+        self.vectors[row] = vector
+        self.document_frequency += vector != 0
+        self.signatures[row] = self._signature(vector)
+        for table, signature in enumerate(self.signatures[row]):
+            self.buckets[table].setdefault(signature, set()).add(row)
+    
+    def _candidates(self, vector, limit):
+        """Rows sharing an LSH bucket with vector, or None to scan everything"""
+        if len(self.case_ids) < ANN_MIN_CASES:
+            return None
+        candidates = set()
+        for table, signature in enumerate(self._signature(vector)):
+            candidates.update(self.buckets[table].get(signature, ()))
+        return np.fromiter(candidates, dtype=np.int64) if len(candidates) >= limit * 4 else None
+    
+    def query(self, vector, limit=5, exclude=None):
+        """[(case_id, cosine similarity)] of the nearest cases under TF-IDF weighting"""
+        count = len(self.case_ids)
+        if not count or not vector.any():
+            return []
+        idf = np.log((1.0 + count) / (1.0 + self.document_frequency)) + 1.0
+        
+        rows = self._candidates(vector, limit)
+        matrix = self.vectors[:count] if rows is None else self.vectors[rows]
+        weighted = matrix * idf
+        query = vector * idf
+        norms = np.linalg.norm(weighted, axis=1) * np.linalg.norm(query)
+        scores = np.divide(weighted @ query, norms, out=np.zeros(len(weighted), dtype=np.float32), where=norms > 0)
+        
+        results = []
+        for position in np.argsort(-scores)[:limit + 1]:
+            row = position if rows is None else rows[position]
+            case_id = self.case_ids[row]
+            if case_id != exclude and scores[position] > 0:
+                results.append((case_id, float(scores[position])))
+        return results[:limit]
+
+_index = None
+_index_lock = threading.Lock()
+_pending = set()
+
+def mark_case_changed(case_id):
+    """Re-index a case on the next lookup, once the current write commits"""
+    call_after_commit(lambda: _pending.add(case_id))
+
+def _vectorize_cases(case_ids):
+    """[(case_id, source_hash, vector)] for cases whose indexed text changed since it was stored.
+    
+    Runs on a read connection: the text is read and vectorized without
+    holding the write lock.
+    """
+    placeholders = ",".join("?" * len(case_ids))
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        texts = _case_texts(cursor, case_ids)
+        cursor.execute(f"SELECT case_id, source_hash FROM case_vectors WHERE case_id IN ({placeholders})", case_ids)
+        stored = {row["case_id"]: row["source_hash"] for row in cursor.fetchall()}
+    
+    changed = []
+    for case_id, text in texts.items():
+        source_hash = _source_hash(text)
+        if stored.get(case_id) != source_hash:
+            changed.append((case_id, source_hash, vectorize(text)))
+    return changed
+
+def _store_vectors(changed):
+    """Persist computed vectors in one short write transaction"""
+    with transaction() as conn:
+        conn.executemany('''
+            INSERT INTO case_vectors (case_id, source_hash, vector, updated_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT (case_id) DO UPDATE SET
+                source_hash = excluded.source_hash, vector = excluded.vector, updated_at = CURRENT_TIMESTAMP
+        ''', [(case_id, source_hash, vector.tobytes()) for case_id, source_hash, vector in changed])
+
+def _index_cases(case_ids, job=None):
+    """Vectorize changed cases, store them in case_vectors and update a loaded index"""
+    case_ids = list(case_ids)
+    updated = 0
+    for start in range(0, len(case_ids), INDEX_BATCH_SIZE):
+        changed = _vectorize_cases(case_ids[start:start + INDEX_BATCH_SIZE])
+        if changed:
+            _store_vectors(changed)
+            with _index_lock:
+                if _index is not None:
+                    for case_id, _, vector in changed:
+                        _index.upsert(case_id, vector)
+            updated += len(changed)
+        if job is not None:
+            done = min(start + INDEX_BATCH_SIZE, len(case_ids))
+            job.report(done / len(case_ids), f"Indexed {done}/{len(case_ids)} cases")
+            job.check_cancelled()
+    return updated
+
+def _load_index():
+    """Build the index from the stored vectors; returns (index, ids of cases not indexed yet)"""
+    index = SimilarCaseIndex()
+    missing = []
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT c.case_id, v.vector FROM cases c
+            LEFT JOIN case_vectors v ON v.case_id = c.case_id
+        ''')
+        for row in cursor:
+            if row["vector"] is not None and len(row["vector"]) == VECTOR_DIM * 4:
+                index.upsert(row["case_id"], np.frombuffer(row["vector"], dtype=np.float32))
+            else:
+                missing.append(row["case_id"])
+    return index, missing
+
+def _schedule_rebuild():
+    """Queue a background index build unless one is already queued or running"""
+    from jobs import submit_unique_job
+    
+    submit_unique_job("similar_case_index", "system")
+
+def get_similar_case_index():
+    """The process-wide index, with cases changed since the last lookup re-indexed.
+    
+    Lookups never vectorize the whole case book: cases without a stored
+    vector (a new install, or a VECTOR_DIM change) are indexed by the
+    similar_case_index background job and join the index as it runs.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _pending.clear()
+            _index, missing = _load_index()
+            if missing:
+                _schedule_rebuild()
+        changed = list(_pending)
+        _pending.difference_update(changed)
+    if changed:
+        # A handful of cases edited since the last lookup
+        _index_cases(changed)
+    return _index
+
+def rebuild_similar_case_index(job=None):
+    """Re-vectorize every case whose indexed text has changed (run as a background job)"""
+    global _index
+    with get_db_connection() as conn:
+        case_ids = [row["case_id"] for row in conn.execute("SELECT case_id FROM cases")]
+    with _index_lock:
+        if _index is None:
+            _index, _ = _load_index()
+        _pending.clear()
+    updated = _index_cases(case_ids, job)
+    return {"cases": len(case_ids), "updated": updated}
+
+def find_similar_cases(text=None, case_id=None, limit=5):
+    """Most similar past cases to a text or an existing case, best first.
+    
+    With text, case_id only excludes that case from the results. Returns
+    dicts with case_id, score, case_type, status, case_description and
+    closure_reason.
+    """
+    index = get_similar_case_index()
+    if text is None and case_id in index.rows:
+        vector = index.vectors[index.rows[case_id]]
+    else:
+        vector = vectorize(text)
+    matches = index.query(vector, limit, exclude=case_id)
+    if not matches:
+        return []
+    
+    scores = dict(matches)
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT case_id, case_type, status, case_description, closure_reason FROM cases WHERE case_id IN ({','.join('?' * len(scores))})",
+            list(scores)
+        )
+        cases = {row["case_id"]: dict(row) for row in cursor.fetchall()}
+    return [dict(cases[case_id], score=score) for case_id, score in matches if case_id in cases]
+
+def format_similar_cases(similar_cases, budget=SIMILAR_CASES_TOKEN_BUDGET):
+    """Similar cases as a prompt section within a token budget"""
+    if not similar_cases:
+        return ""
+    per_case = max(1, budget // len(similar_cases))
+    lines = ["Similar past cases from our records (for reference):"]
+    for case in similar_cases:
+        outcome = f"; closed: {case['closure_reason']}" if case.get("closure_reason") else ""
+        lines.append(fit_text(
+            f"- {case['case_id']} ({case['case_type']}, {case['status']}{outcome}): {case['case_description']}",
+            per_case
+        ))
+    return "\n".join(lines)
@@ -0,0 +1,142 @@
+import os
+from datetime import datetime
+from database import get_dedicated_connection
+
+SNAPSHOTS_DIR = os.path.join("exports", "snapshots")
+
+# Rows read from SQLite per Arrow record batch
+SNAPSHOT_BATCH_ROWS = 50000
+
+# Snapshot tables: name -> (query, partition column). Every query adds a
+# month column (YYYY-MM) used for hive-style partitioning.
+SNAPSHOT_TABLES = {
+    "cases": ("SELECT *, substr(case_date, 1, 7) AS case_month FROM cases", "case_month"),
+    "audit_logs": ("SELECT *, substr(performed_at, 1, 7) AS log_month FROM audit_logs", "log_month"),
+    "case_comments": ("SELECT *, substr(created_at, 1, 7) AS comment_month FROM case_comments", "comment_month"),
+}
+
+def _arrow_type(declared_type):
+    """Map a SQLite declared column type to an Arrow type"""
+    import pyarrow as pa
+    
+    declared_type = (declared_type or "").upper()
+    if "INT" in declared_type or "BOOL" in declared_type:
+        return pa.int64()
+    if any(name in declared_type for name in ("REAL", "FLOA", "DOUB", "DECIMAL", "NUMERIC")):
+        return pa.float64()
+    return pa.string()
+
+def _coerce(value, arrow_type):
+    """Coerce a loosely typed SQLite value to the column's Arrow type"""
+    import pyarrow as pa
+    
+    if value is None:
+        return None
+    if arrow_type == pa.string():
+        return str(value)
+    try:
+        return int(value) if arrow_type == pa.int64() else float(value)
+    except (TypeError, ValueError):
+        return None  # e.g. '' stored in a numeric column
+
+def _table_schema(cursor, table, columns):
+    """Arrow schema for a query over table, from the declared column types"""
+    import pyarrow as pa
+    
+    cursor.execute(f"PRAGMA table_info({table})")
+    declared = {row["name"]: row["type"] for row in cursor.fetchall()}
+    return pa.schema([(name, _arrow_type(declared.get(name))) for name in columns])
+
+def _iter_record_batches(cursor, schema, batch_rows):
+    """Yield Arrow record batches from an executed cursor, batch_rows at a time"""
+    import pyarrow as pa
+    
+    while True:
+        rows = cursor.fetchmany(batch_rows)
+        if not rows:
+            break
+        arrays = [
+            pa.array([_coerce(row[i], field.type) for row in rows], type=field.type)
+            for i, field in enumerate(schema)
+        ]
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+def export_snapshot(snapshot_dir=None, batch_rows=SNAPSHOT_BATCH_ROWS):
+    """Write cases, audit_logs and case_comments as month-partitioned Parquet.
+    
+    Rows are streamed from SQLite in record batches, so memory is bounded by
+    batch_rows rather than table size. Returns {table: rows written}.
+    """
+    import pyarrow.dataset as ds
+    
+    snapshot_dir = snapshot_dir or os.path.join(SNAPSHOTS_DIR, datetime.now().strftime("%Y%m%d_%H%M%S"))
+    row_counts = {}
+    
+    with get_dedicated_connection() as conn:
+        cursor = conn.cursor()
+        for table, (query, partition_column) in SNAPSHOT_TABLES.items():
+            cursor.execute(query)
+            columns = [description[0] for description in cursor.description]
+            schema = _table_schema(conn.cursor(), table, columns)
+            
+            row_counts[table] = 0
+            def counted(batches, table=table):
+                for batch in batches:
+                    row_counts[table] += batch.num_rows
+                    yield batch
+            
+            ds.write_dataset(
+                counted(_iter_record_batches(cursor, schema, batch_rows)),
+                os.path.join(snapshot_dir, table),
+                schema=schema,
+                format="parquet",
+                partitioning=[partition_column],
+                partitioning_flavor="hive",
+                existing_data_behavior="overwrite_or_ignore"
+            )
+    
+    return row_counts
+
+def list_snapshots():
+    """Snapshot directories, newest first"""
+    if not os.path.isdir(SNAPSHOTS_DIR):
+        return []
+    names = sorted(os.listdir(SNAPSHOTS_DIR), reverse=True)
+    return [os.path.join(SNAPSHOTS_DIR, name) for name in names if os.path.isdir(os.path.join(SNAPSHOTS_DIR, name))]
+
+def load_snapshot_table(table, snapshot_dir=None, columns=None, months=None):
+    """Load one snapshot table as a pandas DataFrame.
+    
+    Defaults to the newest snapshot. columns limits the columns read, and
+    months (["2025-07", ...]) prunes partitions so only those files are opened.
+    """
+    import pyarrow.dataset as ds
+    
+    if snapshot_dir is None:
+        snapshots = list_snapshots()
+        if not snapshots:
+            raise FileNotFoundError("No snapshots found; run export_snapshot() first")
+        snapshot_dir = snapshots[0]
+    
+    _, partition_column = SNAPSHOT_TABLES[table]
+    dataset = ds.dataset(os.path.join(snapshot_dir, table), format="parquet", partitioning="hive")
+    row_filter = ds.field(partition_column).isin(months) if months else None
+    return dataset.to_table(columns=columns, filter=row_filter).to_pandas()
+
+def snapshot_months(date_from, date_to):
+    """Partition months (YYYY-MM) covering a date range, oldest first"""
+    months = []
+    year, month = date_from.year, date_from.month
+    while (year, month) <= (date_to.year, date_to.month):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+def snapshot_case_counts(group_by, months=None, snapshot_dir=None):
+    """Cases per month and group_by value, reading only the given months' partitions"""
+    _, partition_column = SNAPSHOT_TABLES["cases"]
+    cases = load_snapshot_table("cases", snapshot_dir, columns=[partition_column, group_by], months=months)
+    # Partition values load as categoricals; count only combinations that occur
+    counts = cases.groupby([partition_column, group_by], observed=True).size().reset_index(name="Cases")
+    counts[partition_column] = counts[partition_column].astype(str)
+    return counts
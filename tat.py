@@ -0,0 +1,68 @@
+import pandas as pd
+from database import get_db_connection, TAT_STAGES
+from cache import TTLCache
+from models import register_case_cache
+
+TAT_CACHE_TTL_SECONDS = 300
+
+# Groupings offered for TAT breakdowns -> case_stage_durations column
+TAT_GROUPINGS = {
+    "Week": "week",
+    "Region": "region",
+    "Product": "product"
+}
+
+def load_stage_durations(date_from=None, date_to=None):
+    """Load stage durations completed in a window from case_stage_durations"""
+    query = '''
+        SELECT stage, completed_at, duration_days, region, product
+        FROM case_stage_durations
+        WHERE completed_at >= COALESCE(?, completed_at)
+          AND completed_at < COALESCE(date(?, '+1 day'), date(completed_at, '+1 day'))
+    '''
+    params = [str(date_from) if date_from else None, str(date_to) if date_to else None]
+    with get_db_connection() as conn:
+        durations = pd.read_sql_query(query, conn, params=params)
+    durations["completed_at"] = pd.to_datetime(durations["completed_at"])
+    durations["week"] = durations["completed_at"].dt.to_period("W").dt.start_time
+    return durations
+
+def summarize_durations(durations, group_by=None):
+    """Mean, median and p90 duration in days per stage (and group)"""
+    keys = ["stage"] + ([group_by] if group_by else [])
+    columns = keys + ["mean_days", "median_days", "p90_days", "cases"]
+    if durations.empty:
+        return pd.DataFrame(columns=columns)
+    
+    grouped = durations.groupby(keys)["duration_days"]
+    summary = pd.DataFrame({
+        "mean_days": grouped.mean(),
+        "median_days": grouped.median(),
+        "p90_days": grouped.quantile(0.9),
+        "cases": grouped.size()
+    }).reset_index()
+    return summary[columns]
+
+def _compute_tat_summary(date_from, date_to, group_by):
+    return summarize_durations(load_stage_durations(date_from, date_to), group_by)
+
+_tat_cache = TTLCache(_compute_tat_summary, TAT_CACHE_TTL_SECONDS)
+register_case_cache(_tat_cache)
+
+def get_tat_summary(date_from=None, date_to=None, group_by=None):
+    """Cached TAT summary for stages completed between date_from and date_to.
+    
+    group_by is None or a TAT_GROUPINGS value ("week", "region", "product").
+    The frame is shared between callers; copy it before modifying.
+    """
+    return _tat_cache.get(
+        str(date_from) if date_from else None,
+        str(date_to) if date_to else None,
+        group_by,
+        stale_while_revalidate=True
+    )
+
+def get_stage_metric(summary, stage, metric="mean_days"):
+    """Read one stage's metric from an ungrouped summary (None if no data)"""
+    row = summary[summary["stage"] == stage]
+    return None if row.empty else float(row[metric].iloc[0])
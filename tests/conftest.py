@@ -0,0 +1,29 @@
+import pytest
+import database
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """Fresh, fully migrated database in a temporary working directory"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(database, "DATABASE_PATH", str(tmp_path / "case_management.db"))
+    database.init_database()
+    yield database.DATABASE_PATH
+    database.get_connection_pool().close_all()
+
+def make_case(case_id, **fields):
+    """Case data accepted by models.create_case"""
+    case_data = {
+        "case_id": case_id,
+        "lan": f"LAN{case_id[-5:]}",
+        "case_type": "Document Fraud",
+        "product": "Personal Loan",
+        "region": "North",
+        "referred_by": "Credit Unit",
+        "case_description": "Customer submitted forged salary slips for a personal loan.",
+        "case_date": "2025-01-15",
+        "customer_name": "Test Customer",
+        "branch_location": "Pune",
+        "loan_amount": 250000,
+    }
+    case_data.update(fields)
+    return case_data
@@ -0,0 +1,158 @@
+import asyncio
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import ai_executor
+from ai_executor import TokenBucket
+
+class FakeGeminiServer:
+    """Local HTTP server answering each request with the next scripted status code"""
+    
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.requests = 0
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                server.requests += 1
+                status = server.statuses.pop(0) if server.statuses else 200
+                body = b'{"text": "ok"}' if status == 200 else b'{"error": "fake"}'
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, *args):
+                pass
+        
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1beta/models/fake:generateContent"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+    
+    async def generate(self, prompt):
+        """Backend call in the shape the executor expects; HTTPError carries .code"""
+        def post():
+            request = urllib.request.Request(self.url, data=prompt.encode(), method="POST")
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.read().decode()
+        return await asyncio.to_thread(post)
+    
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+@pytest.fixture
+def executor(monkeypatch):
+    """Executor with no rate limit and near-zero retry backoff"""
+    ai_executor._get_loop()
+    monkeypatch.setattr(ai_executor, "_bucket", TokenBucket(1000, 1000))
+    monkeypatch.setattr(ai_executor, "AI_RETRY_BASE_DELAY_SECONDS", 0.01)
+    monkeypatch.setattr(ai_executor, "AI_RETRY_MAX_DELAY_SECONDS", 0.02)
+    return ai_executor
+
+@pytest.fixture
+def fake_server():
+    servers = []
+    
+    def start(statuses):
+        servers.append(FakeGeminiServer(statuses))
+        return servers[-1]
+    
+    yield start
+    for server in servers:
+        server.close()
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_retries_transient_http_errors(executor, fake_server, status):
+    server = fake_server([status, status])
+    
+    assert executor.run(server.generate, "prompt", deadline=5) == '{"text": "ok"}'
+    assert server.requests == 3
+
+def test_gives_up_after_max_retries(executor, fake_server):
+    server = fake_server([503] * 10)
+    
+    with pytest.raises(urllib.error.HTTPError) as error:
+        executor.run(server.generate, "prompt", deadline=5)
+    assert error.value.code == 503
+    assert server.requests == executor.AI_MAX_RETRIES + 1
+
+def test_does_not_retry_client_errors(executor, fake_server):
+    server = fake_server([400])
+    
+    with pytest.raises(urllib.error.HTTPError):
+        executor.run(server.generate, "prompt", deadline=5)
+    assert server.requests == 1
+
+def test_deadline_bounds_the_whole_request(executor):
+    calls = []
+    
+    async def slow(prompt):
+        calls.append(prompt)
+        await asyncio.sleep(5)
+    
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        executor.run(slow, "prompt", deadline=0.3)
+    elapsed = time.monotonic() - started
+    
+    assert 0.25 <= elapsed < 1.0
+    # Attempt timeouts are retryable, but no retry fits in the remaining time
+    assert len(calls) == 1
+
+def test_cancelling_the_future_cancels_the_call(executor):
+    started = threading.Event()
+    cancelled = threading.Event()
+    
+    async def slow(prompt):
+        started.set()
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+    
+    future = executor.submit(slow, "prompt", deadline=10)
+    assert started.wait(1)
+    future.cancel()
+    
+    assert cancelled.wait(1)
+
+def test_token_bucket_limits_request_rate(executor, monkeypatch):
+    # 10 requests/s with a burst of 2: 6 calls need about (6 - 2) / 10 seconds
+    monkeypatch.setattr(ai_executor, "_bucket", TokenBucket(10, 2))
+    call_times = []
+    
+    async def record(prompt):
+        call_times.append(time.monotonic())
+        return prompt
+    
+    started = time.monotonic()
+    results = executor.run_many(record, [(str(i),) for i in range(6)], deadline=5)
+    
+    assert results == [str(i) for i in range(6)]
+    assert len(call_times) == 6
+    assert 0.35 <= max(call_times) - started < 1.0
+    assert max(call_times[:2]) - started < 0.05
+
+def test_stream_retries_only_before_first_chunk(executor):
+    attempts = []
+    
+    async def flaky_stream(prompt):
+        attempts.append(prompt)
+        if len(attempts) == 1:
+            raise ConnectionError("reset before first chunk")
+        yield "partial "
+        raise ConnectionError("reset mid-stream")
+    
+    chunks = []
+    with pytest.raises(ConnectionError, match="mid-stream"):
+        for chunk in executor.stream(flaky_stream, "prompt", deadline=5):
+            chunks.append(chunk)
+    
+    assert chunks == ["partial "]
+    assert len(attempts) == 2
@@ -0,0 +1,12 @@
+import os
+from backups import create_backup, verify_backup
+
+def test_backup_reports_the_database_it_copied(temp_db, tmp_path, monkeypatch):
+    # Nothing named like the default database path exists from here
+    (tmp_path / "elsewhere").mkdir()
+    monkeypatch.chdir(tmp_path / "elsewhere")
+    
+    result = create_backup(compress=False)
+    
+    assert result["source_bytes"] == os.path.getsize(temp_db)
+    assert verify_backup(result["backup_path"]) == []
@@ -0,0 +1,20 @@
+from conftest import make_case
+from database import get_db_connection
+from models import create_case, update_case_status
+
+def _daily_counts():
+    with get_db_connection() as conn:
+        rows = conn.execute("SELECT status, region, case_count FROM case_daily_counts").fetchall()
+    return {(row["status"], row["region"]): row["case_count"] for row in rows}
+
+def test_status_change_moves_the_count_and_drops_only_the_emptied_key(temp_db):
+    create_case(make_case("CASE20250115RL001A", status="Submitted"), "admin")
+    create_case(make_case("CASE20250115RL002A", status="Submitted", region="South"), "admin")
+    assert _daily_counts() == {("Submitted", "North"): 1, ("Submitted", "South"): 1}
+    
+    update_case_status("CASE20250115RL001A", "Under Review", "admin")
+    
+    assert _daily_counts() == {("Under Review", "North"): 1, ("Submitted", "South"): 1}
+    with get_db_connection() as conn:
+        trigger_sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'case_rollups_update'").fetchone()["sql"]
+    assert "DELETE FROM case_daily_counts WHERE case_count <= 0" not in trigger_sql
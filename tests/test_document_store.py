@@ -0,0 +1,125 @@
+import io
+import os
+import time
+import document_store
+from conftest import make_case
+from document_store import store_blob, get_blob, get_storage_total, get_storage_usage, reconcile_storage, collect_unreferenced_blobs
+from database import transaction
+from models import create_case, add_case_document
+
+def _upload(case_id, content, filename="evidence.pdf"):
+    content_hash, file_path, file_size, mime_type = store_blob(io.BytesIO(content), filename)
+    add_case_document(case_id, filename, filename, file_path, file_size, "admin", content_hash, mime_type)
+    return file_path
+
+def _age(path, seconds):
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+def test_storage_total_counts_deduplicated_blobs_once(temp_db):
+    create_case(make_case("CASE20250115ST001A"), "admin")
+    create_case(make_case("CASE20250115ST002A"), "admin")
+    shared = b"%PDF-1.4 shared evidence" * 100
+    _upload("CASE20250115ST001A", shared)
+    _upload("CASE20250115ST002A", shared)
+    _upload("CASE20250115ST002A", b"%PDF-1.4 other" * 10)
+    
+    assert get_storage_total() == (2, len(shared) + len(b"%PDF-1.4 other" * 10))
+    # Per-case totals still charge each case for what it references
+    assert {row["scope_key"]: row["total_bytes"] for row in get_storage_usage("case")}["CASE20250115ST001A"] == len(shared)
+    
+    reconcile_storage()
+    assert get_storage_total() == (2, len(shared) + len(b"%PDF-1.4 other" * 10))
+
+def test_dedup_hit_refreshes_blob_mtime(temp_db):
+    content = b"%PDF-1.4 evidence"
+    _, file_path, _, _ = store_blob(io.BytesIO(content), "a.pdf")
+    _age(file_path, 2 * document_store.ORPHAN_GRACE_SECONDS)
+    
+    store_blob(io.BytesIO(content), "b.pdf")
+    
+    assert time.time() - os.path.getmtime(file_path) < 60
+
+def test_reconcile_keeps_blob_touched_by_in_flight_upload(temp_db):
+    content = b"%PDF-1.4 evidence"
+    _, file_path, _, _ = store_blob(io.BytesIO(content), "a.pdf")
+    _age(file_path, 2 * document_store.ORPHAN_GRACE_SECONDS)
+    # An upload of the same content whose case has not been saved yet
+    store_blob(io.BytesIO(content), "b.pdf")
+    
+    result = reconcile_storage(remove_orphans=True)
+    
+    assert result["orphaned_files"] == 1
+    assert result["removed_orphans"] == 0
+    assert os.path.exists(file_path)
+
+def test_reconcile_removes_old_orphans_only(temp_db):
+    create_case(make_case("CASE20250115ST003A"), "admin")
+    referenced = _upload("CASE20250115ST003A", b"%PDF-1.4 kept")
+    _, orphan, _, _ = store_blob(io.BytesIO(b"%PDF-1.4 abandoned"), "c.pdf")
+    _age(referenced, 2 * document_store.ORPHAN_GRACE_SECONDS)
+    _age(orphan, 2 * document_store.ORPHAN_GRACE_SECONDS)
+    
+    result = reconcile_storage(remove_orphans=True)
+    
+    assert result["removed_orphans"] == 1
+    assert os.path.exists(referenced)
+    assert not os.path.exists(orphan)
+
+def test_reconcile_never_deletes_legacy_flat_files(temp_db):
+    # Evidence saved straight into uploads/ before the object store, with no documents row
+    os.makedirs(document_store.UPLOADS_DIR, exist_ok=True)
+    legacy = os.path.join(document_store.UPLOADS_DIR, "CASE20250115ST004A_1a2b3c4d.pdf")
+    with open(legacy, "wb") as f:
+        f.write(b"%PDF-1.4 legacy evidence")
+    _age(legacy, 2 * document_store.ORPHAN_GRACE_SECONDS)
+    
+    result = reconcile_storage(remove_orphans=True)
+    
+    assert os.path.exists(legacy)
+    assert result["orphaned_files"] == 0
+    assert result["untracked_files"] == 1
+    assert document_store._remove_orphans([legacy]) == 0
+    assert os.path.exists(legacy)
+
+def test_document_delete_drops_only_the_emptied_usage_rows(temp_db):
+    create_case(make_case("CASE20250115ST005A"), "admin")
+    create_case(make_case("CASE20250115ST006A"), "admin")
+    removed = _upload("CASE20250115ST005A", b"%PDF-1.4 first")
+    _upload("CASE20250115ST006A", b"%PDF-1.4 second")
+    
+    with transaction() as conn:
+        conn.execute("DELETE FROM documents WHERE file_path = ?", (removed,))
+        trigger_sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'storage_usage_delete'").fetchone()["sql"]
+    
+    cases = {row["scope_key"] for row in get_storage_usage("case")}
+    assert cases == {"CASE20250115ST006A"}
+    assert {row["file_count"] for row in get_storage_usage("user")} == {1}
+    assert "file_count <= 0 AND scope != 'all'" not in trigger_sql
+
+def test_collect_keeps_unreferenced_blob_touched_by_in_flight_upload(temp_db):
+    create_case(make_case("CASE20250115ST007A"), "admin")
+    content = b"%PDF-1.4 re-uploaded evidence"
+    path = _upload("CASE20250115ST007A", content)
+    with transaction() as conn:
+        conn.execute("DELETE FROM documents WHERE file_path = ?", (path,))
+    _age(path, 2 * document_store.ORPHAN_GRACE_SECONDS)
+    
+    # The same content is uploaded again; its documents row has not committed yet
+    store_blob(io.BytesIO(content), "again.pdf")
+    assert collect_unreferenced_blobs() == 0
+    assert os.path.exists(path)
+    
+    # The upload commits and references the blob again
+    _upload("CASE20250115ST007A", content)
+    assert get_blob(os.path.basename(path))["ref_count"] == 1
+
+def test_collect_removes_unreferenced_blobs_past_the_grace_period(temp_db):
+    create_case(make_case("CASE20250115ST008A"), "admin")
+    path = _upload("CASE20250115ST008A", b"%PDF-1.4 withdrawn evidence")
+    with transaction() as conn:
+        conn.execute("DELETE FROM documents WHERE file_path = ?", (path,))
+    _age(path, 2 * document_store.ORPHAN_GRACE_SECONDS)
+    
+    assert collect_unreferenced_blobs() == 1
+    assert not os.path.exists(path)
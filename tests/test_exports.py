@@ -0,0 +1,33 @@
+import os
+import time
+import pytest
+import maintenance
+from conftest import make_case
+from models import create_case
+from utils import export_query_to_csv_file
+
+def _age(path, days):
+    past = time.time() - days * 86400
+    os.utime(path, (past, past))
+
+def test_failed_export_leaves_no_temp_file(temp_db):
+    create_case(make_case("CASE20250115EX001A"), "admin")
+    
+    def broken(value):
+        raise ValueError("bad value")
+    
+    with pytest.raises(ValueError):
+        export_query_to_csv_file("SELECT * FROM cases", (), os.path.join("exports", "cases.csv"),
+                                 formatters={"case_id": broken}, compress=True)
+    
+    assert os.listdir("exports") == []
+
+def test_prune_exports_removes_only_expired_files(temp_db):
+    kept = export_query_to_csv_file("SELECT * FROM cases", (), os.path.join("exports", "new.csv"))
+    expired = export_query_to_csv_file("SELECT * FROM cases", (), os.path.join("exports", "old.csv"))
+    _age(expired, maintenance.EXPORT_RETENTION_DAYS + 1)
+    
+    result = maintenance.prune_exports()
+    
+    assert result["removed"] == 1
+    assert os.path.exists(kept) and not os.path.exists(expired)
@@ -0,0 +1,63 @@
+import threading
+import time
+import jobs
+from database import transaction, get_db_connection
+
+def _insert_job(status, heartbeat_offset, worker_pid=999999):
+    """A job row owned by another process whose heartbeat is heartbeat_offset old"""
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO background_jobs (job_type, params, status, created_by, worker_pid, heartbeat_at)
+            VALUES ('analyze', '{}', ?, 'admin', ?, datetime('now', ?))
+        ''', (status, worker_pid, heartbeat_offset))
+        return cursor.lastrowid
+
+def _status(job_id):
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT status FROM background_jobs WHERE id = ?", (job_id,))
+        return cursor.fetchone()["status"]
+
+def test_recovery_uses_the_heartbeat_lease_not_the_pid(temp_db, monkeypatch):
+    monkeypatch.setattr(jobs, "_last_recovery", None)
+    live = _insert_job("Running", "-10 seconds")
+    dead = _insert_job("Running", f"-{jobs.JOB_LEASE_SECONDS + 60} seconds")
+    dead_queued = _insert_job("Queued", f"-{jobs.JOB_LEASE_SECONDS + 60} seconds")
+
+    jobs.recover_interrupted_jobs()
+    assert _status(live) == "Running"
+    assert _status(dead) == "Failed"
+    assert _status(dead_queued) == "Failed"
+
+def test_unique_submit_queues_one_job_under_concurrency(temp_db, monkeypatch):
+    monkeypatch.setattr(jobs, "_last_recovery", None)
+    release = threading.Event()
+    monkeypatch.setitem(jobs.JOB_TYPES, "analyze", ("Analyze Database", lambda job: release.wait(5)))
+
+    job_ids = []
+    start = threading.Barrier(4)
+    def submit():
+        start.wait()
+        job_ids.append(jobs.submit_unique_job("analyze", "admin"))
+    threads = [threading.Thread(target=submit) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    try:
+        queued = [job_id for job_id in job_ids if job_id is not None]
+        assert len(queued) == 1
+        assert jobs.submit_if_due("analyze", 24, "admin") is None
+    finally:
+        release.set()
+    deadline = time.monotonic() + 5
+    while _status(queued[0]) not in jobs.FINISHED_STATUSES and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert _status(queued[0]) == "Succeeded"
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM background_jobs WHERE job_type = 'analyze'")
+        assert cursor.fetchone()[0] == 1
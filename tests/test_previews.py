@@ -0,0 +1,68 @@
+import io
+import os
+import time
+import previews
+from PIL import Image
+from conftest import make_case
+from document_store import store_blob
+from models import create_case, add_case_document, get_documents_for_cases
+from previews import get_preview, render_previews, previews_pending
+
+def _image(seed):
+    buffer = io.BytesIO()
+    Image.new("RGB", (1600, 1200), (seed * 40 % 256, 80, 160)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+def test_page_previews_render_together(temp_db):
+    case_ids = [f"CASE20250115PV00{n}A" for n in range(4)]
+    for n, case_id in enumerate(case_ids):
+        create_case(make_case(case_id), "admin")
+        content_hash, file_path, file_size, mime_type = store_blob(io.BytesIO(_image(n)), f"scan{n}.jpg")
+        add_case_document(case_id, f"scan{n}.jpg", f"scan{n}.jpg", file_path, file_size, "admin", content_hash, mime_type)
+    documents = get_documents_for_cases(case_ids)
+    assert len(documents) == 4
+    
+    # Uncached previews never block the per-document lookup
+    start = time.perf_counter()
+    assert all(get_preview(document) is None for document in documents)
+    assert time.perf_counter() - start < 0.5
+    
+    rendering = render_previews(documents, timeout=30)
+    assert rendering == []
+    assert not previews_pending([document["content_hash"] for document in documents])
+    assert all(get_preview(document) for document in documents)
+
+def _wait_for_callbacks():
+    """wait() returns before done callbacks finish; let them record the cache size"""
+    deadline = time.monotonic() + 5
+    while previews._pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+def test_cache_is_walked_only_to_evict(temp_db, monkeypatch):
+    _wait_for_callbacks()
+    monkeypatch.setattr(previews, "_cache_bytes", None)
+    walks = []
+    real_entries = previews._cache_entries
+    monkeypatch.setattr(previews, "_cache_entries", lambda: walks.append(True) or real_entries())
+    
+    case_ids = [f"CASE20250115EV00{n}A" for n in range(4)]
+    for n, case_id in enumerate(case_ids):
+        create_case(make_case(case_id), "admin")
+        content_hash, file_path, file_size, mime_type = store_blob(io.BytesIO(_image(n + 10)), f"scan{n}.jpg")
+        add_case_document(case_id, f"scan{n}.jpg", f"scan{n}.jpg", file_path, file_size, "admin", content_hash, mime_type)
+    documents = get_documents_for_cases(case_ids)
+    
+    assert render_previews(documents[:3], timeout=30) == []
+    _wait_for_callbacks()
+    # One walk to measure the cache, then a running total per render
+    assert len(walks) == 1
+    size = previews._cache_bytes
+    assert size == sum(os.path.getsize(get_preview(document)) for document in documents[:3])
+    
+    # Going over budget walks once more and evicts the least recently viewed
+    monkeypatch.setattr(previews, "PREVIEW_CACHE_MAX_BYTES", size)
+    assert render_previews(documents[3:], timeout=30) == []
+    _wait_for_callbacks()
+    assert len(walks) == 2
+    assert previews._cache_bytes <= size
+    assert sum(os.path.getsize(path) for _, _, path in real_entries()) == previews._cache_bytes
@@ -0,0 +1,47 @@
+import threading
+import database
+import models
+from models import check_query_plans
+
+def test_hot_queries_use_indexes(temp_db):
+    assert check_query_plans() == {}
+
+def test_plan_check_follows_the_model_queries(temp_db, monkeypatch):
+    # A model query drifting to an unindexed filter shows up in the check
+    monkeypatch.setattr(models, "CASE_COMMENTS_QUERY", "SELECT * FROM case_comments WHERE comment_type = ?")
+    
+    assert set(check_query_plans()) == {"get_case_comments"}
+
+def test_concurrent_migrations_apply_each_version_once(tmp_path, monkeypatch):
+    # Base tables only, so every process below starts from schema version 0
+    database_path = str(tmp_path / "migrate.db")
+    monkeypatch.setattr(database, "DATABASE_PATH", database_path)
+    with monkeypatch.context() as patch:
+        patch.setattr(database, "MIGRATIONS", [])
+        database.init_database()
+    database.get_connection_pool().close_all()
+    
+    errors = []
+    barrier = threading.Barrier(4)
+    
+    def migrate():
+        # A separate connection per thread stands in for separate processes
+        conn = database.ConnectionPool(database_path)._create_connection()
+        try:
+            barrier.wait()
+            database.run_migrations(conn)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            conn.close()
+    
+    threads = [threading.Thread(target=migrate) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert errors == []
+    with database.get_db_connection() as conn:
+        versions = [row[0] for row in conn.execute("SELECT version FROM schema_migrations ORDER BY version")]
+    assert versions == [version for version, _, _ in database.MIGRATIONS]
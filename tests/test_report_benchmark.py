@@ -0,0 +1,45 @@
+import time
+import pytest
+from conftest import make_case
+from models import create_case, get_case_by_id
+from reports import generate_investigation_pdf_report, generate_report_bundle, get_investigation_report
+
+pytestmark = pytest.mark.benchmark
+
+BENCHMARK_CASES = 40
+
+# Floors well below local numbers (~40 reports/s, cache hits ~1000x faster)
+# so only real regressions fail on slower machines
+MIN_REPORTS_PER_SECOND = 5
+MIN_CACHE_SPEEDUP = 10
+
+def _create_cases(count):
+    for i in range(count):
+        create_case(make_case(f"CASE20250115BM{i:03d}X"), "admin")
+
+def test_bundle_renders_every_report_without_cache(temp_db):
+    _create_cases(BENCHMARK_CASES)
+    
+    result = generate_report_bundle(workers=2, use_cache=False)
+    
+    assert result["reports"] == BENCHMARK_CASES
+    assert result["rendered"] == BENCHMARK_CASES
+    assert result["reports_per_second"] >= MIN_REPORTS_PER_SECOND
+
+def test_render_benchmark_against_cache(temp_db):
+    _create_cases(1)
+    case = dict(get_case_by_id("CASE20250115BM000X"))
+    
+    started = time.perf_counter()
+    for _ in range(10):
+        pdf_bytes = generate_investigation_pdf_report(case, None).getvalue()
+    render_seconds = (time.perf_counter() - started) / 10
+    assert pdf_bytes.startswith(b"%PDF")
+    
+    get_investigation_report(case, None)
+    started = time.perf_counter()
+    for _ in range(10):
+        get_investigation_report(case, None)
+    cached_seconds = (time.perf_counter() - started) / 10
+    
+    assert render_seconds / cached_seconds >= MIN_CACHE_SPEEDUP
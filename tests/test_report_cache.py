@@ -0,0 +1,44 @@
+import base64
+import datetime
+import os
+import re
+import zlib
+import reports
+from conftest import make_case
+from models import create_case, get_case_by_id
+from reports import get_investigation_report
+
+class _FixedDate(datetime.date):
+    today_value = datetime.date(2025, 1, 15)
+    
+    @classmethod
+    def today(cls):
+        return cls.today_value
+
+def _pdf_text(pdf_bytes):
+    """Decoded content streams of a ReportLab PDF (ASCII85, then Flate)"""
+    streams = re.findall(rb"stream\r?\n(.*?)~>endstream", pdf_bytes, re.S)
+    return b"".join(zlib.decompress(base64.a85decode(stream.replace(b"\n", b""), adobe=False)) for stream in streams)
+
+def test_cached_report_is_regenerated_on_a_new_day(temp_db, monkeypatch):
+    monkeypatch.setattr(reports, "date", _FixedDate)
+    monkeypatch.setattr(_FixedDate, "today_value", datetime.date(2025, 1, 15))
+    create_case(make_case("CASE20250115RC001A"), "admin")
+    case = get_case_by_id("CASE20250115RC001A")
+    
+    first = get_investigation_report(case, None)
+    assert b"15-Jan-2025" in _pdf_text(first)
+    assert get_investigation_report(case, None) == first
+    
+    monkeypatch.setattr(_FixedDate, "today_value", datetime.date(2025, 1, 18))
+    later = get_investigation_report(case, None)
+    assert b"18-Jan-2025" in _pdf_text(later) and b"15-Jan-2025" not in _pdf_text(later)
+
+def test_stale_report_removed_by_another_session_is_ignored(temp_db, monkeypatch):
+    create_case(make_case("CASE20250115RC002A"), "admin")
+    case = get_case_by_id("CASE20250115RC002A")
+    # Another session deleted this stale entry between the listing and the delete
+    gone = os.path.join(reports.REPORT_CACHE_DIR, "CASE20250115RC002A_0000000000000000.pdf")
+    monkeypatch.setattr(reports.glob, "glob", lambda pattern: [gone])
+    
+    assert get_investigation_report(case, None).startswith(b"%PDF")
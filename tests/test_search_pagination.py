@@ -0,0 +1,49 @@
+from conftest import make_case
+from database import transaction
+from models import create_case, search_cases, search_cases_page
+
+def _create(case_id, description, created_at):
+    create_case(make_case(case_id, case_description=description), "admin")
+    with transaction() as conn:
+        conn.execute("UPDATE cases SET created_at = ? WHERE case_id = ?", (created_at, case_id))
+
+def _all_pages(search_term, page_size):
+    rows, after = search_cases_page(search_term, after=None, page_size=page_size)
+    pages = [rows]
+    while after:
+        rows, after = search_cases_page(search_term, after=after, page_size=page_size)
+        pages.append(rows)
+    return [row["case_id"] for page in pages for row in page]
+
+def test_text_search_pages_follow_relevance(temp_db):
+    # Older cases mention the term more often, so relevance and recency disagree
+    for i in range(12):
+        mentions = " ".join(["syndicate"] * (12 - i))
+        _create(f"CASE20250115SR{i:03d}A", f"{mentions} loan fraud with filler words {i}", f"2025-01-{i + 1:02d} 10:00:00")
+    
+    paged = _all_pages("syndicate", page_size=5)
+    
+    assert paged == [row["case_id"] for row in search_cases("syndicate")]
+    assert paged[0] == "CASE20250115SR000A"
+    assert len(paged) == len(set(paged)) == 12
+
+def test_filter_only_search_pages_newest_first(temp_db):
+    for i in range(7):
+        _create(f"CASE20250115SN{i:03d}A", "plain description", f"2025-01-{i + 1:02d} 10:00:00")
+    
+    paged = _all_pages("", page_size=3)
+    
+    assert paged == [f"CASE20250115SN{i:03d}A" for i in reversed(range(7))]
+
+def test_case_id_fragment_matches(temp_db):
+    _create("CASE20250115SC001A", "forged salary slips", "2025-01-01 10:00:00")
+    _create("CASE20250115SC002A", "card skimming", "2025-01-02 10:00:00")
+    _create("CASE20250115XY003A", "salary slips mentioning sc001 in passing", "2025-01-03 10:00:00")
+    
+    # A fragment from the middle of the case ID matches, ahead of text matches
+    assert [row["case_id"] for row in search_cases("SC001")] == ["CASE20250115SC001A", "CASE20250115XY003A"]
+    assert [row["case_id"] for row in search_cases("sc00")] == [
+        "CASE20250115SC001A", "CASE20250115SC002A", "CASE20250115XY003A"
+    ]
+    assert _all_pages("20250115", page_size=2) == [row["case_id"] for row in search_cases("20250115")]
+    assert len(_all_pages("20250115", page_size=2)) == 3
@@ -0,0 +1,28 @@
+import similar_cases
+from conftest import make_case
+from models import create_case
+from similar_cases import get_similar_case_index, rebuild_similar_case_index, find_similar_cases
+
+def test_lookup_defers_indexing_to_the_background_job(temp_db, monkeypatch):
+    monkeypatch.setattr(similar_cases, "_index", None)
+    scheduled = []
+    monkeypatch.setattr(similar_cases, "_schedule_rebuild", lambda: scheduled.append(True))
+    vectorized = []
+    real_vectorize = similar_cases.vectorize
+    monkeypatch.setattr(similar_cases, "vectorize", lambda text: vectorized.append(text) or real_vectorize(text))
+    
+    create_case(make_case("CASE20250115SC001A", case_description="Forged salary slips submitted for a personal loan"), "admin")
+    create_case(make_case("CASE20250115SC002A", case_description="Salary slips forged to inflate income on a personal loan"), "admin")
+    create_case(make_case("CASE20250115SC003A", case_description="Card skimming at an ATM kiosk"), "admin")
+    similar_cases._pending.clear()
+    
+    index = get_similar_case_index()
+    assert scheduled and not vectorized
+    assert not index.case_ids
+    
+    assert rebuild_similar_case_index() == {"cases": 3, "updated": 3}
+    matches = find_similar_cases(case_id="CASE20250115SC001A", limit=2)
+    assert matches[0]["case_id"] == "CASE20250115SC002A"
+    
+    # A rerun finds nothing changed and stores nothing
+    assert rebuild_similar_case_index()["updated"] == 0
@@ -0,0 +1,34 @@
+from datetime import date
+from conftest import make_case
+from models import create_case, add_case_comment
+from snapshots import export_snapshot, load_snapshot_table, snapshot_months, snapshot_case_counts
+
+def test_snapshot_round_trip_prunes_months(temp_db, tmp_path):
+    create_case(make_case("CASE20250615SN001A", case_date="2025-06-15", region="North"), "admin")
+    create_case(make_case("CASE20250704SN002A", case_date="2025-07-04", region="South"), "admin")
+    create_case(make_case("CASE20250720SN003A", case_date="2025-07-20", region="North"), "admin")
+    add_case_comment("CASE20250704SN002A", "Verified salary slips with the employer", "Investigation", "admin")
+    snapshot_dir = str(tmp_path / "snapshot")
+    
+    counts = export_snapshot(snapshot_dir, batch_rows=2)
+    assert counts["cases"] == 3
+    assert counts["case_comments"] == 1
+    
+    cases = load_snapshot_table("cases", snapshot_dir)
+    assert sorted(cases["case_id"]) == ["CASE20250615SN001A", "CASE20250704SN002A", "CASE20250720SN003A"]
+    assert cases.set_index("case_id").loc["CASE20250704SN002A", "loan_amount"] == 250000
+    
+    july = load_snapshot_table("cases", snapshot_dir, columns=["case_id", "region"], months=["2025-07"])
+    assert sorted(july["case_id"]) == ["CASE20250704SN002A", "CASE20250720SN003A"]
+    assert list(july.columns) == ["case_id", "region"]
+    
+    months = snapshot_months(date(2025, 6, 20), date(2025, 7, 1))
+    assert months == ["2025-06", "2025-07"]
+    by_region = snapshot_case_counts("region", months, snapshot_dir)
+    assert sorted(map(tuple, by_region.values.tolist())) == [
+        ("2025-06", "North", 1), ("2025-07", "North", 1), ("2025-07", "South", 1)
+    ]
+    assert snapshot_case_counts("region", ["2024-12"], snapshot_dir).empty
+
+def test_snapshot_months_cross_year_boundary():
+    assert snapshot_months(date(2024, 11, 30), date(2025, 2, 1)) == ["2024-11", "2024-12", "2025-01", "2025-02"]
@@ -0,0 +1,86 @@
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from trends import TREND_FREQUENCIES, bin_case_counts
+
+DATE_FROM = "2024-01-01"
+DATE_TO = "2024-12-31"
+
+STATUSES = ["Draft", "Submitted", "Under Review", "Approved", "Rejected", "Legal Review", "Closed"]
+REGIONS = ["North", "South", "East", "West", "Central"]
+PRODUCTS = ["Personal Loan", "Home Loan", "Business Loan", "Credit Card", "Gold Loan", "Vehicle Loan"]
+
+# The vectorized path must beat the reference loop by at least this factor
+MIN_SPEEDUP = 10
+
+def _synthetic_daily_counts(statuses, regions, products, max_count=12, seed=7):
+    """A year of case_daily_counts rollup rows with random gaps"""
+    rng = np.random.default_rng(seed)
+    days = pd.date_range(DATE_FROM, DATE_TO, freq="D").strftime("%Y-%m-%d")
+    index = pd.MultiIndex.from_product([days, statuses, regions, products], names=["day", "status", "region", "product"])
+    frame = index.to_frame(index=False)
+    frame["case_count"] = rng.integers(0, max_count, len(frame))
+    return frame[frame["case_count"] > 0].reset_index(drop=True)
+
+def _bin_case_counts_per_row(daily_counts, date_from, date_to, freq="D", group_by=None):
+    """Reference implementation: accumulate each rollup row into a dict, one Period at a time.
+    
+    This is the straightforward loop bin_case_counts replaces, written
+    for the comparison; the analytics page never shipped a row loop.
+    """
+    buckets = pd.period_range(pd.Timestamp(date_from), pd.Timestamp(date_to), freq=freq)
+    totals = {}
+    for row in daily_counts.itertuples(index=False):
+        bucket = pd.Period(row.day, freq=freq).start_time
+        key = (bucket, getattr(row, group_by)) if group_by else bucket
+        totals[key] = totals.get(key, 0) + row.case_count
+    
+    if not group_by:
+        return pd.DataFrame({
+            "Date": buckets.start_time,
+            "Cases": [totals.get(bucket, 0) for bucket in buckets.start_time]
+        })
+    groups = sorted({key[1] for key in totals})
+    return pd.DataFrame(
+        [(bucket, group, totals.get((bucket, group), 0)) for bucket in buckets.start_time for group in groups],
+        columns=["Date", group_by, "Cases"]
+    )
+
+@pytest.mark.parametrize("freq", list(TREND_FREQUENCIES.values()))
+@pytest.mark.parametrize("group_by", [None, "status", "region"])
+def test_vectorized_binning_matches_per_row_loop(freq, group_by):
+    daily_counts = _synthetic_daily_counts(["Submitted", "Approved", "Closed"], ["North", "South"], ["Personal Loan"])
+    
+    expected = _bin_case_counts_per_row(daily_counts, DATE_FROM, DATE_TO, freq, group_by)
+    actual = bin_case_counts(daily_counts, DATE_FROM, DATE_TO, freq, group_by)
+    
+    pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected, check_dtype=False, check_names=False)
+
+def test_vectorized_binning_outpaces_per_row_loop():
+    # A reduced case book: the reference loop is too slow to run at full scale
+    daily_counts = _synthetic_daily_counts(STATUSES[:3], REGIONS[:2], PRODUCTS[:2])
+    
+    started = time.perf_counter()
+    expected = _bin_case_counts_per_row(daily_counts, DATE_FROM, DATE_TO, "W", "status")
+    loop_seconds = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    actual = bin_case_counts(daily_counts, DATE_FROM, DATE_TO, "W", "status")
+    vectorized_seconds = time.perf_counter() - started
+    
+    pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected, check_dtype=False, check_names=False)
+    assert loop_seconds / vectorized_seconds >= MIN_SPEEDUP
+
+@pytest.mark.benchmark
+def test_vectorized_binning_at_request_scale():
+    # Every status/region/product combination on every day of a year,
+    # about 1M cases in ~77k rollup rows
+    daily_counts = _synthetic_daily_counts(STATUSES, REGIONS, PRODUCTS, max_count=27)
+    assert daily_counts["case_count"].sum() > 950_000
+    
+    for freq in TREND_FREQUENCIES.values():
+        started = time.perf_counter()
+        trend = bin_case_counts(daily_counts, DATE_FROM, DATE_TO, freq, "status")
+        assert time.perf_counter() - started < 1.0
+        assert trend["Cases"].sum() == daily_counts["case_count"].sum()
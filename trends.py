@@ -0,0 +1,67 @@
+import pandas as pd
+from database import get_db_connection
+
+# Trend granularities offered in the UI -> pandas period frequency
+TREND_FREQUENCIES = {
+    "Daily": "D",
+    "Weekly": "W",
+    "Monthly": "M"
+}
+
+# Dimensions a trend can be broken down by -> case_daily_counts column
+TREND_DIMENSIONS = {
+    "Status": "status",
+    "Region": "region",
+    "Product": "product"
+}
+
+def load_daily_counts(date_from, date_to, filters=None):
+    """Load the (day, status, region, product, case_count) rollup rows for a window"""
+    conditions = ["day >= ?", "day <= ?"]
+    params = [str(date_from), str(date_to)]
+    
+    for column in TREND_DIMENSIONS.values():
+        if filters and filters.get(column):
+            conditions.append(f"{column} = ?")
+            params.append(filters[column])
+    
+    query = f'''
+        SELECT day, status, region, product, case_count
+        FROM case_daily_counts
+        WHERE {" AND ".join(conditions)}
+    '''
+    with get_db_connection() as conn:
+        return pd.read_sql_query(query, conn, params=params)
+
+def bin_case_counts(daily_counts, date_from, date_to, freq="D", group_by=None):
+    """Bin daily counts into day/week/month buckets.
+    
+    Returns a long frame with Date, the group_by column (if any) and Cases,
+    with every bucket in the window present (zero-filled) so it plots as-is.
+    """
+    buckets = pd.period_range(pd.Timestamp(date_from), pd.Timestamp(date_to), freq=freq).start_time
+    keys = [group_by] if group_by else []
+    
+    if daily_counts.empty:
+        if group_by:
+            return pd.DataFrame(columns=["Date", group_by, "Cases"])
+        return pd.DataFrame({"Date": buckets, "Cases": 0})
+    
+    frame = daily_counts.assign(
+        Date=pd.to_datetime(daily_counts["day"]).dt.to_period(freq).dt.start_time
+    )
+    counts = frame.groupby(["Date"] + keys)["case_count"].sum()
+    
+    if group_by:
+        counts = counts.unstack(fill_value=0).reindex(buckets, fill_value=0)
+        counts.index.name = "Date"
+        return counts.stack().rename("Cases").reset_index()
+    
+    counts = counts.reindex(buckets, fill_value=0)
+    counts.index.name = "Date"
+    return counts.rename("Cases").reset_index()
+
+def get_case_trend(date_from, date_to, freq="D", group_by=None, filters=None):
+    """Case creation trend for a window, ready to pass to plotly express"""
+    daily_counts = load_daily_counts(date_from, date_to, filters)
+    return bin_case_counts(daily_counts, date_from, date_to, freq=freq, group_by=group_by)
@@ -109,33 +109,25 @@ def validate_case_data(case_data):
 
 
 def save_uploaded_file(uploaded_file, case_id):
-    """Save uploaded file to uploads directory"""
-    import os
-    import uuid
+    """Save uploaded file to the deduplicated document store"""
+    from document_store import store_blob
     
     if uploaded_file is None:
         return None, "No file uploaded"
     
     try:
-        # Create uploads directory if it doesn't exist
-        uploads_dir = "uploads"
-        if not os.path.exists(uploads_dir):
-            os.makedirs(uploads_dir)
+        content_hash, file_path, file_size, mime_type = store_blob(uploaded_file, uploaded_file.name)
         
-        # Generate unique filename
         file_extension = uploaded_file.name.split(".")[-1] if "." in uploaded_file.name else ""
-        unique_filename = f"{case_id}_{uuid.uuid4().hex[:8]}.{file_extension}"
-        file_path = os.path.join(uploads_dir, unique_filename)
-        
-        # Save file
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
+        unique_filename = f"{case_id}_{content_hash[:8]}.{file_extension}"
         
         return {
             "file_path": file_path,
             "original_filename": uploaded_file.name,
-            "file_size": uploaded_file.size,
-            "unique_filename": unique_filename
+            "file_size": file_size,
+            "unique_filename": unique_filename,
+            "content_hash": content_hash,
+            "mime_type": mime_type
         }, None
         
     except Exception as e:
@@ -222,4 +214,91 @@ def export_cases_to_csv(cases_data):
     csv_buffer = io.StringIO()
     df.to_csv(csv_buffer, index=False)
     
-    return csv_buffer.getvalue()
\ No newline at end of file
+    return csv_buffer.getvalue()
+
+# Rows fetched from the cursor and written per CSV chunk when streaming exports
+CSV_CHUNK_ROWS = 1000
+
+def format_csv_timestamp(value):
+    """Trim a stored timestamp to minutes for CSV exports"""
+    return str(value)[:16] if value else value
+
+def iter_query_csv(query, params=(), formatters=None, chunk_rows=CSV_CHUNK_ROWS):
+    """Stream a query's result as CSV text chunks with constant memory.
+    
+    Rows are fetched chunk_rows at a time from a dedicated connection, so the
+    export reads one consistent snapshot while writers carry on (WAL mode).
+    formatters maps column name -> function applied to that column's values.
+    """
+    import csv
+    import io
+    from database import get_dedicated_connection
+    
+    formatters = formatters or {}
+    
+    with get_dedicated_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        columns = [description[0] for description in cursor.description]
+        column_formatters = [(i, formatters[name]) for i, name in enumerate(columns) if name in formatters]
+        
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(columns)
+        
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            for row in rows:
+                row = list(row)
+                for i, formatter in column_formatters:
+                    row[i] = formatter(row[i])
+                writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        
+        if buffer.tell():
+            yield buffer.getvalue()
+
+def gzip_chunks(text_chunks):
+    """Gzip-compress a stream of text chunks incrementally"""
+    import zlib
+    
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+    for chunk in text_chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+def export_query_to_csv_file(query, params, file_path, formatters=None, compress=False):
+    """Stream a query to a CSV (or .csv.gz) file and return the path written"""
+    import os
+    import uuid
+    
+    chunks = iter_query_csv(query, params, formatters)
+    if compress:
+        if not file_path.endswith(".gz"):
+            file_path += ".gz"
+        data_chunks = gzip_chunks(chunks)
+    else:
+        data_chunks = (chunk.encode("utf-8") for chunk in chunks)
+    
+    directory = os.path.dirname(file_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    
+    # Write to a temporary name so a partial export never looks complete
+    temp_path = f"{file_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            for data in data_chunks:
+                f.write(data)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return file_path